@@ -1,15 +1,17 @@
 
-import os
 import streamlit as st
-import streamlit_extras
-from streamlit_extras.app_logo import add_logo
+from utils.model_loader import model_registry
+from utils.prediction_cache import DEFAULT_BACKEND
+
+# Start loading the prediction models while the user reads the landing page
+if DEFAULT_BACKEND == 'xgboost':
+    model_registry.warm_up_in_background()
 st.title("Welcome to the COVID-19 Case Prediction :green[App!] :health_worker::test_tube:\n\n")
 # Insert the image at the top of the page
 st.image("./media/img.jpg", use_container_width=True)
 
 # Add a sidebar with a logo
 # st.sidebar.image("logo.jpg", use_container_width='bool') 
-# add_logo("omdena_zambia_highres.png", height=10)
 # Sidebar for additional information
 st.sidebar.title('COVID-19 Dashboard')
 st.sidebar.image("./media/omdena_zambia_highres.png", use_container_width='always') 
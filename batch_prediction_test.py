@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.batch_prediction import BATCH_MODELS, predict_batch
+from utils.feature_pipeline import load_pipeline
+from utils.model_loader import model_registry
+from utils.prediction_cache import feature_matrix
+
+
+def raw_rows(model_name, n_rows=300, seed=0):
+    # Raw inputs on both sides of the differencing baselines, so some differences are clipped to 0
+    pipeline = load_pipeline(model_name)
+    scale = np.full(len(pipeline.features), 10.0)
+    for step in pipeline.steps:
+        scale[step.positions] = np.maximum(step.raw_baselines, 1.0)
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.uniform(0, 2, size=(n_rows, len(scale))) * scale, columns=pipeline.features)
+    frame['month'] = rng.integers(1, 13, n_rows)
+    frame['day_of_week'] = rng.integers(0, 7, n_rows)
+    return frame
+
+
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def test_batch_matches_single_row_page_path(model_name):
+    _, preprocess, _ = BATCH_MODELS[model_name]
+    model = model_registry.get(model_name)
+    input_df = raw_rows(model_name)
+
+    batch = predict_batch(input_df, model_name)
+    # What a prediction page does with one row entered on its own
+    single = np.concatenate([
+        model.predict(feature_matrix(preprocess(input_df.iloc[[row]]))) for row in range(len(input_df))
+    ])
+    np.testing.assert_array_equal(batch, single)
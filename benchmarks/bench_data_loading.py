@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+from utils.data_loader import build_columnar_cache, load_dataset, open_table, read_source_csv
+from utils.data_viewer import data_page
+from utils.dataset import Dataset, get_dataset
+from utils.export import EXPORT_FORMATS, _export_bytes
+from utils.ingestion import build_state, derive_rows
+
+
+def bench_read_source_csv(benchmark):
+    # What Overview and EDA paid on every rerun before the columnar cache
+    benchmark(read_source_csv)
+
+
+def bench_load_columnar_dataset(benchmark):
+    build_columnar_cache()
+    benchmark(load_dataset)
+
+
+def bench_load_columnar_columns(benchmark):
+    build_columnar_cache()
+    benchmark(load_dataset, ['imputed_total_cases', 'imputed_total_deaths', 'totalVaccinations'])
+
+
+def bench_build_compact_dataset(benchmark):
+    df = load_dataset()
+    benchmark(Dataset.from_frame, df)
+
+
+@pytest.mark.parametrize('n_days', [1, 30])
+def bench_derive_new_days(benchmark, n_days):
+    # Cost of one daily update, which must not grow with the stored history
+    table = open_table()
+    state = build_state(table)
+    dates = pd.date_range(pd.Timestamp(state['last_date']) + pd.Timedelta(days=1), periods=n_days)
+    raw = pd.DataFrame({'date': dates, 'newCases': 10.0, 'deathDay': 1.0, 'rfh': 5.0})
+    benchmark(derive_rows, raw, state, table.column_names)
+
+
+@pytest.mark.parametrize('fmt', sorted(EXPORT_FORMATS))
+def bench_export_bytes(benchmark, fmt):
+    # Uncached: what a download click costs for the whole dataset
+    dataset = get_dataset()
+    benchmark(_export_bytes.__wrapped__, dataset.ref(), None, None, fmt)
+
+
+def bench_gradient_page(benchmark):
+    # A page of the EDA viewer once the colors are cached
+    dataset = get_dataset()
+    data_page(dataset, 2, gradient=True)
+    benchmark(lambda: data_page(dataset, 2, gradient=True).to_html())
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+from conftest import REPO_ROOT
+from utils.charts import DEFAULT_BOX_BINS, _box_figure_json, _figure_json, time_series_figure
+from utils.dataset import get_dataset
+from utils.rollups import GRANULARITIES, build_rollup
+
+PAGES = ['pages/2_📊_Overview.py', 'pages/3_📈_EDA.py']
+
+
+@pytest.mark.parametrize('title', [None, 'Total Cases Over Time'], ids=['overview', 'eda'])
+def bench_build_time_series_figure(benchmark, title):
+    # Uncached: downsampling plus Plotly figure construction and serialization
+    dataset = get_dataset()
+    benchmark(_figure_json.__wrapped__, dataset.ref(), 'imputed_total_cases', 'Total Cases', None, None, 1000, 'line', title)
+
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def bench_build_time_series_figure_granularity(benchmark, granularity):
+    # Uncached, whole history: daily rows (downsampled) against the precomputed rollups
+    dataset = get_dataset()
+    benchmark(_figure_json.__wrapped__, dataset.ref(), 'imputed_total_cases', 'Total Cases', None, None, 1000, 'line', None,
+              granularity)
+
+
+@pytest.mark.parametrize('granularity', GRANULARITIES[1:])
+def bench_build_rollup(benchmark, granularity):
+    # Paid once per store version, when the data is loaded
+    benchmark(build_rollup, get_dataset().frame, granularity)
+
+
+def bench_cached_time_series_figure(benchmark):
+    dataset = get_dataset()
+    time_series_figure(dataset, 'imputed_total_cases', 'Total Cases')
+    benchmark(time_series_figure, dataset, 'imputed_total_cases', 'Total Cases')
+
+
+@pytest.mark.parametrize('page', PAGES, ids=['overview', 'eda'])
+def bench_render_page(benchmark, page):
+    # A full Streamlit rerun of the page script with its default widget values
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(REPO_ROOT, page), default_timeout=120)
+    app.run()
+    benchmark.pedantic(app.run, rounds=3, iterations=1)
+
+
+@pytest.mark.parametrize('x_column', ['stringency_index', 'reproduction_rate'])
+def bench_build_box_figure(benchmark, x_column):
+    # Uncached: binned box statistics plus Plotly figure construction and serialization
+    dataset = get_dataset()
+    benchmark(_box_figure_json.__wrapped__, dataset.ref(), x_column, 'imputed_total_deaths', DEFAULT_BOX_BINS, 'Deaths')
@@ -0,0 +1,31 @@
+import pytest
+from utils.model_loader import (MODEL_PATHS, ModelPool, load_model_total_case, load_model_total_death, model_key,
+                                model_registry, read_model_file, resolve_model_path)
+
+
+@pytest.mark.parametrize('loader', [load_model_total_case, load_model_total_death], ids=['total_case', 'total_death'])
+def bench_load_model(benchmark, loader):
+    # Registry hit: what every "Predict" click pays
+    loader()
+    benchmark(loader)
+
+
+@pytest.mark.parametrize('model_name', sorted(MODEL_PATHS))
+def bench_read_model_file(benchmark, model_name):
+    # Cold load from disk: what process start and hot reloads pay
+    path = resolve_model_path(MODEL_PATHS[model_name])
+    benchmark(read_model_file, path)
+
+
+def bench_model_pool_region_hit(benchmark):
+    # Pool hit for another region's key, including resolving the region's model file
+    key = model_key('total_case', 'bench_region')
+    model_registry.get(key)
+    benchmark(model_registry.get, key)
+
+
+def bench_model_pool_eviction(benchmark):
+    # A pool with room for one model, alternating between two: every get evicts and reloads
+    pool = ModelPool(MODEL_PATHS, max_bytes=1)
+    names = iter(sorted(MODEL_PATHS) * 1000)
+    benchmark(lambda: pool.get(next(names)))
@@ -0,0 +1,80 @@
+import pytest
+from conftest import random_inputs
+from utils.backtest import backtest
+from utils.batch_prediction import BATCH_MODELS
+from utils.drift import DriftMonitor, load_reference
+from utils.model_loader import model_registry
+from utils.prediction_cache import explain_cached
+from utils.tree_evaluator import load_quantile_ensemble, load_tree_ensemble
+
+BATCH_SIZES = [1, 100, 10_000]
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def bench_model_predict(benchmark, model_name, batch_size):
+    features, preprocess, _ = BATCH_MODELS[model_name]
+    preprocessed_data = preprocess(random_inputs(features, batch_size))
+    model = model_registry.get(model_name)
+    model.predict(preprocessed_data)
+    benchmark(model.predict, preprocessed_data)
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def bench_tree_evaluator_predict(benchmark, model_name, batch_size):
+    features, preprocess, _ = BATCH_MODELS[model_name]
+    preprocessed_data = preprocess(random_inputs(features, batch_size)).to_numpy()
+    ensemble = load_tree_ensemble(model_name)
+    benchmark(ensemble.predict, preprocessed_data)
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def bench_quantile_ensemble_predict(benchmark, model_name, batch_size):
+    # P10/P50/P90 boosters walked as one stacked ensemble; compare with bench_tree_evaluator_predict
+    features, preprocess, _ = BATCH_MODELS[model_name]
+    preprocessed_data = preprocess(random_inputs(features, batch_size)).to_numpy()
+    ensemble, _, _ = load_quantile_ensemble(model_name)
+    benchmark(ensemble.predict, preprocessed_data)
+
+
+@pytest.mark.parametrize('approximate', [False, True], ids=['exact', 'approx'])
+def bench_explain_uncached(benchmark, approximate):
+    import xgboost as xgb
+
+    features, preprocess, _ = BATCH_MODELS['total_death']
+    booster = model_registry.get('total_death').get_booster()
+    data = xgb.DMatrix(preprocess(random_inputs(features, 100)), feature_names=booster.feature_names)
+    benchmark(booster.predict, data, pred_contribs=True, approx_contribs=approximate)
+
+
+def bench_explain_cached(benchmark):
+    # Explaining rows that were explained before: only hashing and cache lookups
+    features, preprocess, _ = BATCH_MODELS['total_death']
+    preprocessed_data = preprocess(random_inputs(features, 10_000))
+    explain_cached('total_death', preprocessed_data, approximate=True)
+    benchmark(explain_cached, 'total_death', preprocessed_data, True)
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def bench_drift_update(benchmark, batch_size):
+    # Adding submitted rows to the streaming input histograms, as every prediction does
+    features, preprocess, _ = BATCH_MODELS['total_death']
+    matrix = preprocess(random_inputs(features, batch_size)).to_numpy(dtype='float32')
+    monitor = DriftMonitor(load_reference('total_death'))
+    benchmark(monitor.update, matrix)
+
+
+def bench_drift_report(benchmark):
+    features, preprocess, _ = BATCH_MODELS['total_death']
+    monitor = DriftMonitor(load_reference('total_death'))
+    monitor.update(preprocess(random_inputs(features, 1000)).to_numpy(dtype='float32'))
+    benchmark(monitor.report)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def bench_backtest(benchmark, workers):
+    # Every origin of the history forecast 28 days ahead, in-process or on a process pool
+    backtest(workers=1)
+    benchmark.pedantic(backtest, kwargs={'workers': workers}, rounds=3, iterations=1)
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import random_inputs
+from utils.feature_pipeline import load_pipeline
+from utils.model_features import CASE_DIFFERENCED_FEATURES, CASE_FEATURES, DEATH_FEATURES, DEATH_LOG_FEATURES
+from utils.preprocessing import preprocess_differencing, preprocess_log
+
+ROW_COUNTS = [1, 1_000, 1_000_000]
+
+
+@pytest.mark.parametrize('n_rows', ROW_COUNTS)
+def bench_preprocess_differencing(benchmark, n_rows):
+    input_df = random_inputs(CASE_FEATURES, n_rows)
+    differencing_data = pd.DataFrame([CASE_DIFFERENCED_FEATURES])
+    # The function writes into its input, so each round gets a fresh copy
+    benchmark.pedantic(preprocess_differencing, setup=lambda: ((input_df.copy(), differencing_data), {}), rounds=20)
+
+
+@pytest.mark.parametrize('n_rows', ROW_COUNTS)
+def bench_preprocess_log(benchmark, n_rows):
+    feature = 'total_tests_per_thousand'
+    user_input = random_inputs(DEATH_FEATURES, n_rows)[feature]
+    benchmark(preprocess_log, user_input, DEATH_LOG_FEATURES[feature])
+
+
+@pytest.mark.parametrize('n_rows', ROW_COUNTS)
+def bench_feature_pipeline(benchmark, n_rows):
+    pipeline = load_pipeline('total_death')
+    matrix = random_inputs(DEATH_FEATURES, n_rows)[DEATH_FEATURES].to_numpy(dtype=np.float64)
+    benchmark(pipeline.transform, matrix)
@@ -0,0 +1,13 @@
+import pytest
+from utils.tracing import Tracer
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def bench_span(benchmark, enabled):
+    tracer = Tracer(enabled=enabled)
+
+    def traced_block():
+        with tracer.span('bench'):
+            pass
+
+    benchmark(traced_block)
@@ -0,0 +1,76 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, '.baselines')
+
+# Slowdown of a benchmark's minimum time, against the pinned baseline, that fails the suite
+REGRESSION_THRESHOLD = 'min:25%'
+
+
+def pytest_addoption(parser):
+    parser.addini('benchmark_baseline', default='baseline',
+                  help="Name of the saved run that every run is compared with (saved with --benchmark-save=<name>)")
+
+
+def pinned_baseline(name):
+    """
+    Return the latest saved run with the given name, or None if there is none.
+    """
+    paths = sorted(glob.glob(os.path.join(BASELINE_DIR, '*', f'[0-9][0-9][0-9][0-9]_{name}.json')),
+                   key=os.path.basename)
+    return paths[-1] if paths else None
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Compare every run with the pinned baseline and fail on regressions against it.
+    # Runs are saved only when asked to, so a slow run never becomes the baseline.
+    if not hasattr(config.option, 'benchmark_storage') or config.option.benchmark_disable:
+        return
+    from pytest_benchmark.utils import parse_compare_fail
+
+    config.option.benchmark_storage = f'file://{BASELINE_DIR}'
+    baseline = pinned_baseline(config.getini('benchmark_baseline'))
+    if baseline is not None and not config.option.benchmark_compare:
+        config.option.benchmark_compare = baseline
+        if not config.option.benchmark_compare_fail:
+            config.option.benchmark_compare_fail = [parse_compare_fail(REGRESSION_THRESHOLD)]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def repo_root_cwd():
+    # The app reads data/ and model/ relative to the repository root
+    previous = os.getcwd()
+    os.chdir(REPO_ROOT)
+    yield
+    os.chdir(previous)
+
+
+def random_inputs(features, n_rows, seed=0):
+    """
+    Build a dataframe of plausible raw model inputs.
+
+    Parameters:
+    features (list): Columns to generate.
+    n_rows (int): Number of rows.
+    seed (int): Random seed.
+
+    Returns:
+    pd.DataFrame: The inputs.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for feature in features:
+        if feature == 'month':
+            columns[feature] = rng.integers(1, 13, n_rows)
+        elif feature == 'day_of_week':
+            columns[feature] = rng.integers(0, 7, n_rows)
+        else:
+            columns[feature] = rng.uniform(0, 1e7, n_rows)
+    return pd.DataFrame(columns)
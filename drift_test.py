@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from utils.drift import (N_BINS, PSI_ALERT, PSI_WARN, DriftMonitor, StreamingHistogram, ks_distance,
+                         population_stability_index)
+
+
+def reference_from(X, n_bins=N_BINS):
+    # Quantile edges and counts of a sample, as build_reference makes them from the training rows
+    edges = [np.unique(np.quantile(column, np.linspace(0, 1, n_bins + 1)[1:-1])).tolist() for column in X.T]
+    histogram = StreamingHistogram(edges)
+    histogram.update(X)
+    counts, rows = histogram.snapshot()
+    return {
+        'model': 'total_case',
+        'features': [f"f{position}" for position in range(X.shape[1])],
+        'rows': rows,
+        'edges': edges,
+        'counts': [histogram.feature_counts(counts, position).tolist() for position in range(X.shape[1])],
+    }
+
+
+def test_histogram_bins_values_and_missing():
+    histogram = StreamingHistogram([[0.0, 1.0], [5.0]])
+    histogram.update(np.array([[-3.0, 4.0], [0.0, 5.0], [0.5, np.nan], [9.0, 6.0]]))
+    histogram.update(np.array([np.nan, 1.0]))
+    counts, rows = histogram.snapshot()
+    assert rows == 5
+    # Below, between and beyond the edges, then missing
+    assert histogram.feature_counts(counts, 0).tolist() == [1, 2, 1, 1]
+    assert histogram.feature_counts(counts, 1).tolist() == [2, 2, 1]
+
+    histogram.reset()
+    counts, rows = histogram.snapshot()
+    assert rows == 0 and not counts.any()
+
+
+def test_psi_and_ks_of_known_histograms():
+    expected = np.array([25.0, 25.0, 25.0, 25.0])
+    assert population_stability_index(expected, expected * 3) == 0
+    assert ks_distance(expected, expected * 3) == 0
+
+    actual = np.array([10.0, 20.0, 30.0, 40.0])
+    shares = actual / actual.sum()
+    assert population_stability_index(expected, actual) == pytest.approx(np.sum((shares - 0.25) * np.log(shares / 0.25)))
+    assert ks_distance(expected, actual) == pytest.approx(0.2)
+
+
+def test_unshifted_inputs_are_stable():
+    rng = np.random.default_rng(0)
+    monitor = DriftMonitor(reference_from(rng.normal(size=(5000, 2))))
+    monitor.update(rng.normal(size=(2000, 2)))
+    report = monitor.report()
+    assert report['status'] == 'stable'
+    assert all(entry['psi'] < PSI_WARN for entry in report['features'])
+
+
+def test_shifted_input_drifts():
+    rng = np.random.default_rng(0)
+    monitor = DriftMonitor(reference_from(rng.normal(size=(5000, 2))))
+    submitted = rng.normal(size=(2000, 2))
+    submitted[:, 1] += 1.0
+    monitor.update(submitted)
+    report = monitor.report()
+    first, second = report['features']
+    assert first['status'] == 'stable'
+    assert second['psi'] >= PSI_ALERT
+    assert second['status'] == 'drift'
+    assert report['status'] == 'drift'
@@ -1,15 +1,19 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
-import os
 import warnings
 warnings.filterwarnings('ignore')
-import base64
 from typing import List
+from utils.data_loader import store_version
+from utils.dataset import MAX_CACHED_DATASETS, get_dataset
+from utils.range_query import RangeQueryIndex
+from utils.regions import region_data_path, region_label, region_selector
+from utils.rollups import GRANULARITY_LABELS
+from utils.charts import time_series_figure
+from utils.data_viewer import data_viewer
+from utils.export import download_button
+from utils.tracing import debug_panel, span, start_page
+
+start_page('overview')
 
 # Load external CSS
 with open('./frontend/streamlit.css') as f:
@@ -17,19 +21,32 @@ with open('./frontend/streamlit.css') as f:
 
 st.title(":bar_chart: Overview Of COVID-19 Data")
 
-# Assuming your dataset is named 'covid_data.csv'
-df = pd.read_csv("./data/preprocessed_data_updated.csv")
-#Renaming the column name "Unnamed: 0" to "date"
-df.rename(columns={"Unnamed: 0":"date"},inplace=True)
-#Casting the date column into datetime type
-df["date"] = pd.to_datetime(df["date"])
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS)
+def load_data(region, version):
+    # One compact, read-only dataset per region shared by every session and page, reloaded when days are appended
+    return get_dataset(region_data_path(region))
+
+# Columns summarized in the KPI cards
+KPI_COLUMNS = ['imputed_total_cases', 'imputed_total_deaths', 'totalVaccinations', 'totalTests', 'imputed_total_recoveries']
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS)
+def load_kpi_index(region, version):
+    # Range-max index over the KPI columns, built once per region and dataset version
+    frame = load_data(region, version).frame
+    return RangeQueryIndex(frame["date"], frame, KPI_COLUMNS)
 
 # Sidebar for additional information
 st.sidebar.title('COVID-19 Dashboard')
 st.sidebar.image("./media/omdena_zambia_highres.png", use_container_width='always') 
 st.sidebar.write("This dashboard provides an overview of COVID-19 data, including cases, deaths, vaccinations, and testing trends.")
+region = region_selector()
 st.sidebar.divider()
 
+version = store_version(region_data_path(region))
+dataset = load_data(region, version)
+df = dataset.frame
+kpi_index = load_kpi_index(region, version)
+
 # Filter options
 st.sidebar.header("Filter Options")
 
@@ -48,20 +65,22 @@ if len(date_range) == 2:
     # Convert start_date and end_date to datetime64 if they are not already
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
-    # Filter the DataFrame based on the selected date range
-    filtered_df = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
 else:
     # If date_range is not a tuple of start and end date, use the entire DataFrame
-    filtered_df = df
+    start_date, end_date = df["date"].min(), df["date"].max()
+
+# Chart granularity: long spans are drawn from the weekly/monthly rollups
+granularity = st.sidebar.selectbox("Chart Granularity", list(GRANULARITY_LABELS), format_func=GRANULARITY_LABELS.get)
 
 st.markdown('<style>div.block-container{padding-top:3rem;color:white}</style>', unsafe_allow_html=True)
 
-# Calculate summary metrics
-total_cases = filtered_df['imputed_total_cases'].max()
-total_deaths = filtered_df['imputed_total_deaths'].max()
-total_vaccinations = filtered_df['totalVaccinations'].max()
-total_tests = filtered_df['totalTests'].max()
-total_recoveries = filtered_df['imputed_total_recoveries'].max()
+# Calculate summary metrics (constant time per KPI, whatever the range)
+kpis = kpi_index.query(start_date, end_date, 'max')
+total_cases = kpis['imputed_total_cases']
+total_deaths = kpis['imputed_total_deaths']
+total_vaccinations = kpis['totalVaccinations']
+total_tests = kpis['totalTests']
+total_recoveries = kpis['imputed_total_recoveries']
 
 # Format the metrics for better readability
 formatted_total_cases = f"{total_cases / 1e3:.1f} K"
@@ -93,33 +112,34 @@ display_kpi_metrics(formatted_values[:2], titles[:2], bg_colors[:2])
 # Second row with 3 columns
 display_kpi_metrics(formatted_values[2:6], titles[2:6], bg_colors[2:6])
 
-st.info(f"*The metrics displayed above is for the period {date_range}*")
+st.info(f"*The metrics displayed above is for {region_label(region)} for the period {date_range}*")
 st.divider()
-# Visualization: Cases Over Time
+# Visualization: Cases Over Time (rolled up or downsampled to the chart width and cached per date range)
 st.subheader("COVID-19 Cases Over Time")
-fig1 = px.line(filtered_df, x='date', y='imputed_total_cases', labels={"date": "Date", "imputed_total_cases": "Total Cases"})
-st.plotly_chart(fig1, use_container_width=True)
+fig1 = time_series_figure(dataset, 'imputed_total_cases', "Total Cases", start_date, end_date, granularity=granularity)
+with span('chart.send'):
+    st.plotly_chart(fig1, use_container_width=True)
 
 # Visualization: Deaths Over Time
 st.subheader("COVID-19 Deaths Over Time")
-fig2 = px.line(filtered_df, x='date', y='imputed_total_deaths', labels={"date": "Date", "imputed_total_deaths": "Total Deaths"})
-st.plotly_chart(fig2, use_container_width=True)
+fig2 = time_series_figure(dataset, 'imputed_total_deaths', "Total Deaths", start_date, end_date, granularity=granularity)
+with span('chart.send'):
+    st.plotly_chart(fig2, use_container_width=True)
 
 
 
 # Visualization: Vaccinations Over Time
 st.subheader("COVID-19 Vaccinations Over Time")
-fig3 = px.line(filtered_df, x='date', y='totalVaccinations', labels={"date": "Date", "totalVaccinations": "Total Vaccinations"})
-st.plotly_chart(fig3, use_container_width=True)
+fig3 = time_series_figure(dataset, 'totalVaccinations', "Total Vaccinations", start_date, end_date, granularity=granularity)
+with span('chart.send'):
+    st.plotly_chart(fig3, use_container_width=True)
 
 
 # View and download data
 st.subheader("View and Download Data")
 with st.expander("**View Data**"):
-    st.write(filtered_df.reset_index(drop=True))
-
-    csv = filtered_df.to_csv(index=False).encode('utf-8')
-    st.download_button("**Download Data**", data=csv, file_name="covid_data.csv", mime="text/csv")
-
-
+    # Only the shown page is materialized; the export is built when the button is clicked
+    data_viewer(dataset, 'overview', start_date=start_date, end_date=end_date)
+    download_button("**Download Data**", dataset, 'overview', start_date, end_date)
 
+debug_panel()
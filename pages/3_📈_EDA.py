@@ -1,25 +1,38 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
+from utils.bootstrap import px
+from utils.data_loader import store_version
+from utils.dataset import MAX_CACHED_DATASETS, get_dataset
+from utils.charts import box_figure, time_series_figure
+from utils.data_viewer import data_viewer
+from utils.export import download_button
+from utils.regions import region_data_path, region_selector
+from utils.rollups import GRANULARITY_LABELS
+from utils.tracing import debug_panel, span, start_page
+
+start_page('eda')
 
 st.markdown('<style>div.block-container{padding-top:1rem;}</style>', unsafe_allow_html=True)
 
 st.title(":chart_with_upwards_trend: Exploratory Data Analysis")
 
-# Load the dataset
-file_path = './data/preprocessed_data_updated.csv'
-df = pd.read_csv(file_path)
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS)
+def load_data(region, version):
+    # One compact, read-only dataset per region shared by every session and page, reloaded when days are appended
+    return get_dataset(region_data_path(region))
 
 # Sidebar for additional information
 st.sidebar.title('COVID-19 Dashboard')
 st.sidebar.image("./media/omdena_zambia_highres.png", use_container_width='always') 
 st.sidebar.write("This dashboard provides an overview of COVID-19 data, including cases, deaths, vaccinations, and testing trends.")
+region = region_selector()
 st.sidebar.divider()
 
+# Load the dataset
+dataset = load_data(region, store_version(region_data_path(region)))
+df = dataset.frame
+
 
 # Set page title and description
 st.subheader("Exploratory Data Analysis")
@@ -31,194 +44,88 @@ num_filter = st.sidebar.selectbox("Select a Numerical Column", [None, 'imputed_t
 cat_filter = st.sidebar.selectbox("Select a Categorical Column", [None, 'stringency_index', 'reproduction_rate', 'rfh', 'r3h'])
 
 if num_filter is not None:
-    fig = px.scatter(df, x=num_filter, y='totalVaccinations', color=cat_filter, size=num_filter)
-    st.plotly_chart(fig, use_container_width=True)
+    with span('chart.build'):
+        fig = px.scatter(df, x=num_filter, y='totalVaccinations', color=cat_filter, size=num_filter)
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
 
 with st.expander("View Data"):
-    st.write(df.iloc[:500].style.background_gradient(cmap="Oranges"))
-
-# Download the filtered DataSet
-csv = df.to_csv(index=False).encode('utf-8')
-st.download_button('Download Data', data=csv, file_name="covid_data.csv", mime="text/csv")
-
-
-@st.cache_data
-def load_data():
-    df = pd.read_csv(file_path)
-    return df
-
-# Define the main function
-def main():
-    df = load_data()
+    # Paginated, with the gradient colors computed once per dataset
+    data_viewer(dataset, 'eda', gradient=True)
 
-    # Create a sidebar for page navigation
-    page = st.sidebar.selectbox('Select a Page', ['Cases Analysis', 'Deaths Analysis', 'Vaccinations Analysis'])
+# Download the DataSet (serialized only when the button is clicked)
+download_button('Download Data', dataset, 'eda')
 
-    if page == 'Cases Analysis':
-        st.subheader('COVID-19 Cases Analysis')
-        plot_cases_analysis(df)
-
-    elif page == 'Deaths Analysis':
-        st.subheader('COVID-19 Deaths Analysis')
-        plot_deaths_analysis(df)
-        plot_total_recovery_analysis(df)
-
-    elif page == 'Vaccinations Analysis':
-        st.subheader('COVID-19 Vaccinations Analysis')
-        plot_vaccinations_analysis(df)
-
-# Create a function to plot cases analysis
-def plot_cases_analysis(df):
-    plot_df_cases = df.groupby(['Unnamed: 0'])['imputed_total_cases'].sum().reset_index()
-    fig = px.line(
-        plot_df_cases,
-        x='Unnamed: 0',
-        y='imputed_total_cases',
-        title='Total Cases Over Time',
-        labels={'Unnamed: 0': '', 'imputed_total_cases': 'Total Cases'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Total Cases', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)
-
-# Create a function to plot deaths analysis
-def plot_deaths_analysis(df):
-    plot_df_deaths = df.groupby(['Unnamed: 0'])['imputed_total_deaths'].sum().reset_index()
-    fig = px.line(
-        plot_df_deaths,
-        x='Unnamed: 0',
-        y='imputed_total_deaths',
-        title='Total Deaths Over Time',
-        labels={'Unnamed: 0': '', 'imputed_total_deaths': 'Total Deaths'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Total Deaths', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)
 
 #Create a function to plot recovery rate over time 
-def plot_total_recovery_analysis(df):
-    plot_df_recovery = df.groupby(['Unnamed: 0'])['imputed_total_recoveries'].sum().reset_index()
-    fig = px.scatter(
-        plot_df_recovery,
-        x='Unnamed: 0',
-        y='imputed_total_recoveries',
-        title='Total recovery over Time',
-        labels={'Unnamed: 0': '', 'imputed_total_recoveries': 'Recovery Rate'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Recovery Rate', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)    
+def plot_total_recovery_analysis(dataset, granularity='auto'):
+    fig = time_series_figure(dataset, 'imputed_total_recoveries', 'Recovery Rate', kind='scatter',
+                             title='Total recovery over Time', granularity=granularity)
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
 
-# Create a function to plot vaccinations analysis
-def plot_vaccinations_analysis(df):
-    plot_df_vaccinations = df.groupby(['Unnamed: 0'])['totalVaccinations'].sum().reset_index()
-    fig = px.line(
-        plot_df_vaccinations,
-        x='Unnamed: 0',
-        y='totalVaccinations',
-        title='Total Vaccinations Over Time',
-        labels={'Unnamed: 0': '', 'totalVaccinations': 'Total Vaccinations'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Total Vaccinations', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)
 # Define the main function
 def main():
-    df = load_data()
+    # Charts are drawn from the shared dataset of the region, rolled up or downsampled and cached
+    dataset = load_data(region, store_version(region_data_path(region)))
 
     # Create a sidebar for page navigation
     page = st.sidebar.selectbox('Select a Page', ['Cases Analysis', 'Deaths Analysis', 'Vaccinations Analysis'])
+    # Long spans are drawn from the weekly/monthly rollups
+    granularity = st.sidebar.selectbox('Chart Granularity', list(GRANULARITY_LABELS), format_func=GRANULARITY_LABELS.get)
 
     if page == 'Cases Analysis':
         st.subheader('COVID-19 Cases Analysis')
-        plot_cases_analysis(df)
+        plot_cases_analysis(dataset, granularity)
 
     elif page == 'Deaths Analysis':
         st.subheader('COVID-19 Deaths Analysis')
-        plot_deaths_analysis(df)
-        plot_total_recovery_analysis(df)
+        plot_deaths_analysis(dataset, granularity)
+        plot_total_recovery_analysis(dataset, granularity)
 
     elif page == 'Vaccinations Analysis':
         st.subheader('COVID-19 Vaccinations Analysis')
-        plot_vaccinations_analysis(df)
+        plot_vaccinations_analysis(dataset, granularity)
 
 # Create a function to plot cases analysis
-def plot_cases_analysis(df):
-    plot_df_cases = df.groupby(['Unnamed: 0'])['imputed_total_cases'].sum().reset_index()
-    fig = px.line(
-        plot_df_cases,
-        x='Unnamed: 0',
-        y='imputed_total_cases',
-        title='Total Cases Over Time',
-        labels={'Unnamed: 0': '', 'imputed_total_cases': 'Total Cases'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Total Cases', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)
+def plot_cases_analysis(dataset, granularity='auto'):
+    fig = time_series_figure(dataset, 'imputed_total_cases', 'Total Cases', title='Total Cases Over Time',
+                             granularity=granularity)
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
 
 # Create a function to plot deaths analysis
-def plot_deaths_analysis(df):
-    plot_df_deaths = df.groupby(['Unnamed: 0'])['imputed_total_deaths'].sum().reset_index()
-    fig = px.line(
-        plot_df_deaths,
-        x='Unnamed: 0',
-        y='imputed_total_deaths',
-        title='Total Deaths Over Time',
-        labels={'Unnamed: 0': '', 'imputed_total_deaths': 'Total Deaths'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Total Deaths', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)
+def plot_deaths_analysis(dataset, granularity='auto'):
+    fig = time_series_figure(dataset, 'imputed_total_deaths', 'Total Deaths', title='Total Deaths Over Time',
+                             granularity=granularity)
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
 
 # Create a function to plot vaccinations analysis
-def plot_vaccinations_analysis(df):
-    plot_df_vaccinations = df.groupby(['Unnamed: 0'])['totalVaccinations'].sum().reset_index()
-    fig = px.line(
-        plot_df_vaccinations,
-        x='Unnamed: 0',
-        y='totalVaccinations',
-        title='Total Vaccinations Over Time',
-        labels={'Unnamed: 0': '', 'totalVaccinations': 'Total Vaccinations'},
-        height=600
-    )
-    fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
-    fig.update_yaxes(title_text='Total Vaccinations', title_font=dict(size=16))
-    fig.update_layout(title_font=dict(size=24))
-    st.plotly_chart(fig, use_container_width=True)
+def plot_vaccinations_analysis(dataset, granularity='auto'):
+    fig = time_series_figure(dataset, 'totalVaccinations', 'Total Vaccinations', title='Total Vaccinations Over Time',
+                             granularity=granularity)
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
 
 if __name__ == '__main__':
     main()
 
-# Create functions to display box plots
-def cases_by_stringency_index(df):
-    fig = px.box(df, x='stringency_index', y='imputed_total_cases',
-                title='Cases by Stringency Index',
-                width=800, height=800, color='stringency_index')
-    st.plotly_chart(fig)
-
-def totsl_deaths_by_stringency_index(df):
-    fig = px.box(df, x='stringency_index', y='imputed_total_deaths',
-                title='Total deaths by Stringency Index',
-                width=800, height=800, color='stringency_index')
-    st.plotly_chart(fig)     
-
-def deaths_by_reproduction_rate(df):
-    fig = px.box(df, x='reproduction_rate', y='imputed_total_deaths',
-                title='Deaths by Reproduction Rate',
-                width=800, height=800, color='reproduction_rate')
-    st.plotly_chart(fig)
+# Create functions to display box plots (binned and summarized server-side, cached per column and bin count)
+def cases_by_stringency_index(dataset):
+    fig = box_figure(dataset, 'stringency_index', 'imputed_total_cases', 'Cases by Stringency Index')
+    with span('chart.send'):
+        st.plotly_chart(fig)
+
+def totsl_deaths_by_stringency_index(dataset):
+    fig = box_figure(dataset, 'stringency_index', 'imputed_total_deaths', 'Total deaths by Stringency Index')
+    with span('chart.send'):
+        st.plotly_chart(fig)
+
+def deaths_by_reproduction_rate(dataset):
+    fig = box_figure(dataset, 'reproduction_rate', 'imputed_total_deaths', 'Deaths by Reproduction Rate')
+    with span('chart.send'):
+        st.plotly_chart(fig)
 
 # Sidebar selector for user to choose a plot
 plot_choice = st.sidebar.selectbox("Select a Plot", ["Cases by Stringency Index","Total Deaths Distribution by Stringency index", "Deaths by Reproduction Rate"])
@@ -229,12 +136,14 @@ st.sidebar.markdown("Explore the distribution of cases and deaths by selecting a
 # Display the selected plot and title
 if plot_choice == "Cases by Stringency Index":
     st.subheader("Cases Distribution by Stringency Index")
-    cases_by_stringency_index(df)
+    cases_by_stringency_index(dataset)
 
-elif plot_choice == "Deaths Distribution by Reproduction Rate":
+elif plot_choice == "Deaths by Reproduction Rate":
     st.subheader("Deaths Distribution by Reproduction Rate")
-    deaths_by_reproduction_rate(df)
+    deaths_by_reproduction_rate(dataset)
 
 else:
     st.subheader("Total Deaths Distribution by Stringency index")
-    totsl_deaths_by_stringency_index(df) 
+    totsl_deaths_by_stringency_index(dataset)
+
+debug_panel()
@@ -1,22 +1,55 @@
 import streamlit as st
 from predictions_page.model_total_death_prediction import total_death_prediction_page
 from predictions_page.model_total_case_prediction import total_case_prediction_page
+from utils.drift import drift_monitor, drift_panel
+from utils.model_loader import MODEL_PATHS, model_key, model_registry
+from utils.prediction_cache import BACKENDS, DEFAULT_BACKEND, cache_stats, contribution_cache_stats
+from utils.regions import region_selector
+from utils.tracing import debug_panel, start_page
+
+# Load both models once per process, off the request path. The NumPy backend
+# reads its own array export and does not need xgboost.
+if DEFAULT_BACKEND == 'xgboost':
+    model_registry.warm_up_in_background()
+
+BACKEND_LABELS = {'xgboost': 'XGBoost', 'numpy': 'NumPy tree evaluator'}
 
 def main():
+    start_page('model')
+
     # Sidebar for additional information
     st.sidebar.title('COVID-19 Dashboard')
     st.sidebar.image("./media/omdena_zambia_highres.png", use_container_width='always') 
     st.sidebar.write("This dashboard provides two prediction model options to predict total death and total cases.")
+    region = region_selector()
     st.sidebar.divider()
+    # Start reading the region's drift references, so its first predictions are counted
+    for model_name in MODEL_PATHS:
+        drift_monitor(model_key(model_name, region))
 
 
     st.sidebar.title("Prediction Menu")
     options = st.sidebar.radio("Select a Prediction Model:", ["Total Death Prediction", "Total Case Prediction"])
+    backend = st.sidebar.radio("Prediction backend:", BACKENDS, index=BACKENDS.index(DEFAULT_BACKEND),
+                               format_func=BACKEND_LABELS.get)
 
     if options == "Total Death Prediction":
-        total_death_prediction_page()
+        total_death_prediction_page(backend, region)
     elif options == "Total Case Prediction":
-        total_case_prediction_page()
+        total_case_prediction_page(backend, region)
+
+    drift_panel()
+
+    with st.sidebar.expander("Prediction cache"):
+        for name, stats in cache_stats().items():
+            st.caption(f"{name}: {stats['hits']} hits, {stats['misses']} misses, {stats['size']} cached")
+        for name, stats in contribution_cache_stats().items():
+            st.caption(f"{name} contributions: {stats['hits']} hits, {stats['misses']} misses, {stats['size']} cached")
+        pool = model_registry.stats()
+        st.caption(f"Model pool: {pool['models']} models, {pool['bytes'] / 2**20:.0f} of {pool['max_bytes'] / 2**20:.0f} MiB, "
+                   f"{pool['loads']} loads, {pool['evictions']} evictions")
+
+    debug_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,78 @@
+import numpy as np
+import utils.prediction_cache as prediction_cache
+from utils.prediction_cache import PredictionCache, _CachedModel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2)
+    cache.put_many(['a', 'b'], [1, 2])
+    assert cache.get_many(['a']) == [1]
+    cache.put_many(['c'], [3])
+    assert cache.get_many(['a', 'b', 'c']) == [1, None, 3]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl=10, clock=clock)
+    cache.put_many(['a'], [1])
+    clock.now = 9.5
+    assert cache.get_many(['a']) == [1]
+    clock.now = 10.0
+    assert cache.get_many(['a']) == [None]
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['size'] == 0
+
+
+def test_counts_hits_and_misses():
+    cache = PredictionCache()
+    cache.put_many(['a', 'b'], [1, 2])
+    cache.get_many(['a', 'b', 'c'])
+    cache.get_many(['a'])
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (3, 1)
+    assert stats['hit_rate'] == 0.75
+
+
+class FakeModel:
+    def __init__(self, offset):
+        self.offset = offset
+        self.calls = 0
+
+    def predict(self, matrix):
+        self.calls += 1
+        return matrix.sum(axis=1) + self.offset
+
+
+class FakeRegistry:
+    def __init__(self, model, version):
+        self.model, self.version = model, version
+
+    def get_with_version(self, model_name):
+        return self.model, self.version
+
+
+def test_flushes_when_model_version_changes(monkeypatch):
+    registry = FakeRegistry(FakeModel(0), 'version-1')
+    monkeypatch.setattr(prediction_cache, 'model_registry', registry)
+    monkeypatch.setattr(prediction_cache, 'observe', lambda model_name, matrix: None)
+    cached_model = _CachedModel('total_case')
+    rows = np.array([[1.0, 2.0], [3.0, 4.0]])
+
+    np.testing.assert_array_equal(cached_model.predict(rows, backend='xgboost'), [3, 7])
+    np.testing.assert_array_equal(cached_model.predict(rows, backend='xgboost'), [3, 7])
+    assert registry.model.calls == 1
+
+    registry.model, registry.version = FakeModel(100), 'version-2'
+    np.testing.assert_array_equal(cached_model.predict(rows, backend='xgboost'), [103, 107])
+    assert registry.model.calls == 1
+    assert cached_model.cache.stats()['size'] == 2
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+from utils.model_features import (CASE_DIFFERENCED_FEATURES, CASE_FEATURES, DEATH_DIFFERENCED_FEATURES,
+                                  DEATH_FEATURES)
+
+MODEL_FEATURES = {
+    'total_case': (CASE_FEATURES, CASE_DIFFERENCED_FEATURES),
+    'total_death': (DEATH_FEATURES, DEATH_DIFFERENCED_FEATURES),
+}
+
+
+def random_row(model_name, rng):
+    """
+    Draw a plausible input row: differenced features start at their last known
+    value, calendar features stay in range, everything else is a small positive number.
+    """
+    features, baselines = MODEL_FEATURES[model_name]
+    row = {}
+    for feature in features:
+        if feature in baselines:
+            row[feature] = baselines[feature] + rng.randint(0, 100_000)
+        elif feature == 'month':
+            row[feature] = rng.randint(1, 12)
+        elif feature == 'day_of_week':
+            row[feature] = rng.randint(0, 6)
+        else:
+            row[feature] = round(rng.uniform(0, 100), 3)
+    return row
+
+
+async def run_client(host, port, model_name, n_requests, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            body = json.dumps(random_row(model_name, rng)).encode('utf-8')
+            request = (
+                f"POST /predict/{model_name} HTTP/1.1\r\nHost: {host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+            ).encode('latin-1') + body
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if b' 200 ' not in status_line:
+                errors.append(status_line.decode('latin-1').strip())
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, model_name, concurrency, requests_per_client):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(host, port, model_name, requests_per_client, latencies, errors, seed)
+        for seed in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'model': model_name,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a running prediction service on localhost.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--model', choices=sorted(MODEL_FEATURES), default='total_case')
+    parser.add_argument('--concurrency', type=int, default=64, help="Concurrent keep-alive connections")
+    parser.add_argument('--requests', type=int, default=100, help="Requests sent by each connection")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(load_test(args.host, args.port, args.model, args.concurrency, args.requests))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
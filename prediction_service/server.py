@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import numpy as np
+from utils.batch_prediction import BATCH_MODELS
+from utils.drift import drift_monitor, drift_report
+from utils.feature_pipeline import load_pipeline
+from utils.metrics import LatencyHistogram
+from utils.model_loader import model_registry
+from utils.prediction_cache import cache_stats, predict_cached
+
+DEFAULT_MAX_BATCH_SIZE = 512
+DEFAULT_MAX_WAIT_MS = 2.0
+MAX_BODY_BYTES = 1 << 20
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class BadRequest(Exception):
+    # A request that cannot be read; answered with `status` and the connection closed
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_finite_number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        # JSON integers too large for a float
+        return False
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row requests for one model and scores them together.
+
+    The first queued row opens a batch; rows arriving within `max_wait_ms`
+    (up to `max_batch_size`) join it. The batch is preprocessed and scored in a
+    worker thread so the event loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, model_name, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.features, _, self.output_column = BATCH_MODELS[model_name]
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batch_sizes = LatencyHistogram(BATCH_SIZE_BUCKETS)
+        self.predict_latency = LatencyHistogram()
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    def validate(self, row):
+        """
+        Check that a request row has every model input as a finite number.
+
+        Raises:
+        ValueError: With a message naming the offending fields.
+        """
+        if not isinstance(row, dict):
+            raise ValueError("Each row must be a JSON object of feature values")
+        missing = [feature for feature in self.features if feature not in row]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        invalid = [feature for feature in self.features if not _is_finite_number(row[feature])]
+        if invalid:
+            raise ValueError(f"Features must be finite numbers: {invalid}")
+
+    async def predict(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            rows = [row for row, _ in batch]
+            started = time.perf_counter()
+            try:
+                predictions = await loop.run_in_executor(None, self._score, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.predict_latency.observe(time.perf_counter() - started)
+            self.batch_sizes.observe(len(batch))
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(float(prediction))
+
+    def _score(self, rows):
+        matrix = np.array([[row[feature] for feature in self.features] for row in rows], dtype=np.float64)
+        return predict_cached(self.model_name, load_pipeline(self.model_name).transform(matrix))
+
+
+class PredictionService:
+    """
+    Minimal HTTP/1.1 server (keep-alive, JSON bodies) in front of the batchers.
+
+    Endpoints:
+    POST /predict/<model>  body: one object of feature values, or {"rows": [...]}
+    GET  /health           model versions, queue depths and prediction cache counters
+    GET  /metrics          latency and batch-size histograms in Prometheus text format
+    GET  /drift            drift of the submitted inputs from the training data (see utils.drift)
+    """
+
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.batchers = {name: MicroBatcher(name, max_batch_size, max_wait_ms) for name in BATCH_MODELS}
+        self.request_latency = {name: LatencyHistogram() for name in BATCH_MODELS}
+        self.started_at = time.time()
+
+    async def start(self, host, port):
+        # Load and warm the models before accepting traffic
+        await asyncio.get_running_loop().run_in_executor(None, model_registry.warm_up)
+        for name in self.batchers:
+            drift_monitor(name)
+        for batcher in self.batchers.values():
+            batcher.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self):
+        for batcher in self.batchers.values():
+            await batcher.stop()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as e:
+                    self._write_response(writer, e.status, json.dumps({'error': str(e)}), 'application/json', False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload, content_type = await self.route(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, content_type, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, json.dumps(self.health()), 'application/json'
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics(), 'text/plain; version=0.0.4'
+        if method == 'GET' and path == '/drift':
+            return 200, json.dumps(drift_report()), 'application/json'
+        if method == 'POST' and path.startswith('/predict/'):
+            model_name = path[len('/predict/'):]
+            if model_name not in self.batchers:
+                return 404, json.dumps({'error': f"Unknown model '{model_name}'"}), 'application/json'
+            return await self.predict(model_name, body)
+        return 404, json.dumps({'error': 'Not found'}), 'application/json'
+
+    async def predict(self, model_name, body):
+        started = time.perf_counter()
+        batcher = self.batchers[model_name]
+        try:
+            payload = json.loads(body or b'null')
+            rows = payload['rows'] if isinstance(payload, dict) and 'rows' in payload else [payload]
+            if not isinstance(rows, list) or not rows:
+                raise ValueError("'rows' must be a non-empty list")
+            for row in rows:
+                batcher.validate(row)
+        except (ValueError, TypeError, OverflowError) as e:
+            return 400, json.dumps({'error': str(e)}), 'application/json'
+
+        try:
+            predictions = await asyncio.gather(*(batcher.predict(row) for row in rows))
+        except Exception as e:
+            return 500, json.dumps({'error': str(e)}), 'application/json'
+        self.request_latency[model_name].observe(time.perf_counter() - started)
+
+        if isinstance(payload, dict) and 'rows' in payload:
+            result = {batcher.output_column: predictions}
+        else:
+            result = {batcher.output_column: predictions[0]}
+        return 200, json.dumps(result), 'application/json'
+
+    def health(self):
+        caches = cache_stats()
+        return {
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'models': {
+                name: {'version': model_registry.version(name), 'queued': batcher.queue.qsize(),
+                       'cache': caches[name]}
+                for name, batcher in self.batchers.items()
+            },
+        }
+
+    def metrics(self):
+        sections = [
+            ('prediction_request_seconds', 'End-to-end latency of prediction requests', self.request_latency),
+            ('prediction_batch_seconds', 'Time to preprocess and score one micro-batch',
+             {name: batcher.predict_latency for name, batcher in self.batchers.items()}),
+            ('prediction_batch_size', 'Rows scored per micro-batch',
+             {name: batcher.batch_sizes for name, batcher in self.batchers.items()}),
+        ]
+        lines = []
+        for metric, help_text, histograms in sections:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in histograms.items():
+                lines.append(histogram.to_prometheus(metric, {'model': name}))
+        return '\n'.join(lines) + '\n'
+
+    async def _read_line(self, reader):
+        try:
+            return await reader.readline()
+        except ValueError:
+            # Longer than the StreamReader limit (64 KiB)
+            raise BadRequest(431, "Request line or header field too long")
+
+    async def _read_request(self, reader):
+        request_line = await self._read_line(reader)
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return None
+        headers = {}
+        while True:
+            line = await self._read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' not in headers:
+            if method in ('POST', 'PUT', 'PATCH'):
+                raise BadRequest(411, "Content-Length is required")
+            length = 0
+        else:
+            try:
+                length = int(headers['content-length'])
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise BadRequest(400, f"Invalid Content-Length: {headers['content-length']!r}")
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method, target.split('?', 1)[0], headers, body
+
+    def _write_response(self, writer, status, payload, content_type, keep_alive):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 411: 'Length Required', 413: 'Payload Too Large',
+                   431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+        body = payload.encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+
+async def serve(host, port, max_batch_size, max_wait_ms):
+    service = PredictionService(max_batch_size, max_wait_ms)
+    server = await service.start(host, port)
+    print(f"Serving predictions on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP prediction service for the case and death models.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Most rows scored in one model call")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="How long a batch waits for more requests before it is scored")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch_size, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
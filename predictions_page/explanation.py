@@ -0,0 +1,44 @@
+import streamlit as st
+from utils.charts import contribution_figure
+from utils.feature_pipeline import load_pipeline
+from utils.prediction_cache import explain_cached
+from utils.tracing import span
+
+# Larger sweep grids are explained with the per-path approximation instead of exact TreeSHAP
+EXACT_CONTRIBS_MAX_ROWS = 2000
+
+
+def explanation_section(model_name, preprocessed_data, target_label):
+    """
+    Show how much each input moved a single prediction.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    preprocessed_data (pd.DataFrame): The preprocessed input row.
+    target_label (str): Name of the predicted quantity.
+    """
+    features = load_pipeline(model_name).features
+    contributions = explain_cached(model_name, preprocessed_data)[0]
+    st.caption(f"The base value {contributions[-1]:.3f} plus the contributions below add up to the prediction. "
+               "Contributions are measured on the preprocessed (differenced and log-scaled) inputs.")
+    fig = contribution_figure(features, contributions, f"Feature contributions to the {target_label.lower()}")
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def sweep_explanation(model_name, contributions, approximate):
+    """
+    Show the mean absolute contribution of each input over a sweep grid.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    contributions (np.ndarray): Output of utils.scenario_sweep.sweep_contributions.
+    approximate (bool): Whether the per-path approximation was used.
+    """
+    features = load_pipeline(model_name).features
+    rows = contributions.reshape(-1, contributions.shape[-1])
+    method = "approximate (per-path)" if approximate else "exact (TreeSHAP)"
+    st.caption(f"Mean absolute {method} contribution over the {len(rows)} grid points.")
+    fig = contribution_figure(features, rows, "Feature contributions over the sweep")
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
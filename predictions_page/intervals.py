@@ -0,0 +1,26 @@
+import streamlit as st
+from utils.model_loader import split_model_key
+from utils.prediction_cache import predict_interval_cached
+from utils.regions import DEFAULT_REGION
+
+
+def interval_section(model_name, preprocessed_data, target_label):
+    """
+    Show the P10-P90 interval of a single prediction from the model's quantile boosters.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    preprocessed_data (pd.DataFrame): The preprocessed input row.
+    target_label (str): Name of the predicted quantity.
+    """
+    try:
+        quantiles, intervals = predict_interval_cached(model_name, preprocessed_data)
+    except FileNotFoundError:
+        region, name = split_model_key(model_name)
+        region_option = '' if region == DEFAULT_REGION else f" --region {region}"
+        st.warning("No interval boosters were found for this model. Train them with "
+                   f"`python train_model.py --model {name} --quantiles{region_option}`.")
+        return
+    low, middle, high = intervals[0]
+    coverage = round((quantiles[-1] - quantiles[0]) * 100)
+    st.info(f"{coverage}% interval for the {target_label.lower()}: {low: .3f} to {high: .3f} (median {middle: .3f})")
@@ -1,32 +1,43 @@
 import pandas as pd
 import streamlit as st
-from utils.preprocessing import preprocess_differencing
-from utils.model_loader import load_model_total_case
+from utils.feature_pipeline import load_pipeline
+from utils.model_features import CASE_FEATURES, preprocess_case_features
+from utils.model_loader import model_key
+from predictions_page.explanation import explanation_section
+from predictions_page.intervals import interval_section
+from predictions_page.sweep import sweep_section
+from utils.prediction_cache import DEFAULT_BACKEND, predict_cached
+from utils.regions import DEFAULT_REGION, region_label
+
+def total_case_prediction_page(backend=DEFAULT_BACKEND, region=DEFAULT_REGION):
+    # The region's model and the last known values its inputs are differenced against
+    key = model_key('total_case', region)
+    baselines = load_pipeline(key).raw_baselines()
+    as_of = "as on 21st April 2024" if region == DEFAULT_REGION else f"for {region_label(region)}"
 
-def total_case_prediction_page():
     st.title("COVID-19 Case Prediction :mask:")
 
     st.markdown("""
     ### Enter the required features to predict the total imputed COVID-19 cases.
     Please provide the values for the following features:
     """)
-    st.write("**Note:** The minimum values for 'fullyVaccinated', 'partiallyVaccinated', 'totalVaccinations' and 'totalTests' are the last known values as on 21st April 2024.")
+    st.write(f"**Note:** The minimum values for 'fullyVaccinated', 'partiallyVaccinated', 'totalVaccinations' and 'totalTests' are the last known values {as_of}.")
 
     st.divider()
 
     col1, col2 = st.columns(2)
 
     with col1:
-        fullyVaccinated = st.number_input("**fullyVaccinated**", min_value=9327654, step=1, help="Number of individuals who have completed the full vaccination regimen for COVID-19")
+        fullyVaccinated = st.number_input("**fullyVaccinated**", min_value=int(baselines['fullyVaccinated']), step=1, help="Number of individuals who have completed the full vaccination regimen for COVID-19")
         new_deaths_smoothed = st.number_input("**new_deaths_smoothed**", min_value=0.0, help="New deaths attributed to COVID-19 (7-day smoothed). Counts can include probable deaths, where reported.")
         new_people_vaccinated_smoothed = st.number_input("**new_people_vaccinated_smoothed**", min_value=0.0, help="Daily number of people receiving their first vaccine dose(7-day smoothed)")
         new_vaccinations_smoothed = st.number_input("**new_vaccinations_smoothed**", min_value=0.0, help="New COVID-19 vaccination doses administered (7-day smoothed)")
-        partiallyVaccinated = st.number_input("**partiallyVaccinated**", min_value=4663827, step=1, help="Number of individuals who have received at least one dose of a COVID-19 vaccine but have not yet completed the full vaccination regimen.")
+        partiallyVaccinated = st.number_input("**partiallyVaccinated**", min_value=int(baselines['partiallyVaccinated']), step=1, help="Number of individuals who have received at least one dose of a COVID-19 vaccine but have not yet completed the full vaccination regimen.")
         stringency_index = st.number_input("**stringency_index**", min_value=0.0, max_value=100.0, help="Government response composite measure based on 9 response indicators including school/workplace closures,and travel bans, value from 0 to 100(100=strictest)")
         test24hours = st.number_input("**test24hours**", min_value=0.0, help="Number of tests conducted in the last 24 hours")
     with col2:  
         totalTests = st.number_input("**totalTests**", min_value=4166833, help="Total number of tests for COVID-19")
-        totalVaccinations = st.number_input("**totalVaccinations**", min_value=9982068, step=1, help="Total number of COVID-19 vaccination doses administered")
+        totalVaccinations = st.number_input("**totalVaccinations**", min_value=int(baselines['totalVaccinations']), step=1, help="Total number of COVID-19 vaccination doses administered")
         vaccinated24hours = st.number_input("**vaccinated24hours**", min_value=0.0, help="Number of people vaccinated within a 24-hour period")
         rfh = st.number_input("**rfh**", min_value=0.0, step=0.001, help="10 day rainfall in mm")
         r3h = st.number_input("**r3h**", min_value=0.0, step=0.001, help="Rainfall 1-month rolling aggregation long term average in mm")
@@ -52,22 +63,28 @@ def total_case_prediction_page():
             'day_of_week': [day_of_week],
             })
 
-    differenced_features = {
-        'fullyVaccinated': 9327654, 'partiallyVaccinated': 4663827, 'totalTests': 239937354,
-        'totalVaccinations': 9982068
-    }
+    mode = st.radio("**Mode**", ["Single prediction", "Sweep"], horizontal=True, key="total_case_mode")
+    if mode == "Sweep":
+        sweep_section(key, input_df, CASE_FEATURES, baselines, "Predicted Total Imputed Cases")
+        return
 
-    differencing_data = pd.DataFrame([differenced_features])
+    preprocessed_data = preprocess_case_features(input_df, region)
 
-    preprocessed_data = preprocess_differencing(input_df, differencing_data)
+    explain = st.checkbox("Explain prediction", key="total_case_explain",
+                          help="Show how much each input moved the prediction")
+    interval = st.checkbox("Show prediction interval", key="total_case_interval",
+                           help="P10-P90 range from the model's quantile boosters")
 
     if st.button("Predict"):
         try:
-            model = load_model_total_case()
             st.write("**You have submitted the below data.**")
             st.write(input_df)
-            prediction = model.predict(preprocessed_data)
+            prediction = predict_cached(key, preprocessed_data, backend)
             st.success(f"Predicted Total Imputed Cases: {prediction[0]: .3f}")
+            if interval:
+                interval_section(key, preprocessed_data, "Predicted Total Imputed Cases")
+            if explain:
+                explanation_section(key, preprocessed_data, "Predicted Total Imputed Cases")
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
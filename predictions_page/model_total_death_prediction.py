@@ -1,17 +1,27 @@
 import pandas as pd
 import streamlit as st
-import numpy as np
-from utils.preprocessing import preprocess_differencing, preprocess_log
-from utils.model_loader import load_model_total_death
+from utils.feature_pipeline import load_pipeline
+from utils.model_features import DEATH_FEATURES, preprocess_death_features
+from utils.model_loader import model_key
+from predictions_page.explanation import explanation_section
+from predictions_page.intervals import interval_section
+from predictions_page.sweep import sweep_section
+from utils.prediction_cache import DEFAULT_BACKEND, predict_cached
+from utils.regions import DEFAULT_REGION, region_label
+
+def total_death_prediction_page(backend=DEFAULT_BACKEND, region=DEFAULT_REGION):
+    # The region's model and the last known values its inputs are differenced against
+    key = model_key('total_death', region)
+    baselines = load_pipeline(key).raw_baselines()
+    as_of = "as on 21st April 2024" if region == DEFAULT_REGION else f"for {region_label(region)}"
 
-def total_death_prediction_page():
     st.title("COVID-19 Total Death Prediction :mask:")
 
     st.markdown("""
     ### Enter the required features to predict the total deaths from COVID-19.
     Please provide the values for the following features:
     """)
-    st.write("**Note:** The minimum values for 'fullyVaccinated', 'partiallyVaccinated' and 'totalVaccinations' are the last known values as on 21st April 2024.")
+    st.write(f"**Note:** The minimum values for 'fullyVaccinated', 'partiallyVaccinated' and 'totalVaccinations' are the last known values {as_of}.")
 
     st.divider()
 
@@ -20,12 +30,12 @@ def total_death_prediction_page():
     with col1:
         
         imputed_active_cases = st.number_input("**imputed_active_cases**", min_value=0.0, help="Estimate of the number of active COVID-19 cases at a given time")
-        fullyVaccinated = st.number_input("**fullyVaccinated**", min_value=9327654, value=9327654, step=1, help="Number of individuals who have completed the full vaccination regimen for COVID-19")
+        fullyVaccinated = st.number_input("**fullyVaccinated**", min_value=int(baselines['fullyVaccinated']), step=1, help="Number of individuals who have completed the full vaccination regimen for COVID-19")
         new_vaccinations_smoothed = st.number_input("**new_vaccinations_smoothed**", min_value=0.0, help="New COVID-19 vaccination doses administered (7-day smoothed)")
-        partiallyVaccinated = st.number_input("**partiallyVaccinated**", min_value=4663827, value=4663827, step=1, help="Number of individuals who have received at least one dose of a COVID-19 vaccine but have not yet completed the full vaccination regimen.")
+        partiallyVaccinated = st.number_input("**partiallyVaccinated**", min_value=int(baselines['partiallyVaccinated']), step=1, help="Number of individuals who have received at least one dose of a COVID-19 vaccine but have not yet completed the full vaccination regimen.")
         stringency_index = st.number_input("**stringency_index**", min_value=0.0, step=0.001, max_value=100.0, help="Government response composite measure based on 9 response indicators including school/workplace closures,and travel bans, value from 0 to 100(100=strictest)")
         test24hours = st.number_input("**test24hours**", min_value=0, help="Number of tests conducted in the last 24 hours")
-        totalVaccinations = st.number_input("**totalVaccinations**", min_value=9982068, value=9982068, step=1, help="Total number of COVID-19 vaccination doses administered")
+        totalVaccinations = st.number_input("**totalVaccinations**", min_value=int(baselines['totalVaccinations']), step=1, help="Total number of COVID-19 vaccination doses administered")
 
     with col2:  
         
@@ -58,29 +68,27 @@ def total_death_prediction_page():
 
     st.markdown("**Note:** The non-stationary features are differenced to make the data stationary.")
 
-    differenced_features = {
-        'fullyVaccinated': 9327654, 'partiallyVaccinated': 4663827, 'stringency_index': 13.89,
-        'totalVaccinations': 9982068
-    }
-
-    log_feature = {'total_tests_per_thousand': 180}
-
-    log_series = pd.Series(log_feature)
-
-    differencing_data = pd.DataFrame([differenced_features])
+    mode = st.radio("**Mode**", ["Single prediction", "Sweep"], horizontal=True, key="total_death_mode")
+    if mode == "Sweep":
+        sweep_section(key, input_df, DEATH_FEATURES, baselines, "Predicted Total Deaths")
+        return
 
-    preprocessed_data = preprocess_differencing(input_df, differencing_data)
+    preprocessed_data = preprocess_death_features(input_df, region)
 
-    for feature in log_feature.keys():
-        preprocessed_data[feature] = preprocess_log(preprocessed_data[feature], log_series[feature])
+    explain = st.checkbox("Explain prediction", key="total_death_explain",
+                          help="Show how much each input moved the prediction")
+    interval = st.checkbox("Show prediction interval", key="total_death_interval",
+                           help="P10-P90 range from the model's quantile boosters")
 
     if st.button("Predict"):
         try:
-            model = load_model_total_death()
             st.write("**You have submitted the below data.**")
             st.write(input_df)
-            # prediction = predict_total_deaths(preprocessed_data)
-            prediction = model.predict(preprocessed_data)
+            prediction = predict_cached(key, preprocessed_data, backend)
             st.success(f"Predicted Total Deaths: {prediction[0]: .3f}")
+            if interval:
+                interval_section(key, preprocessed_data, "Predicted Total Deaths")
+            if explain:
+                explanation_section(key, preprocessed_data, "Predicted Total Deaths")
         except Exception as e:
             st.error(f"An error occurred: {e}")
@@ -0,0 +1,106 @@
+import math
+
+import pandas as pd
+import streamlit as st
+from predictions_page.explanation import EXACT_CONTRIBS_MAX_ROWS, sweep_explanation
+from utils.bootstrap import px
+from utils.dataset import get_dataset
+from utils.model_loader import split_model_key
+from utils.regions import DEFAULT_REGION, region_data_path
+from utils.scenario_sweep import MAX_SWEEP_FEATURES, MAX_SWEEP_POINTS, sweep, sweep_contributions
+from utils.tracing import span
+
+# Natural ranges of the calendar features, which are not stored in the dataset
+CALENDAR_RANGES = {'month': (1, 12), 'day_of_week': (0, 6)}
+
+
+def default_range(feature, base_value, baselines, region=DEFAULT_REGION):
+    """
+    Suggest a sweep range for a feature: its historical range in the region,
+    shifted to start at the last known value for differenced features.
+    """
+    if feature in CALENDAR_RANGES:
+        return CALENDAR_RANGES[feature]
+    frame = get_dataset(region_data_path(region)).frame
+    if feature not in frame:
+        return float(base_value), float(base_value) * 2 + 1
+    low, high = float(frame[feature].min()), float(frame[feature].max())
+    if feature in baselines:
+        return float(baselines[feature]), float(baselines[feature]) + (high - low)
+    return low, high
+
+
+def sweep_section(model_name, input_df, features, baselines, target_label):
+    """
+    Render the sweep mode of a prediction page: pick up to three features and
+    their ranges, predict over the whole grid, and plot a line or a heatmap.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    input_df (pd.DataFrame): The single-row input entered on the page, used for the features that are not swept.
+    features (list): The model's input features.
+    baselines (dict): Last known values of the differenced features.
+    target_label (str): Name of the predicted quantity.
+    """
+    st.markdown("### Sweep features")
+    st.write("Choose up to three features and their ranges. All other features keep the values entered above.")
+
+    swept = st.multiselect("**Features to sweep**", features, max_selections=MAX_SWEEP_FEATURES,
+                           key=f"{model_name}_sweep_features")
+    if not swept:
+        return
+
+    base_inputs = input_df.iloc[0].to_dict()
+    ranges = {}
+    for feature in swept:
+        low, high = default_range(feature, base_inputs[feature], baselines, split_model_key(model_name)[0])
+        col1, col2, col3 = st.columns(3)
+        start = col1.number_input(f"{feature} from", value=low, key=f"{model_name}_{feature}_start")
+        stop = col2.number_input(f"{feature} to", value=high, key=f"{model_name}_{feature}_stop")
+        num = col3.number_input(f"{feature} steps", min_value=2, max_value=500, value=100, key=f"{model_name}_{feature}_num")
+        ranges[feature] = (start, stop, num)
+
+    explain = st.checkbox("Explain sweep", key=f"{model_name}_sweep_explain",
+                          help="Show which inputs drive the predictions over the grid")
+
+    n_points = math.prod(int(num) for _, _, num in ranges.values())
+    too_large = n_points > MAX_SWEEP_POINTS
+    if too_large:
+        st.warning(f"The grid has {n_points:,} points; reduce the steps to at most {MAX_SWEEP_POINTS:,} points in total.")
+
+    state_key = f"{model_name}_sweep_result"
+    explanation_key = f"{model_name}_sweep_contributions"
+    if st.button("Run Sweep", disabled=too_large):
+        try:
+            st.session_state[state_key] = sweep(model_name, base_inputs, ranges)
+            st.session_state.pop(explanation_key, None)
+            if explain:
+                approximate = n_points > EXACT_CONTRIBS_MAX_ROWS
+                _, contributions = sweep_contributions(model_name, base_inputs, ranges, approximate)
+                st.session_state[explanation_key] = (contributions, approximate)
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+
+    if state_key not in st.session_state:
+        return
+    axes, predictions = st.session_state[state_key]
+    names = list(axes)
+
+    if len(names) == 1:
+        plot_df = pd.DataFrame({names[0]: axes[names[0]], target_label: predictions})
+        fig = px.line(plot_df, x=names[0], y=target_label, title=f"{target_label} by {names[0]}")
+    else:
+        grid = predictions
+        title = f"{target_label} by {names[0]} and {names[1]}"
+        if len(names) == 3:
+            third = st.select_slider(f"**{names[2]}**", options=list(range(len(axes[names[2]]))),
+                                     format_func=lambda i: f"{axes[names[2]][i]:.3f}", key=f"{model_name}_sweep_third")
+            grid = predictions[:, :, third]
+            title += f" at {names[2]} = {axes[names[2]][third]:.3f}"
+        fig = px.imshow(grid.T, x=axes[names[0]], y=axes[names[1]], origin='lower', aspect='auto',
+                        labels={'x': names[0], 'y': names[1], 'color': target_label}, title=title)
+    with span('chart.send'):
+        st.plotly_chart(fig, use_container_width=True)
+
+    if explain and explanation_key in st.session_state:
+        sweep_explanation(model_name, *st.session_state[explanation_key])
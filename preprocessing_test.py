@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+from utils.preprocessing import preprocess_differencing, preprocess_log
+
+
+def test_differencing_clips_each_row():
+    inputs = pd.DataFrame({'totalTests': [50.0, 100.0, 180.0], 'month': [1, 2, 3]})
+    known = pd.DataFrame({'totalTests': [100.0]})
+    result = preprocess_differencing(inputs.copy(), known)
+    np.testing.assert_array_equal(result['totalTests'], [0.0, 0.0, 80.0])
+    np.testing.assert_array_equal(result['month'], [1, 2, 3])
+
+    # A row gets the same value in a batch as on its own
+    for row in range(len(inputs)):
+        alone = preprocess_differencing(inputs.iloc[[row]].copy(), known)
+        assert alone['totalTests'].iloc[0] == result['totalTests'].iloc[row]
+
+
+def test_log_differencing_clips_each_row():
+    result = preprocess_log(pd.Series([90.0, 180.0, 360.0]), 180)
+    np.testing.assert_allclose(result, [0.0, 0.0, np.log1p(360) - np.log1p(180)])
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from utils.range_query import RangeQueryIndex
+
+
+def sample_frame(n_rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    noisy = rng.normal(size=n_rows)
+    noisy[rng.random(n_rows) < 0.1] = np.nan
+    return pd.DataFrame({
+        'date': pd.date_range('2021-01-01', periods=n_rows),
+        'total': np.cumsum(rng.integers(0, 10, n_rows)).astype(np.float64),
+        'noisy': noisy,
+        'gap': np.where(np.arange(n_rows) % 50 < 20, np.nan, rng.normal(size=n_rows)),
+    })
+
+
+def test_matches_pandas_over_random_ranges():
+    frame = sample_frame()
+    columns = ['total', 'noisy', 'gap']
+    index = RangeQueryIndex(frame['date'], frame, columns)
+    assert 'total' in index._monotonic
+
+    rng = np.random.default_rng(1)
+    for _ in range(500):
+        start, end = sorted(rng.integers(-10, len(frame) + 10, size=2))
+        start_date = pd.Timestamp('2021-01-01') + pd.Timedelta(days=int(start))
+        end_date = pd.Timestamp('2021-01-01') + pd.Timedelta(days=int(end))
+        filtered_df = frame[(frame['date'] >= start_date) & (frame['date'] <= end_date)][columns]
+        for statistic in ('max', 'min', 'sum'):
+            expected = getattr(filtered_df, statistic)()
+            result = index.query(start_date, end_date, statistic)
+            for column in columns:
+                np.testing.assert_allclose(result[column], expected[column], rtol=1e-12, atol=1e-9)
+
+
+def test_empty_range_gives_nan():
+    frame = sample_frame(n_rows=30)
+    index = RangeQueryIndex(frame['date'], frame, ['total', 'noisy'])
+    for start_date, end_date in [('2020-01-01', '2020-12-31'), ('2021-01-10', '2021-01-05'), ('2030-01-01', '2030-02-01')]:
+        assert np.isnan(index.max('total', start_date, end_date))
+        assert np.isnan(index.min('noisy', start_date, end_date))
+        assert index.sum('noisy', start_date, end_date) == 0
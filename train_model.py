@@ -0,0 +1,348 @@
+import argparse
+import itertools
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from utils.data_loader import store_version
+from utils.model_loader import MODEL_PATHS, native_model_path
+from utils.regions import DEFAULT_REGION, region_data_path, region_model_dir
+from utils.training import TARGETS, training_data
+from utils.tree_evaluator import export_model_arrays, export_quantile_arrays, quantile_model_path, quantile_report_path
+
+# Parameters of the shipped models, used as they are when the search is skipped
+BASE_PARAMS = {'objective': 'reg:squarederror', 'tree_method': 'hist', 'eta': 0.3, 'max_depth': 6, 'seed': 0}
+BASE_ROUNDS = {'total_case': 1500, 'total_death': 1400}
+
+# Hyperparameter grid. Each combination is trained once per fold up to the
+# largest round count; the smaller round counts are scored from the same booster.
+PARAM_GRID = {'eta': [0.05, 0.1, 0.3], 'max_depth': [4, 6]}
+ROUND_CANDIDATES = [300, 700, 1000, 1500]
+
+DEFAULT_FOLDS = 5
+
+# Quantile boosters served as the prediction interval (P10, P50, P90)
+QUANTILES = (0.1, 0.5, 0.9)
+QUANTILE_ROUNDS = 300
+QUANTILE_PARAMS = {**BASE_PARAMS, 'objective': 'reg:quantileerror'}
+
+
+def walk_forward_folds(n_rows, n_folds=DEFAULT_FOLDS):
+    """
+    Split rows in time order into expanding-window folds: fold k trains on
+    everything before its validation block and validates on the next block.
+
+    Parameters:
+    n_rows (int): Number of rows, oldest first.
+    n_folds (int): Number of folds.
+
+    Returns:
+    list: (train_end, validation_end) row bounds per fold.
+    """
+    block = n_rows // (n_folds + 1)
+    if block == 0:
+        raise ValueError(f"{n_rows} rows are too few for {n_folds} folds")
+    return [(block * (k + 1), block * (k + 2) if k < n_folds - 1 else n_rows) for k in range(n_folds)]
+
+
+def param_grid(grid=PARAM_GRID):
+    """
+    Expand a grid of parameter lists into every combination.
+
+    Returns:
+    list: One dict of parameters per combination.
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+# Per-process cache of the fold matrices, filled lazily in each worker
+_worker_data = {}
+_fold_matrices = {}
+
+
+def _init_worker(X, y, folds, nthread):
+    _worker_data.update(X=X, y=y, folds=folds, nthread=nthread)
+    _fold_matrices.clear()
+
+
+def _fold_dmatrices(fold):
+    # Quantile sketches of the training block are computed once per fold and reused by every combination
+    if fold not in _fold_matrices:
+        X, y = _worker_data['X'], _worker_data['y']
+        train_end, validation_end = _worker_data['folds'][fold]
+        dtrain = xgb.QuantileDMatrix(X[:train_end], y[:train_end], nthread=_worker_data['nthread'])
+        dvalidation = xgb.DMatrix(X[train_end:validation_end], nthread=_worker_data['nthread'])
+        _fold_matrices[fold] = (dtrain, dvalidation, y[train_end:validation_end])
+    return _fold_matrices[fold]
+
+
+def _score_task(params, fold, rounds):
+    dtrain, dvalidation, y_validation = _fold_dmatrices(fold)
+    booster = xgb.train({**BASE_PARAMS, **params, 'nthread': _worker_data['nthread']}, dtrain, max(rounds))
+    scores = {}
+    for n_rounds in rounds:
+        errors = booster.predict(dvalidation, iteration_range=(0, n_rounds)) - y_validation
+        scores[n_rounds] = (float(np.sqrt(np.mean(errors ** 2))), float(np.mean(np.abs(errors))))
+    return scores
+
+
+def search(X, y, folds, grid=None, rounds=ROUND_CANDIDATES, workers=None):
+    """
+    Score every parameter combination on every walk-forward fold in parallel.
+
+    Each (combination, fold) pair is one task on a process pool. Cores are
+    split between the workers, so every booster trains with `hist` on
+    cores // workers threads.
+
+    Parameters:
+    X (np.ndarray): Training features, oldest row first.
+    y (np.ndarray): Targets.
+    folds (list): Output of walk_forward_folds.
+    grid (list): Parameter combinations. Defaults to param_grid().
+    rounds (list): Boosting round counts to score.
+    workers (int): Worker processes. Defaults to the number of cores.
+
+    Returns:
+    list: One dict per combination and round count with the mean validation
+          RMSE and MAE over the folds, best first.
+    """
+    grid = param_grid() if grid is None else grid
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    nthread = max(1, cores // workers)
+    tasks = [(index, fold) for index in range(len(grid)) for fold in range(len(folds))]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, folds, nthread)) as pool:
+        futures = [pool.submit(_score_task, grid[index], fold, list(rounds)) for index, fold in tasks]
+        fold_scores = [future.result() for future in futures]
+
+    results = []
+    for index, params in enumerate(grid):
+        per_fold = [scores for (task_index, _), scores in zip(tasks, fold_scores) if task_index == index]
+        for n_rounds in rounds:
+            results.append({
+                'params': params,
+                'rounds': n_rounds,
+                'rmse': float(np.mean([scores[n_rounds][0] for scores in per_fold])),
+                'mae': float(np.mean([scores[n_rounds][1] for scores in per_fold])),
+            })
+    return sorted(results, key=lambda result: (result['rmse'], result['rounds']))
+
+
+def fit_model(X, y, features, params, rounds, nthread=None):
+    """
+    Train the final model on all rows.
+
+    Returns:
+    xgboost.XGBRegressor: The fitted model, with feature names.
+    """
+    model = xgb.XGBRegressor(n_estimators=rounds, n_jobs=nthread or os.cpu_count(), **{**BASE_PARAMS, **params})
+    model.fit(pd.DataFrame(X, columns=features), y)
+    return model
+
+
+def save_model(model, model_name, report, output_dir):
+    """
+    Write the model as a pickle and a native .ubj file, plus a JSON training report,
+    and re-export its tree arrays so the numpy backend serves the new model.
+
+    Returns:
+    list: The paths that were written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pickle_path = os.path.join(output_dir, os.path.basename(MODEL_PATHS[model_name]))
+    with open(pickle_path, 'wb') as file:
+        pickle.dump(model, file)
+    native_path = native_model_path(pickle_path)
+    model.save_model(native_path)
+    report_path = os.path.splitext(pickle_path)[0] + '.training.json'
+    with open(report_path, 'w') as file:
+        json.dump(report, file, indent=2)
+        file.write('\n')
+    return [pickle_path, native_path, report_path, export_model_arrays(model_name, output_dir)]
+
+
+def train(model_name, n_folds=DEFAULT_FOLDS, workers=None, run_search=True, output_dir=None, region=DEFAULT_REGION):
+    """
+    Rebuild one model from the dataset: search hyperparameters with
+    walk-forward folds, then fit the best combination on all rows.
+    The model is written to the region's model folder unless `output_dir` is given.
+
+    Returns:
+    dict: The training report that was saved next to the model.
+    """
+    output_dir = output_dir or region_model_dir(region)
+    X, y, features = training_data(model_name, region=region)
+    params, rounds, results = {}, BASE_ROUNDS[model_name], []
+    started = time.perf_counter()
+    if run_search:
+        folds = walk_forward_folds(len(X), n_folds)
+        results = search(X, y, folds, workers=workers)
+        params, rounds = results[0]['params'], results[0]['rounds']
+    search_seconds = time.perf_counter() - started
+
+    model = fit_model(X, y, features, params, rounds)
+    report = {
+        'model': model_name,
+        'region': region,
+        'target': TARGETS[model_name],
+        'features': features,
+        'params': {**BASE_PARAMS, **params},
+        'rounds': rounds,
+        'rows': len(X),
+        'data_version': store_version(region_data_path(region)),
+        'xgboost_version': xgb.__version__,
+        'search_seconds': round(search_seconds, 3),
+        'cv': results[:10],
+    }
+    report['written'] = save_model(model, model_name, report, output_dir)
+    return report
+
+
+def fit_quantile_boosters(X, y, features, quantiles=QUANTILES, rounds=QUANTILE_ROUNDS, nthread=None):
+    """
+    Train one quantile-loss booster per quantile on the same quantized matrix.
+
+    Returns:
+    list: One xgboost.Booster per quantile, with feature names.
+    """
+    nthread = nthread or os.cpu_count()
+    dtrain = xgb.QuantileDMatrix(X, y, feature_names=features, nthread=nthread)
+    return [
+        xgb.train({**QUANTILE_PARAMS, 'quantile_alpha': quantile, 'nthread': nthread}, dtrain, rounds)
+        for quantile in quantiles
+    ]
+
+
+def conformal_margin(X, y, features, quantiles=QUANTILES, rounds=QUANTILE_ROUNDS, n_folds=DEFAULT_FOLDS):
+    """
+    Calibrate the outer quantiles on the last walk-forward fold (conformalized
+    quantile regression): boosters trained before the fold predict it, and the
+    interval is widened by the score quantile that restores the nominal coverage.
+
+    Returns:
+    dict: 'margin' (added below the lowest and above the highest quantile),
+          'raw_coverage' of the uncalibrated interval on the fold and 'calibration_rows'.
+    """
+    train_end, validation_end = walk_forward_folds(len(X), n_folds)[-1]
+    boosters = fit_quantile_boosters(X[:train_end], y[:train_end], features, (quantiles[0], quantiles[-1]), rounds)
+    dvalidation = xgb.DMatrix(X[train_end:validation_end], feature_names=features)
+    lower, upper = np.sort([booster.predict(dvalidation) for booster in boosters], axis=0)
+    y_validation = y[train_end:validation_end]
+
+    scores = np.maximum(lower - y_validation, y_validation - upper)
+    n = len(scores)
+    level = min(1.0, np.ceil((n + 1) * (quantiles[-1] - quantiles[0])) / n)
+    return {
+        'margin': max(0.0, float(np.quantile(scores, level, method='higher'))),
+        'raw_coverage': float(np.mean((y_validation >= lower) & (y_validation <= upper))),
+        'calibration_rows': n,
+    }
+
+
+def train_quantiles(model_name, n_folds=DEFAULT_FOLDS, rounds=QUANTILE_ROUNDS, output_dir=None, region=DEFAULT_REGION):
+    """
+    Train the interval boosters of one model, calibrate them and write them
+    next to the model with a stacked NumPy export for serving.
+
+    Returns:
+    dict: The training report that was saved next to the boosters.
+    """
+    output_dir = output_dir or region_model_dir(region)
+    X, y, features = training_data(model_name, region=region)
+    started = time.perf_counter()
+    calibration = conformal_margin(X, y, features, QUANTILES, rounds, n_folds)
+    boosters = fit_quantile_boosters(X, y, features, QUANTILES, rounds)
+
+    os.makedirs(output_dir, exist_ok=True)
+    pickle_path = os.path.join(output_dir, os.path.basename(MODEL_PATHS[model_name]))
+    written = []
+    for quantile, booster in zip(QUANTILES, boosters):
+        path = quantile_model_path(pickle_path, quantile)
+        booster.save_model(path)
+        written.append(path)
+
+    report = {
+        'model': model_name,
+        'region': region,
+        'target': TARGETS[model_name],
+        'features': features,
+        'quantiles': list(QUANTILES),
+        'params': QUANTILE_PARAMS,
+        'rounds': rounds,
+        'rows': len(X),
+        **calibration,
+        'data_version': store_version(region_data_path(region)),
+        'xgboost_version': xgb.__version__,
+        'train_seconds': round(time.perf_counter() - started, 3),
+    }
+    report_path = quantile_report_path(pickle_path)
+    with open(report_path, 'w') as file:
+        json.dump(report, file, indent=2)
+        file.write('\n')
+    written += [report_path, export_quantile_arrays(model_name, output_dir)]
+    report['written'] = written
+    return report
+
+
+def scaling_report(model_name, n_folds=DEFAULT_FOLDS, max_workers=None):
+    """
+    Time the hyperparameter search with 1, 2, 4, ... worker processes up to all cores.
+
+    Returns:
+    list: One dict per worker count with seconds and speedup over one worker.
+    """
+    X, y, _ = training_data(model_name)
+    folds = walk_forward_folds(len(X), n_folds)
+    cores = max_workers or os.cpu_count() or 1
+    counts = sorted({1, cores} | {2 ** power for power in range(cores.bit_length()) if 2 ** power <= cores})
+
+    report = []
+    for workers in counts:
+        started = time.perf_counter()
+        search(X, y, folds, workers=workers)
+        seconds = time.perf_counter() - started
+        baseline = report[0]['seconds'] if report else seconds
+        report.append({'workers': workers, 'seconds': round(seconds, 3), 'speedup': round(baseline / seconds, 2)})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the case and death models from the dataset.")
+    parser.add_argument('--model', choices=sorted(TARGETS), help="Model to train. Defaults to both.")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help="Walk-forward folds")
+    parser.add_argument('--workers', type=int, default=None, help="Search processes. Defaults to all cores.")
+    parser.add_argument('--no-search', action='store_true', help="Train with the parameters of the shipped models")
+    parser.add_argument('--region', default=DEFAULT_REGION, help="Train on this region's data (see utils.regions)")
+    parser.add_argument('--output-dir', default=None,
+                        help="Where the models are written. Defaults to the region's model folder ('model' for the default region)")
+    parser.add_argument('--scaling', action='store_true',
+                        help="Only time the search from 1 worker to all cores; no model is written")
+    parser.add_argument('--quantiles', action='store_true',
+                        help="Train the P10/P50/P90 interval boosters instead of the point model")
+    args = parser.parse_args(argv)
+
+    for model_name in [args.model] if args.model else sorted(TARGETS):
+        if args.quantiles:
+            report = train_quantiles(model_name, args.folds, output_dir=args.output_dir, region=args.region)
+            print(f"{model_name}: quantiles {report['quantiles']}, margin {report['margin']:.3f} "
+                  f"(raw coverage {report['raw_coverage']:.2f}) -> {', '.join(report['written'])}")
+            continue
+        if args.scaling:
+            print(f"{model_name}: search wall-clock by worker count")
+            for row in scaling_report(model_name, args.folds, args.workers):
+                print(f"  {row['workers']:>3} workers  {row['seconds']:>9.2f} s  x{row['speedup']}")
+            continue
+        report = train(model_name, args.folds, args.workers, not args.no_search, args.output_dir, args.region)
+        best = f", CV RMSE {report['cv'][0]['rmse']:.3f}" if report['cv'] else ''
+        print(f"{model_name}: {report['params']} x {report['rounds']} rounds{best} -> {', '.join(report['written'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from utils.batch_prediction import BATCH_MODELS
+from utils.feature_pipeline import load_pipeline
+from utils.model_loader import MODEL_PATHS, model_registry
+from utils.tree_evaluator import TreeEnsemble, load_quantile_ensemble, load_tree_ensemble, quantile_model_path
+
+
+def preprocessed_rows(model_name, n_rows=2000, seed=0):
+    # Random raw inputs on both sides of the differencing baselines, with some missing values
+    pipeline = load_pipeline(model_name)
+    scale = np.full(len(pipeline.features), 10.0)
+    for step in pipeline.steps:
+        scale[step.positions] = np.maximum(step.raw_baselines, 1.0)
+    rng = np.random.default_rng(seed)
+    X = pipeline.transform(rng.uniform(0, 2, size=(n_rows, len(scale))) * scale)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def test_evaluator_matches_xgboost(model_name):
+    model = model_registry.get(model_name)
+    X = preprocessed_rows(model_name)
+    ensemble = TreeEnsemble.from_booster(model.get_booster())
+    np.testing.assert_allclose(ensemble.predict(X), model.predict(X), rtol=1e-6, atol=1e-4)
+
+
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def test_exported_arrays_match_model(model_name):
+    model = model_registry.get(model_name)
+    X = preprocessed_rows(model_name, n_rows=200, seed=1)
+    ensemble = load_tree_ensemble(model_name)
+    np.testing.assert_allclose(ensemble.predict(X), model.predict(X), rtol=1e-6, atol=1e-4)
+    np.testing.assert_allclose(ensemble.predict(X[0]), model.predict(X[:1]), rtol=1e-6, atol=1e-4)
+
+
+@pytest.mark.parametrize('model_name', sorted(BATCH_MODELS))
+def test_stacked_quantile_boosters_match_xgboost(model_name):
+    import xgboost as xgb
+
+    ensemble, quantiles, _ = load_quantile_ensemble(model_name)
+    X = preprocessed_rows(model_name, n_rows=500, seed=2)
+    predictions = ensemble.predict(X)
+    assert predictions.shape == (len(X), len(quantiles))
+    for member, quantile in enumerate(quantiles):
+        booster = xgb.Booster()
+        booster.load_model(quantile_model_path(MODEL_PATHS[model_name], quantile))
+        expected = booster.predict(xgb.DMatrix(X, feature_names=booster.feature_names))
+        np.testing.assert_allclose(predictions[:, member], expected, rtol=1e-6, atol=1e-4)
@@ -0,0 +1,247 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from utils.data_loader import CACHE_DIR, store_version
+from utils.dataset import get_dataset
+from utils.feature_pipeline import load_pipeline
+from utils.forecasting import DEFAULT_RECOVERY_DAYS, SMOOTHING_DAYS, advance_day
+from utils.model_loader import model_key, model_registry
+from utils.regions import DEFAULT_REGION, region_data_path
+from utils.tracing import span
+from utils.training import TARGETS
+
+# Inputs the forecaster fills in from its own predictions instead of the history
+FED_BACK_FEATURES = ('new_deaths_smoothed', 'imputed_active_cases')
+
+DEFAULT_HORIZON = 28
+
+
+def history_columns(region=DEFAULT_REGION):
+    """
+    Return the columns of a region's history matrix: the raw inputs of both
+    models, their targets and the daily deaths.
+    """
+    columns = []
+    for model_name in TARGETS:
+        columns += [feature for feature in load_pipeline(model_key(model_name, region)).features if feature not in columns]
+    return columns + list(TARGETS.values()) + ['daily_deaths']
+
+
+def history_matrix(frame, columns):
+    """
+    Stack the daily rows of the dataset into one float64 matrix.
+
+    Parameters:
+    frame (pd.DataFrame): Date-sorted daily rows.
+    columns (list): See history_columns. 'month' and 'day_of_week' come from the
+                    date, 'daily_deaths' from the increase of the total deaths.
+
+    Returns:
+    np.ndarray: Shape (n_days, n_columns), oldest day first.
+    """
+    dates = pd.DatetimeIndex(frame['date'])
+    derived = {
+        'month': dates.month,
+        'day_of_week': dates.dayofweek,
+        'daily_deaths': frame['imputed_total_deaths'].diff().clip(lower=0).fillna(0),
+    }
+    return np.column_stack([
+        np.asarray(derived[column] if column in derived else frame[column], dtype=np.float64) for column in columns
+    ])
+
+
+def history_path(columns, path):
+    """
+    Return the path of a stored history matrix, keyed by the store version of
+    the source data and the columns.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    version = hashlib.sha256(f"{store_version(path)}|{','.join(columns)}".encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{stem}-{version}.backtest.npy")
+
+
+def store_history(region=DEFAULT_REGION):
+    """
+    Write the history matrix of a region to data/.cache, once per store version,
+    so the workers can memory-map it instead of receiving a copy.
+
+    Returns:
+    tuple: (path of the .npy file, its columns).
+    """
+    data_path = region_data_path(region)
+    columns = history_columns(region)
+    target = history_path(columns, data_path)
+    if not os.path.exists(target):
+        matrix = history_matrix(get_dataset(data_path).frame, columns)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, matrix)
+        os.replace(tmp_path, target)
+    return target, columns
+
+
+# Per-process state, filled by _init_worker in each worker (or in the caller when running in-process)
+_worker_data = {}
+
+
+def _init_worker(path, columns, region, horizon, recovery_days, nthread=None):
+    models = []
+    for model_name in TARGETS:
+        key = model_key(model_name, region)
+        model = model_registry.get(key)
+        if nthread is not None:
+            model.get_booster().set_param({'nthread': nthread})
+        models.append((model, load_pipeline(key)))
+
+    _worker_data.update(
+        history=np.load(path, mmap_mode='r'),
+        positions={column: position for position, column in enumerate(columns)},
+        inputs=[column for column in columns if column not in (*FED_BACK_FEATURES, *TARGETS.values(), 'daily_deaths')],
+        models=tuple(models),
+        horizon=horizon,
+        recovery_days=recovery_days,
+    )
+
+
+def _replay(origins):
+    # Forecast `horizon` days from every origin at once: each day is one model call per model over all origins
+    history, positions = _worker_data['history'], _worker_data['positions']
+    horizon = _worker_data['horizon']
+    n_days = len(history)
+
+    def actual(column, days):
+        return np.asarray(history[days, positions[column]], dtype=np.float64)
+
+    window = origins[:, None] + np.arange(1 - SMOOTHING_DAYS, 1)
+    state = {
+        'total_cases': actual('imputed_total_cases', origins),
+        'total_deaths': actual('imputed_total_deaths', origins),
+        'active_cases': actual('imputed_active_cases', origins),
+        'daily_deaths': np.asarray(history[window, positions['daily_deaths']], dtype=np.float64),
+    }
+    previous = {feature: actual(feature, origins) for feature in _worker_data['inputs'] + list(FED_BACK_FEATURES)}
+    predictions = np.full((len(origins), horizon, len(TARGETS)), np.nan)
+
+    for step in range(horizon):
+        days = origins + step + 1
+        current = {feature: actual(feature, np.minimum(days, n_days - 1)) for feature in _worker_data['inputs']}
+        advance_day(_worker_data['models'], current, previous, state, _worker_data['recovery_days'])
+        in_history = days < n_days
+        predictions[in_history, step, 0] = state['total_cases'][in_history]
+        predictions[in_history, step, 1] = state['total_deaths'][in_history]
+        previous = current
+
+    return predictions
+
+
+def error_table(predictions, origins, history, columns):
+    """
+    Score backtest predictions against the history, per model and horizon.
+
+    Parameters:
+    predictions (np.ndarray): Shape (n_origins, horizon, len(TARGETS)), NaN past the last day.
+    origins (np.ndarray): Row index of each origin in the history.
+    history (np.ndarray): The history matrix.
+    columns (list): Its columns.
+
+    Returns:
+    pd.DataFrame: One row per model and horizon with the number of origins
+                  scored, MAE, RMSE, WAPE (absolute errors over actual totals,
+                  in %; unlike MAPE it is not dominated by the first days,
+                  when the totals are close to zero) and bias (mean of
+                  predicted minus actual).
+    """
+    n_days, horizon = len(history), predictions.shape[1]
+    days = origins[:, None] + np.arange(1, horizon + 1)
+    rows = []
+    for index, (model_name, target) in enumerate(TARGETS.items()):
+        actual = np.asarray(history[:, columns.index(target)], dtype=np.float64)[np.minimum(days, n_days - 1)]
+        errors = predictions[:, :, index] - actual
+        scored = ~np.isnan(errors)
+        errors = np.where(scored, errors, 0)
+        actual = np.where(scored, np.abs(actual), 0)
+        counts = scored.sum(axis=0)
+        rows.append(pd.DataFrame({
+            'model': model_name,
+            'horizon': np.arange(1, horizon + 1),
+            'origins': counts,
+            'mae': np.abs(errors).sum(axis=0) / counts,
+            'rmse': np.sqrt((errors ** 2).sum(axis=0) / counts),
+            'wape': 100 * np.abs(errors).sum(axis=0) / actual.sum(axis=0),
+            'bias': errors.sum(axis=0) / counts,
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def backtest(horizon=DEFAULT_HORIZON, region=DEFAULT_REGION, workers=None, every=1,
+             recovery_days=DEFAULT_RECOVERY_DAYS):
+    """
+    Replay the history with rolling forecast origins.
+
+    From every origin day, the models forecast `horizon` days ahead the way
+    utils.forecasting does, but with the actual inputs of each day: every day
+    is differenced (or log-differenced) against the actual values of the day
+    before, and only new_deaths_smoothed and imputed_active_cases come from
+    the forecast's own predictions. All origins of a worker move forward
+    together, so each day is one model call per model. Origins are split
+    between worker processes, which memory-map the same history matrix.
+
+    Parameters:
+    horizon (int): Days forecast from each origin.
+    region (str): Region whose data and models are used (see utils.regions).
+    workers (int): Worker processes. Defaults to the number of cores; 1 runs in this process.
+    every (int): Use every `every`-th day as an origin.
+    recovery_days (float): Average days an active case stays active.
+
+    Returns:
+    pd.DataFrame: Per-horizon errors, see error_table.
+    """
+    path, columns = store_history(region)
+    history = np.load(path, mmap_mode='r')
+    # An origin needs a week of daily deaths before it and at least one day after it
+    origins = np.arange(SMOOTHING_DAYS, len(history) - 1, every, dtype=np.intp)
+    if not len(origins):
+        raise ValueError(f"{len(history)} days are too few to backtest")
+
+    cores = os.cpu_count() or 1
+    workers = min(workers or cores, len(origins))
+    with span('backtest.replay'):
+        if workers == 1:
+            _init_worker(path, columns, region, horizon, recovery_days)
+            predictions = _replay(origins)
+        else:
+            initargs = (path, columns, region, horizon, recovery_days, max(1, cores // workers))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+                predictions = np.concatenate(list(pool.map(_replay, np.array_split(origins, workers))))
+    return error_table(predictions, origins, history, columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the case and death models with rolling forecast origins.")
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help="Days forecast from each origin")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--every', type=int, default=1, help="Use every n-th day as an origin")
+    parser.add_argument('--recovery-days', type=float, default=DEFAULT_RECOVERY_DAYS,
+                        help="Average days an active case stays active")
+    parser.add_argument('--region', default=DEFAULT_REGION, help="Region to backtest (see utils.regions)")
+    parser.add_argument('--output', default=None, help="Write the per-horizon error table to this CSV")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    table = backtest(args.horizon, args.region, args.workers, args.every, args.recovery_days)
+    elapsed = time.perf_counter() - started
+
+    print(table.to_string(index=False, float_format=lambda value: f"{value:,.2f}"))
+    print(f"Backtested {table['origins'].iloc[0]} origins over {args.horizon} days in {elapsed:.2f} s")
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
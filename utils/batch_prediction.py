@@ -0,0 +1,182 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from utils.feature_pipeline import load_pipeline
+from utils.model_loader import model_key, split_model_key
+from utils.model_features import (CASE_FEATURES, DEATH_FEATURES, preprocess_case_features,
+                                  preprocess_death_features)
+from utils.prediction_cache import explain_cached, predict_cached, predict_interval_cached
+
+# Model name -> (required input columns, preprocessing function, output column)
+BATCH_MODELS = {
+    'total_case': (CASE_FEATURES, preprocess_case_features, 'predicted_total_imputed_cases'),
+    'total_death': (DEATH_FEATURES, preprocess_death_features, 'predicted_total_deaths'),
+}
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Contribution methods: exact TreeSHAP or the faster per-path approximation
+EXPLAIN_METHODS = ('exact', 'approx')
+
+
+def _preprocess_batch(input_df, model_name):
+    features, _, _ = BATCH_MODELS[split_model_key(model_name)[1]]
+    missing = [column for column in features if column not in input_df.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns required by the {model_name} model: {missing}")
+
+    matrix = input_df[features].to_numpy(dtype=np.float64)
+    return load_pipeline(model_name).transform(matrix)
+
+
+def contribution_columns(model_name):
+    """
+    Return the output column names of a model's contributions, bias last.
+    """
+    return [f"contribution_{feature}" for feature in load_pipeline(model_name).features] + ['contribution_bias']
+
+
+def predict_batch(input_df, model_name):
+    """
+    Score every row of a dataframe with one model call.
+
+    Rows go through the same preprocessing as the prediction pages, so each row
+    gets exactly the value it would get when entered on its own. Rows already
+    in the prediction cache are not scored again.
+
+    Parameters:
+    input_df (pd.DataFrame): Raw inputs, one scenario per row.
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+
+    Returns:
+    np.ndarray: One prediction per row.
+    """
+    return predict_cached(model_name, _preprocess_batch(input_df, model_name))
+
+
+def explain_batch(input_df, model_name, approximate=False):
+    """
+    Compute per-feature contributions for every row of a dataframe.
+
+    Parameters:
+    input_df (pd.DataFrame): Raw inputs, one scenario per row.
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    approximate (bool): Use the per-path approximation instead of exact TreeSHAP.
+
+    Returns:
+    pd.DataFrame: One row per input row with a contribution column per model
+                  feature (in model order) and the bias, on the input's index.
+    """
+    contributions = explain_cached(model_name, _preprocess_batch(input_df, model_name), approximate)
+    return pd.DataFrame(contributions, columns=contribution_columns(model_name), index=input_df.index)
+
+
+def predict_interval_batch(input_df, model_name):
+    """
+    Predict the quantile interval of every row of a dataframe.
+
+    Parameters:
+    input_df (pd.DataFrame): Raw inputs, one scenario per row.
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+
+    Returns:
+    pd.DataFrame: One column per quantile, named after the output column
+                  (e.g. predicted_total_deaths_p10), on the input's index.
+    """
+    _, _, output_column = BATCH_MODELS[split_model_key(model_name)[1]]
+    quantiles, intervals = predict_interval_cached(model_name, _preprocess_batch(input_df, model_name))
+    columns = [f"{output_column}_p{round(quantile * 100):02d}" for quantile in quantiles]
+    return pd.DataFrame(intervals, columns=columns, index=input_df.index)
+
+
+def read_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Read a CSV or Parquet file in chunks of at most `chunksize` rows.
+
+    Parameters:
+    path (str): Input file ending in .csv or .parquet.
+    chunksize (int): Maximum rows per chunk.
+
+    Yields:
+    pd.DataFrame: The next chunk.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def score_file(input_path, output_path, model_name, chunksize=DEFAULT_CHUNKSIZE, explain=None, intervals=False):
+    """
+    Score a CSV/Parquet file chunk by chunk and write the inputs with an added
+    prediction column (and, optionally, one contribution column per feature).
+
+    Parameters:
+    input_path (str): Input file ending in .csv or .parquet.
+    output_path (str): Output file ending in .csv or .parquet.
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    chunksize (int): Rows read and scored per model call.
+    explain (str): None, or one of EXPLAIN_METHODS to add contribution columns.
+    intervals (bool): Add the P10/P50/P90 columns of the quantile boosters.
+
+    Returns:
+    int: Number of rows scored.
+    """
+    _, _, output_column = BATCH_MODELS[split_model_key(model_name)[1]]
+    n_rows = 0
+    parquet_writer = None
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    try:
+        for chunk in read_chunks(input_path, chunksize):
+            chunk[output_column] = predict_batch(chunk, model_name)
+            if intervals:
+                chunk = chunk.join(predict_interval_batch(chunk, model_name))
+            if explain is not None:
+                chunk = chunk.join(explain_batch(chunk, model_name, approximate=explain == 'approx'))
+
+            if output_path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(output_path, table.schema)
+                parquet_writer.write_table(table)
+            else:
+                chunk.to_csv(output_path, mode='a', header=n_rows == 0, index=False)
+
+            n_rows += len(chunk)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    return n_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of scenarios with the case or death model.")
+    parser.add_argument('model', choices=sorted(BATCH_MODELS), help="Model to score with")
+    parser.add_argument('input_path', help="Input .csv or .parquet file with one scenario per row")
+    parser.add_argument('output_path', help="Output .csv or .parquet file")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows scored per model call")
+    parser.add_argument('--explain', choices=EXPLAIN_METHODS,
+                        help="Add per-feature contribution columns, exact (TreeSHAP) or approx (faster)")
+    parser.add_argument('--intervals', action='store_true', help="Add P10/P50/P90 columns from the quantile boosters")
+    parser.add_argument('--region', default=None, help="Score with this region's model and baselines (see utils.regions)")
+    args = parser.parse_args(argv)
+
+    key = model_key(args.model, args.region)
+    n_rows = score_file(args.input_path, args.output_path, key, args.chunksize, args.explain, args.intervals)
+    print(f"Scored {n_rows} rows with the {key} model -> {args.output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import importlib.util
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+def lazy_import(name):
+    """
+    Return a module that is only executed when one of its attributes is first used.
+
+    Pages can bind heavy libraries at the top of the file without paying for
+    them on a rerun that never touches them.
+
+    Parameters:
+    name (str): Dotted module name, e.g. 'plotly.express'.
+
+    Returns:
+    module: The module, loaded on first attribute access.
+    """
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+
+
+# Heavy plotting libraries shared by the pages
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
@@ -0,0 +1,266 @@
+import functools
+import json
+
+import numpy as np
+import pandas as pd
+from utils.bootstrap import go, px
+from utils.data_loader import DATE_COLUMN
+from utils.rollups import ROLLUP_COLUMNS, granularity_for_span
+from utils.tracing import span
+
+# Points sent to the browser per series: roughly the pixel width of a wide chart
+DEFAULT_RESOLUTION = 1000
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Pick the points of a series to keep with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are split
+    into n_out - 2 buckets and from each bucket the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket is
+    kept, which preserves peaks, troughs and the overall shape.
+
+    Parameters:
+    x (np.ndarray): Increasing x values (numeric).
+    y (np.ndarray): y values, same length as x.
+    n_out (int): Number of points to keep.
+
+    Returns:
+    np.ndarray: Sorted positions of the kept points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i covers [edges[i], edges[i + 1]); the last point closes the final bucket
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / counts
+    mean_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x, next_y = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(dates, values, resolution=DEFAULT_RESOLUTION):
+    """
+    Reduce a time series to at most `resolution` points with LTTB, dropping missing values.
+
+    Parameters:
+    dates (array-like): Sorted datetime values.
+    values (array-like): The series values.
+    resolution (int): Maximum number of points returned.
+
+    Returns:
+    tuple: (dates, values) as numpy arrays.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    dates, values = dates[present], values[present]
+    keep = lttb_indices(dates.astype(np.int64), values, resolution)
+    return dates[keep], values[keep]
+
+
+@functools.lru_cache(maxsize=256)
+def _figure_json(ref, column, label, start_date, end_date, resolution, kind, title, granularity='day'):
+    dataset = ref.dataset
+    with span('chart.build'):
+        if granularity == 'day':
+            rows = dataset.frame if start_date is None else dataset.between(start_date, end_date)
+            series = rows[column]
+        else:
+            # Long spans are drawn from the precomputed rollup and never touch the daily rows
+            rows = dataset.rollup_between(granularity, start_date, end_date)
+            series = rows[f"{column}_{ROLLUP_COLUMNS[column]}"]
+        dates, values = downsample(rows[DATE_COLUMN], series, resolution)
+        plot_df = pd.DataFrame({DATE_COLUMN: dates, column: values})
+
+        plot = px.scatter if kind == 'scatter' else px.line
+        if title is None:
+            fig = plot(plot_df, x=DATE_COLUMN, y=column, labels={DATE_COLUMN: "Date", column: label})
+        else:
+            fig = plot(plot_df, x=DATE_COLUMN, y=column, title=title,
+                       labels={DATE_COLUMN: '', column: label}, height=600)
+            fig.update_xaxes(tickangle=45, tickfont=dict(size=14))
+            fig.update_yaxes(title_text=label, title_font=dict(size=16))
+            fig.update_layout(title_font=dict(size=24))
+    with span('chart.serialize'):
+        return fig.to_json()
+
+
+def time_series_figure(dataset, column, label, start_date=None, end_date=None,
+                       resolution=DEFAULT_RESOLUTION, kind='line', title=None, granularity='auto'):
+    """
+    Build (or fetch from cache) a downsampled time-series chart of one column.
+
+    Columns with rollups are drawn weekly or monthly when the date span is
+    long (see utils.rollups.granularity_for_span), using the column's default
+    aggregation. Figures are cached as serialized JSON per dataset version, column,
+    date range, resolution, granularity and styling, so reruns with the same
+    selection skip both the downsampling and the Plotly figure construction.
+
+    Parameters:
+    dataset (Dataset): The shared dataset.
+    column (str): Column to plot against the date.
+    label (str): Axis label of the column.
+    start_date (datetime-like): First date shown. Defaults to the whole history.
+    end_date (datetime-like): Last date shown.
+    resolution (int): Maximum number of points sent to the browser.
+    kind (str): 'line' or 'scatter'.
+    title (str): Chart title. Titled charts use the large EDA layout.
+    granularity (str): 'auto', 'day', 'week', 'month' or 'epiweek'. Columns without rollups are always daily.
+
+    Returns:
+    dict: A Plotly figure dict for st.plotly_chart.
+    """
+    if start_date is not None:
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if granularity == 'auto':
+        dates = dataset.frame[DATE_COLUMN]
+        granularity = granularity_for_span(dates.iloc[0] if start_date is None else start_date,
+                                           dates.iloc[-1] if end_date is None else end_date)
+    if column not in ROLLUP_COLUMNS or granularity not in dataset.rollups:
+        granularity = 'day'
+    return json.loads(_figure_json(dataset.ref(), column, label, start_date, end_date, resolution, kind, title, granularity))
+
+
+# Boxes drawn for a continuous x column; columns with fewer distinct values get one box per value
+DEFAULT_BOX_BINS = 30
+
+BOX_STATISTICS = ['x', 'count', 'lowerfence', 'q1', 'median', 'q3', 'upperfence', 'mean']
+
+
+def box_statistics(x, y, bins=DEFAULT_BOX_BINS):
+    """
+    Bin x and compute the box-plot statistics of y in each bin.
+
+    Columns with at most `bins` distinct values keep one box per value;
+    others are cut into `bins` equal-width bins. Quartiles, means and counts
+    come from one groupby over the bin codes; whiskers end at the most
+    extreme values within 1.5 IQR of the box, as in Plotly.
+
+    Parameters:
+    x (array-like): Values that are binned.
+    y (array-like): Values summarized per bin.
+    bins (int): Maximum number of boxes.
+
+    Returns:
+    pd.DataFrame: One row per non-empty bin with x (bin centre), count,
+                  lowerfence, q1, median, q3, upperfence and mean.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    present = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[present], y[present]
+    if len(x) == 0:
+        return pd.DataFrame(columns=BOX_STATISTICS)
+
+    values = np.unique(x)
+    if len(values) <= bins:
+        codes = np.searchsorted(values, x)
+        centers = values
+    else:
+        edges = np.linspace(values[0], values[-1], bins + 1)
+        codes = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, bins - 1)
+        centers = (edges[:-1] + edges[1:]) / 2
+
+    grouped = pd.Series(y).groupby(codes)
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats = grouped.agg(['count', 'mean']).join(quartiles)
+    stats.columns = ['count', 'mean', 'q1', 'median', 'q3']
+
+    # Whiskers: the extreme values of each bin that are not outliers
+    iqr = (stats['q3'] - stats['q1']).to_numpy()
+    low = stats['q1'].to_numpy() - 1.5 * iqr
+    high = stats['q3'].to_numpy() + 1.5 * iqr
+    position = np.searchsorted(stats.index.to_numpy(), codes)
+    inside = (y >= low[position]) & (y <= high[position])
+    fences = pd.Series(y[inside]).groupby(codes[inside]).agg(['min', 'max'])
+
+    stats['lowerfence'] = fences['min']
+    stats['upperfence'] = fences['max']
+    stats['x'] = centers[stats.index.to_numpy()]
+    return stats.reset_index(drop=True)[BOX_STATISTICS]
+
+
+@functools.lru_cache(maxsize=64)
+def _box_figure_json(ref, x_column, y_column, bins, title):
+    with span('chart.build'):
+        frame = ref.dataset.frame
+        stats = box_statistics(frame[x_column], frame[y_column], bins)
+        # Boxes take 80% of the narrowest gap between bin centres
+        width = 0.8 * float(np.diff(stats['x']).min()) if len(stats) > 1 else None
+        fig = go.Figure(go.Box(
+            x=stats['x'], width=width, q1=stats['q1'], median=stats['median'], q3=stats['q3'],
+            lowerfence=stats['lowerfence'], upperfence=stats['upperfence'], mean=stats['mean'],
+            customdata=stats['count'], boxpoints=False, name=y_column,
+        ))
+        fig.update_layout(title=title, xaxis_title=x_column, yaxis_title=y_column, width=800, height=800)
+    with span('chart.serialize'):
+        return fig.to_json()
+
+
+def box_figure(dataset, x_column, y_column, title, bins=DEFAULT_BOX_BINS):
+    """
+    Build (or fetch from cache) a box plot of one column against another.
+
+    Only the per-bin statistics are sent to the browser, as a single trace,
+    so the payload depends on the bin count rather than on the number of rows
+    or distinct x values. Figures are cached per dataset version, columns and bin count.
+
+    Parameters:
+    dataset (Dataset): The shared dataset.
+    x_column (str): Column binned along the x axis.
+    y_column (str): Column summarized in each box.
+    title (str): Chart title.
+    bins (int): Maximum number of boxes.
+
+    Returns:
+    dict: A Plotly figure dict for st.plotly_chart.
+    """
+    return json.loads(_box_figure_json(dataset.ref(), x_column, y_column, bins, title))
+
+
+# Features shown in a contribution chart, largest first
+MAX_CONTRIBUTION_FEATURES = 15
+
+
+def contribution_figure(features, contributions, title):
+    """
+    Build a bar chart of per-feature contributions.
+
+    A single row shows each feature's signed contribution; several rows show
+    the mean absolute contribution over the rows.
+
+    Parameters:
+    features (list): Model features in order.
+    contributions (np.ndarray): Shape (features + 1,) or (rows, features + 1), bias last.
+    title (str): Chart title.
+
+    Returns:
+    plotly.graph_objects.Figure: Horizontal bars, largest at the top.
+    """
+    contributions = np.asarray(contributions, dtype=np.float64)
+    if contributions.ndim == 1:
+        values, label = contributions[:-1], 'Contribution'
+    else:
+        values, label = np.abs(contributions[:, :-1]).mean(axis=0), 'Mean |contribution|'
+    order = np.argsort(np.abs(values))[::-1][:MAX_CONTRIBUTION_FEATURES][::-1]
+    colors = np.where(values[order] >= 0, '#d94801', '#2171b5')
+    fig = go.Figure(go.Bar(x=values[order], y=[features[position] for position in order], orientation='h',
+                           marker_color=colors if contributions.ndim == 1 else '#d94801'))
+    fig.update_layout(title=title, xaxis_title=label, height=max(300, 28 * len(order) + 120))
+    return fig
@@ -0,0 +1,249 @@
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from utils.model_loader import file_checksum
+from utils.tracing import span, traced
+
+DATA_PATH = './data/preprocessed_data_updated.csv'
+CACHE_DIR = './data/.cache'
+DATE_COLUMN = 'date'
+
+# Memory-mapped tables kept open, one per source CSV (region), least recently used first
+MAX_OPEN_TABLES = 8
+
+_source_hashes = {}
+_tables = OrderedDict()
+_lock = threading.Lock()
+_order_lock = threading.Lock()
+
+
+def source_hash(path=DATA_PATH):
+    """
+    Return the SHA-256 of a source file, re-hashing only when its mtime or size changes.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: The hex digest.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _source_hashes.get(key)
+    if digest is None:
+        digest = file_checksum(path)
+        _source_hashes[key] = digest
+    return digest
+
+
+def cache_prefix(path=DATA_PATH):
+    """
+    Return the prefix of the files data/.cache holds for a source CSV.
+
+    Regions' CSVs share a file name, so the prefix also hashes the CSV's path.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: data/.cache/<stem>-<path hash>.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    source = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    return os.path.join(CACHE_DIR, f"{stem}-{source}")
+
+
+def columnar_path(path=DATA_PATH):
+    """
+    Return the path of the columnar copy of a source CSV, keyed by the CSV's hash.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: Path of the Feather (Arrow IPC) file.
+    """
+    return f"{cache_prefix(path)}-{source_hash(path)[:16]}.feather"
+
+
+def remove_stale_copies(path=DATA_PATH):
+    """
+    Delete the columnar copies of earlier versions of a source CSV.
+
+    Returns:
+    list: The paths that were removed.
+    """
+    current = columnar_path(path)
+    removed = []
+    # Exactly 16 characters between the prefix and '.feather', so rollups never match
+    for stale in glob.glob(f"{glob.escape(cache_prefix(path))}-{'?' * 16}.feather"):
+        if stale != current:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                continue
+            removed.append(stale)
+    return removed
+
+
+def parts_dir(path=DATA_PATH):
+    """
+    Return the directory holding the daily rows appended to a source CSV by utils.ingestion.
+
+    Parts belong to the CSV they were appended to: the directory is keyed by
+    the CSV's hash, so parts written before the CSV was replaced are ignored.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: The parts directory, <csv>.parts/<hash> next to the CSV.
+    """
+    return os.path.join(os.path.splitext(path)[0] + '.parts', source_hash(path)[:16])
+
+
+def list_parts(path=DATA_PATH):
+    """
+    List the appended Feather parts of a source CSV in the order they were written.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    list: Paths of the part files, oldest first.
+    """
+    directory = parts_dir(path)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names) if name.endswith('.feather')]
+
+
+def store_version(path=DATA_PATH):
+    """
+    Identify the current contents of the store: the CSV hash plus the last appended part.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: A version string that changes whenever the CSV changes or a part is appended.
+    """
+    parts = list_parts(path)
+    last_part = os.path.basename(parts[-1]) if parts else ''
+    return f"{source_hash(path)[:16]}:{len(parts)}:{last_part}"
+
+
+@traced('data.parse_csv')
+def read_source_csv(path=DATA_PATH):
+    """
+    Parse the source CSV, naming the date column and casting it to datetime.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    pd.DataFrame: The parsed data.
+    """
+    df = pd.read_csv(path)
+    #Renaming the column name "Unnamed: 0" to "date"
+    df.rename(columns={"Unnamed: 0": DATE_COLUMN}, inplace=True)
+    #Casting the date column into datetime type
+    df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN])
+    return df
+
+
+def build_columnar_cache(path=DATA_PATH):
+    """
+    Convert the source CSV into an uncompressed Feather file (so it can be
+    memory-mapped) unless the file for the current CSV hash already exists.
+    The copies of earlier versions of the CSV are deleted once it is written.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: Path of the Feather file.
+    """
+    import pyarrow.feather as feather
+
+    target = columnar_path(path)
+    if not os.path.exists(target):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        feather.write_feather(read_source_csv(path), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, target)
+        remove_stale_copies(path)
+    return target
+
+
+def _map_feather(path):
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def open_table(path=DATA_PATH):
+    """
+    Open the columnar copy of a source CSV, followed by its appended parts,
+    as one memory-mapped Arrow table.
+
+    Opening is zero-copy: column data is paged in from disk only when read.
+    The table is kept for the life of the process and replaced when the CSV
+    changes or a part is appended.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    pyarrow.Table: The dataset.
+    """
+    import pyarrow as pa
+
+    key = (build_columnar_cache(path), tuple(list_parts(path)))
+    cached = _tables.get(path)
+    if cached is None or cached[0] != key:
+        with _lock:
+            cached = _tables.get(path)
+            if cached is None or cached[0] != key:
+                target, parts = key
+                with span('data.open_table'):
+                    table = _map_feather(target)
+                    if parts:
+                        # The pandas metadata describes the CSV rows only, so it is dropped
+                        table = pa.concat_tables([table] + [_map_feather(part) for part in parts])
+                        table = table.replace_schema_metadata(None)
+                cached = (key, table)
+                with _order_lock:
+                    _tables[path] = cached
+                    _tables.move_to_end(path)
+                    while len(_tables) > MAX_OPEN_TABLES:
+                        _tables.popitem(last=False)
+    else:
+        # Separate from the build lock, so a hit never waits for another table to open
+        with _order_lock:
+            if path in _tables:
+                _tables.move_to_end(path)
+    return cached[1]
+
+
+def load_dataset(columns=None, path=DATA_PATH):
+    """
+    Load the dataset from its columnar cache, reading only the requested columns.
+
+    Parameters:
+    columns (list): Columns to read besides the date column. Defaults to all columns.
+    path (str): The source CSV.
+
+    Returns:
+    pd.DataFrame: The data with a datetime 'date' column.
+    """
+    table = open_table(path)
+    if columns is not None:
+        table = table.select([DATE_COLUMN] + [column for column in columns if column != DATE_COLUMN])
+    return table.to_pandas()
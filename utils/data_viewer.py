@@ -0,0 +1,123 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Rows shown per page of the data viewer
+PAGE_SIZE = 50
+
+# ColorBrewer "Oranges", light to dark, interpolated by rank
+ORANGES = np.array([
+    [255, 245, 235], [254, 230, 206], [253, 208, 162], [253, 174, 107], [253, 141, 60],
+    [241, 105, 19], [217, 72, 1], [166, 54, 3], [127, 39, 4],
+], dtype=np.float64)
+
+# Backgrounds darker than this relative luminance get white text, as in pandas' background_gradient
+TEXT_COLOR_THRESHOLD = 0.408
+
+
+def _relative_luminance(rgb):
+    channels = rgb / 255
+    linear = np.where(channels <= 0.04045, channels / 12.92, ((channels + 0.055) / 1.055) ** 2.4)
+    return linear @ np.array([0.2126, 0.7152, 0.0722])
+
+
+def gradient_styles(frame, palette=ORANGES):
+    """
+    Compute a background gradient for every numeric cell from its rank within the column.
+
+    Parameters:
+    frame (pd.DataFrame): The data to color.
+    palette (np.ndarray): RGB anchors from the lowest to the highest rank.
+
+    Returns:
+    np.ndarray: CSS declarations, one per cell (empty for non-numeric and missing cells).
+    """
+    styles = np.full(frame.shape, '', dtype=object)
+    anchors = np.linspace(0, 1, len(palette))
+    for position, column in enumerate(frame.columns):
+        series = frame[column]
+        if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            continue
+        ranks = series.rank(method='average').to_numpy(dtype=np.float64)
+        present = ~np.isnan(ranks)
+        if not present.any():
+            continue
+        low, high = ranks[present].min(), ranks[present].max()
+        scaled = (ranks[present] - low) / (high - low) if high > low else np.zeros(present.sum())
+        rgb = np.column_stack([np.interp(scaled, anchors, palette[:, channel]) for channel in range(3)])
+        text = np.where(_relative_luminance(rgb) < TEXT_COLOR_THRESHOLD, '#f1f1f1', '#000000')
+        hex_colors = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in np.rint(rgb).astype(int)]
+        styles[present, position] = [
+            f"background-color: {background}; color: {color};" for background, color in zip(hex_colors, text)
+        ]
+    return styles
+
+
+@functools.lru_cache(maxsize=4)
+def _gradient_view(ref, start_date, end_date):
+    dataset = ref.dataset
+    rows = None if start_date is None else dataset.between(start_date, end_date)
+    frame = dataset.to_frame(rows)
+    return frame, gradient_styles(frame)
+
+
+def page_count(n_rows, page_size=PAGE_SIZE):
+    return max(1, -(-n_rows // page_size))
+
+
+def data_page(dataset, page, page_size=PAGE_SIZE, gradient=False, start_date=None, end_date=None):
+    """
+    Return one page of the dataset (or of a date range) for display.
+
+    Without a gradient only the page's rows are materialized. With one, the
+    expanded frame and the cell colors are computed once per dataset and
+    range, and a page only slices them.
+
+    Parameters:
+    dataset (Dataset): The shared dataset.
+    page (int): 1-based page number.
+    page_size (int): Rows per page.
+    gradient (bool): Color numeric cells by their rank within the column.
+    start_date (pd.Timestamp): First date shown. Defaults to the whole history.
+    end_date (pd.Timestamp): Last date shown.
+
+    Returns:
+    pd.DataFrame or pandas.io.formats.style.Styler: The page.
+    """
+    start = (page - 1) * page_size
+    if not gradient:
+        rows = dataset.frame if start_date is None else dataset.between(start_date, end_date)
+        page_rows = dataset.to_frame(rows.iloc[start:start + page_size])
+        page_rows.index = range(start, start + len(page_rows))
+        return page_rows
+
+    frame, styles = _gradient_view(dataset.ref(), start_date, end_date)
+    rows = frame.iloc[start:start + page_size]
+    block = pd.DataFrame(styles[start:start + page_size], index=rows.index, columns=rows.columns)
+    return rows.style.apply(lambda _: block, axis=None)
+
+
+def data_viewer(dataset, key, page_size=PAGE_SIZE, gradient=False, start_date=None, end_date=None):
+    """
+    Show the dataset (or a date range of it) one page at a time with a page selector.
+
+    Parameters:
+    dataset (Dataset): The shared dataset.
+    key (str): Widget key prefix, unique per page.
+    page_size (int): Rows per page.
+    gradient (bool): Color numeric cells by their rank within the column.
+    start_date (datetime-like): First date shown. Defaults to the whole history.
+    end_date (datetime-like): Last date shown.
+    """
+    import streamlit as st
+
+    if start_date is not None:
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    rows = dataset.frame if start_date is None else dataset.between(start_date, end_date)
+    n_rows = len(rows)
+    n_pages = page_count(n_rows, page_size)
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1,
+                           key=f"{key}_page")
+    st.dataframe(data_page(dataset, page, page_size, gradient, start_date, end_date))
+    st.caption(f"Rows {min((page - 1) * page_size + 1, n_rows)}-{min(page * page_size, n_rows)} of {n_rows}")
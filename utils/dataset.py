@@ -0,0 +1,325 @@
+import itertools
+import os
+import threading
+import warnings
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from utils.data_loader import DATA_PATH, DATE_COLUMN, load_dataset, store_version
+from utils.rollups import build_rollup, load_rollups, period_starts
+from utils.tracing import span
+
+# Country metadata that is the same on every row. Stored once per dataset.
+STATIC_COLUMNS = [
+    'aged_65_older', 'aged_70_older', 'cardiovasc_death_rate', 'diabetes_prevalence', 'extreme_poverty',
+    'female_smokers', 'gdp_per_capita', 'handwashing_facilities', 'hospital_beds_per_thousand',
+    'human_development_index', 'life_expectancy', 'male_smokers', 'median_age', 'population',
+    'population_density',
+]
+
+# Compact dtypes for the columns whose values fit exactly. Every other column stays float64.
+COLUMN_DTYPES = {
+    # Whole-number counts
+    '1 confirmed per every': 'int32',
+    '1 died per every': 'int32',
+    'broughDead': 'int8',
+    'fullyVaccinated': 'int32',
+    'new_people_vaccinated_smoothed': 'int32',
+    'new_tests_smoothed': 'int16',
+    'new_vaccinations_smoothed': 'int32',
+    'new_vaccinations_smoothed_per_million': 'int16',
+    'totalVaccinations': 'int32',
+    'total_deaths': 'int16',
+    'vaccinated24hours': 'int32',
+    # Halves and other values exactly representable in single precision
+    'deathDay': 'float32',
+    'imputed_active_cases': 'float32',
+    'imputed_total_cases': 'float32',
+    'imputed_total_deaths': 'float32',
+    'imputed_total_recoveries': 'float32',
+    'newCases': 'float32',
+    'test24hours': 'float32',
+    'testsPositivity': 'float32',
+    'totalTests': 'float32',
+}
+
+
+def _is_lossless(series, dtype):
+    # A cast is lossless when casting back gives the same values (NaN only for ints)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        if series.isna().any():
+            return False
+        info = np.iinfo(dtype)
+        if series.min() < info.min or series.max() > info.max:
+            return False
+    converted = series.astype(dtype)
+    return converted.astype(series.dtype).equals(series)
+
+
+class DatasetRef:
+    """
+    Cache key standing for a Dataset in lru_cache'd functions.
+
+    Keys compare by the dataset's source and store version and hold the
+    dataset only weakly, so cached results never keep an evicted or outdated
+    dataset alive.
+    """
+
+    __slots__ = ('source', '_dataset')
+
+    def __init__(self, dataset):
+        self.source = dataset.source
+        self._dataset = weakref.ref(dataset)
+
+    def __hash__(self):
+        return hash(self.source)
+
+    def __eq__(self, other):
+        return isinstance(other, DatasetRef) and self.source == other.source
+
+    @property
+    def dataset(self):
+        # Only dereferenced while the caller that built the key holds the dataset
+        return self._dataset()
+
+
+class Dataset:
+    """
+    Read-only, compactly typed copy of the dataset shared by every page.
+
+    Per-row columns live in `frame` (sorted by date, downcast per COLUMN_DTYPES)
+    and constant country metadata lives once in `static`. Date filters return
+    slices of `frame` rather than copies. Weekly, monthly and epi-week
+    aggregates live in `rollups` (see utils.rollups).
+    """
+
+    def __init__(self, frame, static, column_order, rollups=None):
+        self.frame = frame
+        self.static = static
+        self.column_order = column_order
+        self.rollups = rollups or {}
+        self._dates = frame[DATE_COLUMN].to_numpy()
+        # (path, store version) once shared by get_dataset; unique per instance before that
+        self.source = ('unshared', next(_instances))
+
+    def ref(self):
+        """
+        Return a hashable handle on the dataset for memoized functions.
+
+        Returns:
+        DatasetRef: Equal for datasets of the same source and store version.
+        """
+        return DatasetRef(self)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a compact dataset from a float64 dataframe, applying the schema
+        only where it loses no precision.
+
+        Parameters:
+        df (pd.DataFrame): The data as loaded, with a datetime 'date' column.
+
+        Returns:
+        Dataset: The compact dataset.
+        """
+        df = df.sort_values(DATE_COLUMN, kind='stable').reset_index(drop=True)
+        column_order = list(df.columns)
+
+        static = {}
+        for column in STATIC_COLUMNS:
+            if column in df.columns and len(df) > 0 and df[column].nunique(dropna=False) == 1:
+                static[column] = df[column].iloc[0]
+            elif column in df.columns:
+                warnings.warn(f"Column '{column}' is not constant; keeping it per row")
+
+        columns = {}
+        for column in column_order:
+            if column in static:
+                continue
+            series = df[column]
+            dtype = COLUMN_DTYPES.get(column)
+            if dtype is not None:
+                if _is_lossless(series, dtype):
+                    series = series.astype(dtype)
+                else:
+                    warnings.warn(f"Column '{column}' does not fit {dtype}; keeping {series.dtype}")
+            columns[column] = series
+
+        return cls(pd.DataFrame(columns), static, column_order)
+
+    def between(self, start_date, end_date):
+        """
+        Return the rows between two dates (inclusive) without copying them.
+
+        Parameters:
+        start_date (datetime-like): First date of the range.
+        end_date (datetime-like): Last date of the range.
+
+        Returns:
+        pd.DataFrame: A slice of `frame`.
+        """
+        start = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start_date)), side='left')
+        stop = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end_date)), side='right')
+        return self.frame.iloc[start:stop]
+
+    def rollup_between(self, granularity, start_date=None, end_date=None):
+        """
+        Return the rollup periods overlapping a date range.
+
+        Periods keep their first day as label, but the first and last periods
+        only aggregate the days inside the range: when the range cuts them,
+        they are rebuilt from the daily rows.
+
+        Parameters:
+        granularity (str): 'week', 'month' or 'epiweek'.
+        start_date (datetime-like): First date of the range. Defaults to the whole history.
+        end_date (datetime-like): Last date of the range.
+
+        Returns:
+        pd.DataFrame: A slice of the rollup, or a new dataframe when an edge period was rebuilt.
+        """
+        rollup = self.rollups[granularity]
+        if start_date is None:
+            return rollup
+        starts = rollup[DATE_COLUMN].to_numpy()
+        start = np.searchsorted(starts, np.datetime64(pd.Timestamp(start_date)), side='right') - 1
+        stop = np.searchsorted(starts, np.datetime64(pd.Timestamp(end_date)), side='right')
+        rows = rollup.iloc[max(start, 0):stop]
+        if rows.empty:
+            return rows
+
+        days = self.between(start_date, end_date)
+        labels = period_starts(days[DATE_COLUMN], granularity)
+        edges = rows.iloc[[0, -1]].drop_duplicates(DATE_COLUMN)
+        partial = [
+            edge for edge, total in zip(edges[DATE_COLUMN].to_numpy(), edges['days'].to_numpy())
+            if np.count_nonzero(labels == edge) < total
+        ]
+        if not partial:
+            return rows
+        rebuilt = build_rollup(days[np.isin(labels, partial)], granularity)
+        kept = rows[~rows[DATE_COLUMN].isin(partial)]
+        return pd.concat([kept, rebuilt], ignore_index=True).sort_values(DATE_COLUMN, ignore_index=True)
+
+    def to_frame(self, rows=None):
+        """
+        Materialize the rows with the static columns expanded back in, in the original column order.
+        Meant for display and export only.
+
+        Parameters:
+        rows (pd.DataFrame): A slice returned by `between`. Defaults to all rows.
+
+        Returns:
+        pd.DataFrame: A new dataframe.
+        """
+        rows = self.frame if rows is None else rows
+        expanded = rows.assign(**{column: value for column, value in self.static.items()})
+        return expanded[self.column_order].reset_index(drop=True)
+
+    def memory_usage(self):
+        """
+        Return the bytes held by the dataset.
+
+        Returns:
+        int: Deep memory usage of `frame` plus the static values.
+        """
+        return int(self.frame.memory_usage(deep=True).sum()) + 8 * len(self.static)
+
+
+# Source CSV -> (store version, dataset), least recently used first. One
+# dataset per region, bounded so memory does not grow with the number of regions.
+MAX_CACHED_DATASETS = 4
+_datasets = OrderedDict()
+_instances = itertools.count()
+_lock = threading.Lock()
+_order_lock = threading.Lock()
+
+
+def get_dataset(path=DATA_PATH):
+    """
+    Return the process-wide compact dataset of a source CSV, rebuilding it only
+    when the CSV changes or new days are appended. Its rollups are loaded at the
+    same time, and built and stored first when the data is new.
+
+    The datasets of the MAX_CACHED_DATASETS most recently used CSVs (regions)
+    are kept; older ones are dropped and rebuilt from their columnar copy on next use.
+
+    Parameters:
+    path (str): The source CSV, e.g. utils.regions.region_data_path(region).
+
+    Returns:
+    Dataset: The shared dataset.
+    """
+    version = store_version(path)
+    cached = _datasets.get(path)
+    if cached is None or cached[0] != version:
+        with _lock:
+            cached = _datasets.get(path)
+            if cached is None or cached[0] != version:
+                with span('data.build_dataset'):
+                    dataset = Dataset.from_frame(load_dataset(path=path))
+                dataset.rollups = load_rollups(dataset.frame, path)
+                dataset.source = (path, version)
+                cached = (version, dataset)
+                with _order_lock:
+                    _datasets[path] = cached
+                    _datasets.move_to_end(path)
+                    while len(_datasets) > MAX_CACHED_DATASETS:
+                        _datasets.popitem(last=False)
+    else:
+        # Separate from the build lock, so switching to a cached region never waits for a build
+        with _order_lock:
+            if path in _datasets:
+                _datasets.move_to_end(path)
+    return cached[1]
+
+
+def resident_memory():
+    """
+    Return the resident set size of the current process in bytes.
+
+    Returns:
+    int: RSS in bytes (peak RSS where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_report(path=DATA_PATH):
+    """
+    Measure the dataset before and after compaction.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    dict: Frame sizes and process RSS in bytes.
+    """
+    rss_start = resident_memory()
+    df = load_dataset(path=path)
+    rss_float64 = resident_memory()
+    dataset = Dataset.from_frame(df)
+    float64_bytes = int(df.memory_usage(deep=True).sum())
+    del df
+    rss_compact = resident_memory()
+    return {
+        'rows': len(dataset.frame),
+        'float64_frame_bytes': float64_bytes,
+        'compact_frame_bytes': dataset.memory_usage(),
+        'rss_before_load': rss_start,
+        'rss_with_float64_frame': rss_float64,
+        'rss_with_compact_dataset': rss_compact,
+    }
+
+
+if __name__ == '__main__':
+    for name, value in memory_report().items():
+        print(f"{name}: {value / 2**20:.2f} MiB" if name != 'rows' else f"{name}: {value}")
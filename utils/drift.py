@@ -0,0 +1,408 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from utils.model_loader import MODEL_PATHS, model_key, split_model_key
+from utils.regions import DEFAULT_REGION, region_model_dir
+
+# Monitoring is on unless DRIFT_MONITORING=0
+DRIFT_ENV = 'DRIFT_MONITORING'
+
+# Quantile bins per feature in the reference histograms. Values beyond the
+# outer edges fall into the first and last bins; missing values get their own bin.
+N_BINS = 20
+
+# Population stability index: below PSI_WARN the input is stable, from PSI_ALERT on it has drifted
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+# Largest gap between the binned cumulative distributions (Kolmogorov-Smirnov) treated as drift
+KS_ALERT = 0.2
+# Inputs with fewer submitted rows are reported without a status
+MIN_OBSERVATIONS = 30
+# Smallest bin share in the PSI, so a bin that is empty on one side does not make it infinite
+PSI_FLOOR = 1e-4
+
+# Statuses from best to worst
+STATUSES = ('insufficient data', 'stable', 'warning', 'drift')
+
+
+class StreamingHistogram:
+    """
+    Fixed-bin histograms of every column of a feature matrix, updated in place.
+
+    Memory does not grow with the number of rows: each feature keeps one count
+    per bin. A value falls into bin i when i of its feature's edges are at or
+    below it; missing values are counted in the last bin.
+    """
+
+    def __init__(self, edges):
+        self.n_value_bins = np.array([len(feature_edges) + 1 for feature_edges in edges], dtype=np.intp)
+        self.n_bins = int(self.n_value_bins.max(initial=1)) + 1
+        # Padded with NaN, which no value is compared at or above
+        self.edges = np.full((len(edges), self.n_bins - 2), np.nan)
+        for position, feature_edges in enumerate(edges):
+            self.edges[position, :len(feature_edges)] = feature_edges
+        self._offsets = np.arange(len(edges), dtype=np.intp) * self.n_bins
+        self._counts = np.zeros(len(edges) * self.n_bins, dtype=np.int64)
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def update(self, matrix):
+        """
+        Add the rows of a matrix (or a single row) with one vectorized pass.
+        """
+        matrix = np.asarray(matrix)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        bins = (matrix[:, :, None] >= self.edges).sum(axis=2)
+        bins[np.isnan(matrix)] = self.n_bins - 1
+        counts = np.bincount((bins + self._offsets).ravel(), minlength=len(self._counts))
+        with self._lock:
+            self._counts += counts
+            self.rows += len(matrix)
+
+    def snapshot(self):
+        """
+        Return (counts of shape (n_features, n_bins), number of rows) at this moment.
+        """
+        with self._lock:
+            return self._counts.reshape(-1, self.n_bins).copy(), self.rows
+
+    def reset(self):
+        with self._lock:
+            self._counts[:] = 0
+            self.rows = 0
+
+    def feature_counts(self, counts, position):
+        """
+        Return one feature's value-bin counts followed by its missing count.
+        """
+        return np.append(counts[position, :self.n_value_bins[position]], counts[position, -1])
+
+
+def population_stability_index(expected, actual):
+    """
+    PSI between two histograms over the same bins: sum((a - e) * ln(a / e)) of the bin shares.
+    """
+    expected = np.maximum(expected / max(expected.sum(), 1), PSI_FLOOR)
+    actual = np.maximum(actual / max(actual.sum(), 1), PSI_FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_distance(expected, actual):
+    """
+    Largest gap between the cumulative distributions of two histograms of
+    non-missing values. Values within a bin are not told apart, so this is a
+    lower bound of the exact Kolmogorov-Smirnov statistic.
+    """
+    if not expected.sum() or not actual.sum():
+        return 0.0
+    return float(np.max(np.abs(np.cumsum(actual) / actual.sum() - np.cumsum(expected) / expected.sum())))
+
+
+def feature_status(psi, ks, observations):
+    if observations < MIN_OBSERVATIONS:
+        return 'insufficient data'
+    if psi >= PSI_ALERT or ks >= KS_ALERT:
+        return 'drift'
+    if psi >= PSI_WARN:
+        return 'warning'
+    return 'stable'
+
+
+def reference_path(key):
+    """
+    Return the path of a model's reference histograms, e.g.
+    model/xgb_model_total_deaths.drift.json, or in the region's model folder.
+    """
+    region, model_name = split_model_key(key)
+    stem = os.path.splitext(os.path.basename(MODEL_PATHS[model_name]))[0]
+    return os.path.join(region_model_dir(region), f"{stem}.drift.json")
+
+
+def build_reference(key, n_bins=N_BINS):
+    """
+    Build the reference histograms of a model's inputs from its training rows.
+
+    The rows are the training matrix of utils.training.training_data: the
+    training CSV after the feature pipeline, i.e. the values the model saw.
+    Edges are the feature's quantiles, so every bin holds about the same share
+    of the training rows.
+
+    Parameters:
+    key (str): 'total_case' or 'total_death', or a region's model key.
+    n_bins (int): Bins per feature, before equal quantiles are merged.
+
+    Returns:
+    dict: The reference, as written by write_reference.
+    """
+    from utils.training import training_data
+
+    region, model_name = split_model_key(key)
+    X, _, features = training_data(model_name, region=region)
+    # Binned in float32, like the matrices the prediction cache passes in
+    X = X.astype(np.float32)
+    edges = []
+    for column in X.T:
+        values = column[~np.isnan(column)].astype(np.float64)
+        quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]) if len(values) else []
+        edges.append(np.unique(quantiles).tolist())
+
+    histogram = StreamingHistogram(edges)
+    histogram.update(X)
+    counts, rows = histogram.snapshot()
+    return {
+        'model': key,
+        'features': list(features),
+        'rows': rows,
+        'edges': edges,
+        'counts': [histogram.feature_counts(counts, position).tolist() for position in range(len(features))],
+    }
+
+
+def write_reference(key):
+    """
+    Build a model's reference histograms and write them next to its pipeline spec.
+
+    Returns:
+    str: The path written.
+    """
+    reference = build_reference(key)
+    path = reference_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(reference, file)
+        file.write('\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_reference(key):
+    """
+    Read a model's reference histograms, building them once if they are missing.
+    """
+    path = reference_path(key)
+    if not os.path.exists(path):
+        write_reference(key)
+    with open(path) as file:
+        return json.load(file)
+
+
+class DriftMonitor:
+    """
+    Streaming histograms of the inputs submitted to one model, compared with
+    the reference histograms of its training rows.
+    """
+
+    def __init__(self, reference):
+        self.model_name = reference['model']
+        self.features = reference['features']
+        self.reference_rows = reference['rows']
+        self.expected = [np.asarray(counts, dtype=np.float64) for counts in reference['counts']]
+        self.histogram = StreamingHistogram(reference['edges'])
+        self.started_at = time.time()
+
+    def update(self, matrix):
+        """
+        Add submitted rows, preprocessed and in model order.
+        """
+        self.histogram.update(matrix)
+
+    def reset(self):
+        self.histogram.reset()
+        self.started_at = time.time()
+
+    def report(self):
+        """
+        Compare the rows submitted so far with the reference.
+
+        Returns:
+        dict: 'model', 'observations', 'reference_rows', 'since' (UTC, ISO 8601),
+              the worst feature 'status' and one entry per feature with its
+              'psi', 'ks', 'missing_rate', 'reference_missing_rate' and 'status'.
+        """
+        counts, observations = self.histogram.snapshot()
+        features = []
+        for position, feature in enumerate(self.features):
+            expected = self.expected[position]
+            actual = self.histogram.feature_counts(counts, position).astype(np.float64)
+            psi = population_stability_index(expected, actual)
+            ks = ks_distance(expected[:-1], actual[:-1])
+            features.append({
+                'feature': feature,
+                'psi': round(psi, 6),
+                'ks': round(ks, 6),
+                'missing_rate': round(actual[-1] / observations, 6) if observations else 0.0,
+                'reference_missing_rate': round(expected[-1] / max(expected.sum(), 1), 6),
+                'status': feature_status(psi, ks, observations),
+            })
+        return {
+            'model': self.model_name,
+            'observations': observations,
+            'reference_rows': self.reference_rows,
+            'since': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started_at)),
+            'status': max((entry['status'] for entry in features), key=STATUSES.index, default='insufficient data'),
+            'features': features,
+        }
+
+
+# Model key -> its monitor, least recently used first. Other regions' monitors
+# are dropped beyond MAX_MONITORED_MODELS.
+MAX_MONITORED_MODELS = 8
+# Seconds before a reference that could not be read or built is tried again
+LOAD_RETRY_SECONDS = 60
+drift_monitors = OrderedDict()
+_loading = set()
+_failed_at = {}
+_monitors_lock = threading.Lock()
+enabled = os.environ.get(DRIFT_ENV, '1') != '0'
+
+
+def _load_monitor(model_name):
+    # Runs on a background thread: reading (or building) the reference never holds the lock
+    monitor = None
+    try:
+        monitor = DriftMonitor(load_reference(model_name))
+    except (OSError, KeyError, ValueError):
+        # e.g. a region without data or with columns missing; tried again after LOAD_RETRY_SECONDS
+        pass
+    finally:
+        with _monitors_lock:
+            _loading.discard(model_name)
+            if monitor is None:
+                _failed_at[model_name] = time.monotonic()
+            else:
+                _failed_at.pop(model_name, None)
+                drift_monitors[model_name] = monitor
+                while len(drift_monitors) > MAX_MONITORED_MODELS:
+                    drift_monitors.popitem(last=False)
+
+
+def drift_monitor(model_name):
+    """
+    Return the process-wide monitor of a model without waiting for it.
+
+    The first call starts reading the model's reference on a background
+    thread (building it if it is missing, which takes seconds; build it ahead
+    with `python -m utils.drift build`). A reference that fails to load is
+    tried again after LOAD_RETRY_SECONDS.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+
+    Returns:
+    DriftMonitor: Or None while its reference is not loaded.
+    """
+    with _monitors_lock:
+        monitor = drift_monitors.get(model_name)
+        if monitor is not None:
+            drift_monitors.move_to_end(model_name)
+            return monitor
+        failed_at = _failed_at.get(model_name)
+        if model_name in _loading or (failed_at is not None and time.monotonic() - failed_at < LOAD_RETRY_SECONDS):
+            return None
+        _loading.add(model_name)
+    threading.Thread(target=_load_monitor, args=(model_name,), daemon=True).start()
+    return None
+
+
+def observe(model_name, matrix):
+    """
+    Add preprocessed rows submitted for prediction to the model's monitor.
+    Called by utils.prediction_cache on every prediction; does nothing while
+    monitoring is off. Rows submitted before the reference is loaded are not counted.
+    """
+    if not enabled:
+        return
+    monitor = drift_monitor(model_name)
+    if monitor is not None:
+        monitor.update(matrix)
+
+
+def drift_report():
+    """
+    Return the drift report of every monitored model.
+
+    Returns:
+    dict: 'generated_at' (UTC, ISO 8601) and 'models', model key -> DriftMonitor.report().
+    """
+    with _monitors_lock:
+        monitors = list(drift_monitors.values())
+    return {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'models': {monitor.model_name: monitor.report() for monitor in monitors},
+    }
+
+
+def drift_panel():
+    """
+    Show the drift of every monitored model in an expander, with the JSON
+    report as a download.
+    """
+    import pandas as pd
+    import streamlit as st
+
+    report = drift_report()
+    with st.expander("Input drift"):
+        if not report['models']:
+            st.caption("No predictions yet.")
+        for name, model_report in report['models'].items():
+            st.caption(f"{name}: {model_report['status']}, {model_report['observations']} rows submitted "
+                       f"since {model_report['since']} (PSI warning at {PSI_WARN}, drift at {PSI_ALERT}; "
+                       f"KS drift at {KS_ALERT})")
+            st.dataframe(pd.DataFrame(model_report['features']), hide_index=True)
+        st.download_button("Download report (JSON)", json.dumps(report, indent=2), file_name='drift_report.json',
+                           mime='application/json')
+
+
+def check_file(input_path, model_name):
+    """
+    Stream a CSV/Parquet file of raw inputs through a fresh monitor.
+
+    Returns:
+    dict: The monitor's report.
+    """
+    from utils.batch_prediction import read_chunks
+    from utils.feature_pipeline import load_pipeline
+
+    monitor = DriftMonitor(load_reference(model_name))
+    pipeline = load_pipeline(model_name)
+    for chunk in read_chunks(input_path):
+        monitor.update(pipeline.transform_frame(chunk).to_numpy(dtype=np.float32))
+    return monitor.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor the drift of the models' inputs from their training data.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Rebuild the reference histograms from the training CSV")
+    build.add_argument('--region', default=DEFAULT_REGION, help="Region whose data and pipeline are used")
+    check = commands.add_parser('check', help="Report the drift of a CSV/Parquet file of inputs")
+    check.add_argument('model', choices=sorted(MODEL_PATHS), help="Model the inputs are for")
+    check.add_argument('input_path', help="Input .csv or .parquet file with one row per prediction")
+    check.add_argument('--region', default=DEFAULT_REGION, help="Region whose model and baselines are used")
+    check.add_argument('--output', default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        for model_name in MODEL_PATHS:
+            print(f"Saved {write_reference(model_key(model_name, args.region))}")
+        return
+
+    report = check_file(args.input_path, model_key(args.model, args.region))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+        print(f"{report['model']}: {report['status']} over {report['observations']} rows -> {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import functools
+import gzip
+import io
+
+import pandas as pd
+from utils.tracing import span
+
+# Format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'csv.gz': ('application/gzip', '.csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+# Rows converted to CSV at a time, so only one block of text is held besides the output
+CSV_BLOCK_ROWS = 5000
+
+# Exports kept in memory (each is one filter state and format)
+MAX_CACHED_EXPORTS = 8
+
+
+def _write_csv(frame, file):
+    for start in range(0, max(len(frame), 1), CSV_BLOCK_ROWS):
+        block = frame.iloc[start:start + CSV_BLOCK_ROWS]
+        file.write(block.to_csv(index=False, header=start == 0).encode('utf-8'))
+
+
+def _write_parquet(frame, file):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), file, compression='zstd')
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_EXPORTS)
+def _export_bytes(ref, start_date, end_date, fmt):
+    dataset = ref.dataset
+    with span('export.serialize'):
+        rows = None if start_date is None else dataset.between(start_date, end_date)
+        frame = dataset.to_frame(rows)
+        output = io.BytesIO()
+        if fmt == 'csv':
+            _write_csv(frame, output)
+        elif fmt == 'csv.gz':
+            # mtime=0 keeps the bytes identical across runs
+            with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6, mtime=0) as file:
+                _write_csv(frame, file)
+        else:
+            _write_parquet(frame, output)
+        return output.getvalue()
+
+
+def export_bytes(dataset, start_date=None, end_date=None, fmt='csv'):
+    """
+    Serialize the rows of a date range, cached per dataset version, range and format.
+
+    Parameters:
+    dataset (Dataset): The shared dataset.
+    start_date (pd.Timestamp): First date exported. Defaults to the whole history.
+    end_date (pd.Timestamp): Last date exported.
+    fmt (str): A key of EXPORT_FORMATS.
+
+    Returns:
+    bytes: The file contents.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {list(EXPORT_FORMATS)}")
+    return _export_bytes(dataset.ref(), start_date, end_date, fmt)
+
+
+def lazy_export(dataset, start_date=None, end_date=None, fmt='csv'):
+    """
+    Return a zero-argument callable producing the export, for `st.download_button(data=...)`.
+
+    Nothing is serialized until a download is requested.
+
+    Returns:
+    tuple: (callable, file extension, MIME type)
+    """
+    if start_date is not None:
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    mime, extension = EXPORT_FORMATS[fmt]
+    return functools.partial(export_bytes, dataset, start_date, end_date, fmt), extension, mime
+
+
+def download_button(label, dataset, key, start_date=None, end_date=None, file_stem='covid_data'):
+    """
+    Show a format picker and a download button that serializes the rows only when clicked.
+
+    Parameters:
+    label (str): Button label.
+    dataset (Dataset): The shared dataset.
+    key (str): Widget key prefix, unique per page.
+    start_date (datetime-like): First date exported. Defaults to the whole history.
+    end_date (datetime-like): Last date exported.
+    file_stem (str): Downloaded file name without extension.
+    """
+    import streamlit as st
+
+    fmt = st.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_format")
+    data, extension, mime = lazy_export(dataset, start_date, end_date, fmt)
+    st.download_button(label, data=data, file_name=file_stem + extension, mime=mime, key=f"{key}_download",
+                       on_click='ignore')
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from utils.model_features import (CASE_DIFFERENCED_FEATURES, CASE_FEATURES, DEATH_DIFFERENCED_FEATURES,
+                                  DEATH_FEATURES, DEATH_LOG_FEATURES)
+from utils.model_loader import MODEL_PATHS, model_path, split_model_key
+from utils.regions import DEFAULT_REGION, region_model_dir
+
+# Bumped whenever the layout of the spec files changes
+SPEC_VERSION = 1
+
+# Operations a pipeline step can apply to its features, each followed by clipping:
+#   difference:        x - baseline
+#   log1p_difference:  log1p(x) - log1p(baseline)
+STEP_OPS = ('difference', 'log1p_difference')
+
+# Steps of each model, in the order they are applied
+PIPELINE_STEPS = {
+    'total_case': [
+        {'op': 'difference', 'baselines': CASE_DIFFERENCED_FEATURES, 'clip_lower': 0},
+    ],
+    'total_death': [
+        {'op': 'difference', 'baselines': DEATH_DIFFERENCED_FEATURES, 'clip_lower': 0},
+        {'op': 'log1p_difference', 'baselines': DEATH_LOG_FEATURES, 'clip_lower': 0},
+    ],
+}
+
+PIPELINE_FEATURES = {'total_case': CASE_FEATURES, 'total_death': DEATH_FEATURES}
+
+
+def pipeline_spec_path(pickle_path):
+    """
+    Return the path of the pipeline spec stored next to a pickled model.
+
+    Parameters:
+    pickle_path (str): Path of the pickled model.
+
+    Returns:
+    str: The .pipeline.json path.
+    """
+    return os.path.splitext(pickle_path)[0] + '.pipeline.json'
+
+
+def model_spec_path(key):
+    """
+    Return the pipeline spec of a model key: the region's own spec when it has
+    one (see utils.regions.write_region_specs), otherwise the spec next to the
+    model the region uses.
+
+    Parameters:
+    key (str): Output of utils.model_loader.model_key.
+
+    Returns:
+    str: The .pipeline.json path.
+    """
+    region, model_name = split_model_key(key)
+    if region != DEFAULT_REGION:
+        own_path = os.path.join(region_model_dir(region), os.path.basename(pipeline_spec_path(MODEL_PATHS[model_name])))
+        if os.path.exists(own_path):
+            return own_path
+    return pipeline_spec_path(model_path(key))
+
+
+def build_pipeline_spec(model_name):
+    """
+    Build the pipeline spec of a model from the feature definitions in utils.model_features.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death'.
+
+    Returns:
+    dict: The JSON-serializable spec.
+    """
+    return {
+        'spec_version': SPEC_VERSION,
+        'model': model_name,
+        'model_file': os.path.basename(MODEL_PATHS[model_name]),
+        'features': list(PIPELINE_FEATURES[model_name]),
+        'steps': [
+            {'op': step['op'], 'baselines': dict(step['baselines']), 'clip_lower': step['clip_lower']}
+            for step in PIPELINE_STEPS[model_name]
+        ],
+    }
+
+
+def export_pipeline_specs():
+    """
+    Write the pipeline spec of every registered model next to its pickle.
+
+    Returns:
+    list: The paths that were written.
+    """
+    written = []
+    for model_name, pickle_path in MODEL_PATHS.items():
+        path = pipeline_spec_path(pickle_path)
+        with open(path, 'w') as file:
+            json.dump(build_pipeline_spec(model_name), file, indent=2)
+            file.write('\n')
+        written.append(path)
+    return written
+
+
+class _CompiledStep:
+    """One pipeline step reduced to column positions and a baseline vector."""
+
+    def __init__(self, op, features, positions, raw_baselines, clip_lower):
+        self.op = op
+        self.features = features
+        self.positions = positions
+        self.raw_baselines = raw_baselines
+        # Baselines in the space the columns are compared in
+        self.baselines = np.log1p(raw_baselines) if op == 'log1p_difference' else raw_baselines
+        self.clip_lower = clip_lower
+
+
+class FeaturePipeline:
+    """
+    A model's feature transform, compiled from its spec into vectorized NumPy ops.
+
+    Each step works on all rows and all of its columns at once: the columns
+    are gathered by position, shifted by the baseline vector (in log1p space
+    for log1p_difference), clipped and written back. No pandas is involved.
+    """
+
+    def __init__(self, spec):
+        if spec.get('spec_version') != SPEC_VERSION:
+            raise ValueError(f"Unsupported pipeline spec version {spec.get('spec_version')!r}, expected {SPEC_VERSION}")
+        self.spec = spec
+        self.model_name = spec['model']
+        self.features = list(spec['features'])
+        self.checksum = hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+        positions = {feature: position for position, feature in enumerate(self.features)}
+        self.steps = []
+        for step in spec['steps']:
+            if step['op'] not in STEP_OPS:
+                raise ValueError(f"Unknown pipeline step '{step['op']}', expected one of {STEP_OPS}")
+            unknown = [feature for feature in step['baselines'] if feature not in positions]
+            if unknown:
+                raise ValueError(f"Pipeline step '{step['op']}' refers to features the model does not use: {unknown}")
+            features = list(step['baselines'])
+            baselines = np.array([step['baselines'][feature] for feature in features], dtype=np.float64)
+            self.steps.append(_CompiledStep(
+                step['op'], features, np.array([positions[feature] for feature in features], dtype=np.intp),
+                baselines, step.get('clip_lower'),
+            ))
+
+    def raw_baselines(self):
+        """
+        Return the last known value of every feature a step compares against.
+
+        Returns:
+        dict: Feature -> baseline, in raw (not log) units.
+        """
+        return {feature: float(value) for step in self.steps for feature, value in zip(step.features, step.raw_baselines)}
+
+    def transform(self, matrix, baselines=None):
+        """
+        Apply the pipeline to a raw input matrix.
+
+        Parameters:
+        matrix (np.ndarray): Raw inputs of shape (n_rows, n_features), columns in model order.
+        baselines (dict): Optional feature -> value or per-row array replacing the
+                          spec's baseline, e.g. the previous day of a forecast.
+
+        Returns:
+        np.ndarray: A new float64 matrix of preprocessed features.
+        """
+        out = np.array(matrix, dtype=np.float64, copy=True)
+        if out.ndim != 2 or out.shape[1] != len(self.features):
+            raise ValueError(f"Expected a matrix with {len(self.features)} columns, got shape {out.shape}")
+
+        for step in self.steps:
+            base = step.baselines
+            if baselines and any(feature in baselines for feature in step.features):
+                base = np.column_stack([
+                    np.broadcast_to(np.asarray(baselines.get(feature, fallback), dtype=np.float64), (len(out),))
+                    for feature, fallback in zip(step.features, step.raw_baselines)
+                ])
+                if step.op == 'log1p_difference':
+                    base = np.log1p(base)
+
+            columns = out[:, step.positions]
+            if step.op == 'log1p_difference':
+                np.log1p(columns, out=columns)
+            columns -= base
+            if step.clip_lower is not None:
+                np.maximum(columns, step.clip_lower, out=columns)
+            out[:, step.positions] = columns
+        return out
+
+    def transform_frame(self, input_df):
+        """
+        Apply the pipeline to a dataframe of raw inputs.
+
+        Parameters:
+        input_df (pd.DataFrame): One row per prediction with (at least) the model's features.
+
+        Returns:
+        pd.DataFrame: The preprocessed features in model order. input_df is not modified.
+        """
+        matrix = input_df[self.features].to_numpy(dtype=np.float64)
+        return pd.DataFrame(self.transform(matrix), columns=self.features, index=input_df.index, copy=False)
+
+
+# Spec path -> (mtime, compiled pipeline), oldest first; one entry per region and model
+_pipelines = OrderedDict()
+MAX_CACHED_PIPELINES = 64
+
+
+def load_pipeline(model_name):
+    """
+    Return the compiled pipeline of a model.
+
+    The spec is read from the .pipeline.json next to the model's pickle (or
+    from the region's own spec, see model_spec_path) and compiled once; it is
+    recompiled only when the file changes. Without a spec file, the spec is
+    built from utils.model_features.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+
+    Returns:
+    FeaturePipeline: The compiled pipeline.
+    """
+    path = model_spec_path(model_name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    cached = _pipelines.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    if mtime is None:
+        spec = build_pipeline_spec(split_model_key(model_name)[1])
+    else:
+        with open(path) as file:
+            spec = json.load(file)
+    pipeline = FeaturePipeline(spec)
+    _pipelines[path] = (mtime, pipeline)
+    while len(_pipelines) > MAX_CACHED_PIPELINES:
+        _pipelines.popitem(last=False)
+    return pipeline
+
+
+if __name__ == '__main__':
+    for written_path in export_pipeline_specs():
+        print(f"Saved {written_path}")
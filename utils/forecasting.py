@@ -0,0 +1,185 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from utils.feature_pipeline import load_pipeline
+from utils.model_features import CASE_FEATURES, DEATH_FEATURES
+from utils.model_loader import model_registry
+
+# Cumulative inputs, advanced each day by the matching '<feature>_daily' scenario column
+CUMULATIVE_FEATURES = ['fullyVaccinated', 'partiallyVaccinated', 'totalTests', 'totalVaccinations']
+
+# Inputs held at the scenario's level for the whole horizon
+LEVEL_FEATURES = [
+    'new_people_vaccinated_smoothed', 'new_vaccinations_smoothed', 'stringency_index', 'test24hours',
+    'vaccinated24hours', 'positive_rate', 'rfh', 'r3h',
+]
+
+SCENARIO_COLUMNS = LEVEL_FEATURES + [f'{feature}_daily' for feature in CUMULATIVE_FEATURES]
+
+# Days an active case stays active on average, used to roll imputed_active_cases forward
+DEFAULT_RECOVERY_DAYS = 14
+
+# Window of new_deaths_smoothed
+SMOOTHING_DAYS = 7
+
+
+def initial_state_from_dataset(dataset):
+    """
+    Take the forecast origin from the last day of the dataset.
+
+    Parameters:
+    dataset (Dataset): The shared dataset.
+
+    Returns:
+    dict: Raw input values on the last day, the last case/death totals, the
+          daily deaths of the last week, the recent daily increase of every
+          cumulative input ('<feature>_daily') and the origin date.
+    """
+    frame = dataset.frame
+    last = frame.iloc[-1]
+    state = {feature: float(last[feature]) for feature in set(CASE_FEATURES + DEATH_FEATURES) if feature in frame}
+    state['imputed_total_cases'] = float(last['imputed_total_cases'])
+    state['imputed_total_deaths'] = float(last['imputed_total_deaths'])
+    state['daily_deaths'] = frame['imputed_total_deaths'].diff().clip(lower=0).iloc[-SMOOTHING_DAYS:].to_numpy(dtype=np.float64)
+    population = dataset.static['population'] if 'population' in dataset.static else last['population']
+    state['population'] = float(population)
+    for feature in CUMULATIVE_FEATURES:
+        state[f'{feature}_daily'] = float(frame[feature].diff().clip(lower=0).iloc[-SMOOTHING_DAYS:].mean())
+    state['date'] = pd.Timestamp(last['date'])
+    return state
+
+
+def _scenario_matrix(scenarios, initial_state):
+    # One float64 column per scenario input; missing inputs fall back to the initial state
+    n_scenarios = len(scenarios)
+    columns = {}
+    for column in SCENARIO_COLUMNS:
+        if column in scenarios:
+            columns[column] = scenarios[column].to_numpy(dtype=np.float64)
+        else:
+            columns[column] = np.full(n_scenarios, initial_state[column], dtype=np.float64)
+    return columns
+
+
+def _model_input(pipeline, current, previous):
+    # Stack the raw inputs in model order and difference them against the previous day
+    matrix = np.column_stack([current[feature] for feature in pipeline.features]).astype(np.float64)
+    return pipeline.transform(matrix, baselines=previous)
+
+
+def advance_day(models, current, previous, state, recovery_days=DEFAULT_RECOVERY_DAYS):
+    """
+    Predict one day for many rows at once and feed the predictions back.
+
+    New deaths of the last SMOOTHING_DAYS days drive new_deaths_smoothed for
+    the case model, and new cases drive imputed_active_cases for the death
+    model. Each model is called once over all rows.
+
+    Parameters:
+    models (tuple): ((case_model, case_pipeline), (death_model, death_pipeline)).
+    current (dict): Raw inputs of the day, feature -> per-row array. The fed-back
+                    inputs are filled in.
+    previous (dict): Raw inputs of the day before, feature -> per-row array.
+    state (dict): 'total_cases', 'total_deaths' and 'active_cases' per row and
+                  'daily_deaths' of shape (n_rows, SMOOTHING_DAYS); updated in place.
+    recovery_days (float): Average days an active case stays active.
+    """
+    (case_model, case_pipeline), (death_model, death_pipeline) = models
+    current['new_deaths_smoothed'] = state['daily_deaths'].mean(axis=1)
+
+    case_input = _model_input(case_pipeline, current, previous)
+    new_total_cases = case_model.predict(case_input).astype(np.float64)
+    new_cases = np.maximum(new_total_cases - state['total_cases'], 0)
+    state['active_cases'] = np.maximum(state['active_cases'] + new_cases - state['active_cases'] / recovery_days, 0)
+    current['imputed_active_cases'] = state['active_cases']
+
+    death_input = _model_input(death_pipeline, current, previous)
+    new_total_deaths = death_model.predict(death_input).astype(np.float64)
+    new_deaths = np.maximum(new_total_deaths - state['total_deaths'], 0)
+    state['daily_deaths'] = np.column_stack([state['daily_deaths'][:, 1:], new_deaths])
+
+    state['total_cases'], state['total_deaths'] = new_total_cases, new_total_deaths
+
+
+def forecast(scenarios, horizon, initial_state, recovery_days=DEFAULT_RECOVERY_DAYS):
+    """
+    Forecast total cases and deaths `horizon` days ahead for many scenarios at once.
+
+    Every day, the cumulative inputs grow by their daily increase, the
+    calendar features move forward, and all inputs are differenced
+    (or log-differenced) against the previous day, as the prediction pages do
+    against the last known values. Predictions are fed back (see advance_day).
+    Each day is one model call per model over all scenarios.
+
+    Parameters:
+    scenarios (pd.DataFrame): One row per scenario with any of SCENARIO_COLUMNS.
+    horizon (int): Number of days to forecast.
+    initial_state (dict): Values on the origin day, see initial_state_from_dataset.
+    recovery_days (float): Average days an active case stays active.
+
+    Returns:
+    pd.DataFrame: One row per scenario and day with 'scenario', 'date',
+                  'predicted_total_imputed_cases' and 'predicted_total_deaths'.
+    """
+    n_scenarios = len(scenarios)
+    inputs = _scenario_matrix(scenarios, initial_state)
+    models = tuple((model_registry.get(name), load_pipeline(name)) for name in ('total_case', 'total_death'))
+
+    def full(value):
+        return np.full(n_scenarios, value, dtype=np.float64)
+
+    previous = {feature: full(initial_state[feature]) for feature in set(CASE_FEATURES + DEATH_FEATURES)
+                if feature in initial_state}
+    state = {
+        'total_cases': full(initial_state['imputed_total_cases']),
+        'total_deaths': full(initial_state['imputed_total_deaths']),
+        'active_cases': full(initial_state['imputed_active_cases']),
+        'daily_deaths': np.tile(np.asarray(initial_state['daily_deaths'], dtype=np.float64)[-SMOOTHING_DAYS:], (n_scenarios, 1)),
+    }
+    tests_per_thousand_step = 1000 * inputs['totalTests_daily'] / initial_state['population']
+
+    dates = pd.date_range(initial_state['date'] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    predicted_cases = np.empty((n_scenarios, horizon), dtype=np.float64)
+    predicted_deaths = np.empty((n_scenarios, horizon), dtype=np.float64)
+
+    for step, date in enumerate(dates):
+        current = {feature: inputs[feature] for feature in LEVEL_FEATURES}
+        for feature in CUMULATIVE_FEATURES:
+            current[feature] = previous[feature] + inputs[f'{feature}_daily']
+        current['total_tests_per_thousand'] = previous['total_tests_per_thousand'] + tests_per_thousand_step
+        current['month'] = full(date.month)
+        current['day_of_week'] = full(date.dayofweek)
+
+        advance_day(models, current, previous, state, recovery_days)
+        predicted_cases[:, step] = state['total_cases']
+        predicted_deaths[:, step] = state['total_deaths']
+        previous = current
+
+    return pd.DataFrame({
+        'scenario': np.repeat(scenarios.index.to_numpy(), horizon),
+        'date': np.tile(dates.to_numpy(), n_scenarios),
+        'predicted_total_imputed_cases': predicted_cases.ravel(),
+        'predicted_total_deaths': predicted_deaths.ravel(),
+    })
+
+
+def main(argv=None):
+    from utils.dataset import get_dataset
+
+    parser = argparse.ArgumentParser(description="Forecast total cases and deaths for a file of scenarios.")
+    parser.add_argument('scenarios_path', help="CSV with one scenario per row and any of: " + ", ".join(SCENARIO_COLUMNS))
+    parser.add_argument('output_path', help="Output CSV")
+    parser.add_argument('--horizon', type=int, default=90, help="Days to forecast")
+    parser.add_argument('--recovery-days', type=float, default=DEFAULT_RECOVERY_DAYS,
+                        help="Average days an active case stays active")
+    args = parser.parse_args(argv)
+
+    scenarios = pd.read_csv(args.scenarios_path)
+    result = forecast(scenarios, args.horizon, initial_state_from_dataset(get_dataset()), args.recovery_days)
+    result.to_csv(args.output_path, index=False)
+    print(f"Forecast {len(scenarios)} scenarios {args.horizon} days ahead -> {args.output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from utils.data_loader import DATA_PATH, DATE_COLUMN, list_parts, open_table, parts_dir
+
+# Cumulative column -> daily column added to it every day
+CUMULATIVE_SUMS = {
+    'imputed_total_cases': 'newCases',
+    'imputed_total_deaths': 'deathDay',
+    'total_deaths': 'deathDay',
+    'totalTests': 'test24hours',
+    'totalVaccinations': 'vaccinated24hours',
+}
+
+# Per-capita total -> (daily column, scale, decimals kept), advanced by the daily value per
+# `scale` inhabitants so it continues the stored series rather than restarting from a ratio
+PER_CAPITA_SUMS = {
+    'total_cases_per_million': ('newCases', 1e6, 3),
+    'total_deaths_per_million': ('deathDay', 1e6, 3),
+    'total_tests_per_thousand': ('test24hours', 1e3, 3),
+}
+
+# Smoothed column -> (source column, trailing window in days, decimals kept or None)
+ROLLING_MEANS = {
+    'new_cases_smoothed': ('newCases', 7, 3),
+    'new_deaths_smoothed': ('deathDay', 7, 3),
+    'new_tests_smoothed': ('test24hours', 7, 0),
+    'new_vaccinations_smoothed': ('vaccinated24hours', 7, 0),
+    'rfh_avg': ('rfh', 10, None),
+    'r1h_avg': ('r1h', 30, None),
+    'r3h_avg': ('r3h', 90, None),
+}
+
+# Ratio column -> (numerator, denominator, scale, decimals kept or None), computed after the sums and means
+RATIOS = {
+    'new_cases_smoothed_per_million': ('new_cases_smoothed', 'population', 1e6, 3),
+    'new_deaths_smoothed_per_million': ('new_deaths_smoothed', 'population', 1e6, 3),
+    'new_tests_smoothed_per_thousand': ('new_tests_smoothed', 'population', 1e3, 3),
+    'new_vaccinations_smoothed_per_million': ('new_vaccinations_smoothed', 'population', 1e6, 0),
+    'new_people_vaccinated_smoothed_per_hundred': ('new_people_vaccinated_smoothed', 'population', 1e2, 3),
+    'imputed_mortality_rate': ('imputed_total_deaths', 'imputed_total_cases', 1e2, None),
+}
+
+# Cases that are neither recovered nor fatal
+ACTIVE_CASES = ('imputed_active_cases', 'imputed_total_cases', 'imputed_total_deaths', 'imputed_total_recoveries')
+
+# Raw columns that hold one day's value rather than a level. A day without a
+# value adds nothing: counts default to 0 and readings (rainfall) to missing,
+# which the rolling means skip. Every other raw column carries its last value forward.
+DAILY_COUNTS = set(CUMULATIVE_SUMS.values())
+DAILY_READINGS = {source for source, _, _ in ROLLING_MEANS.values()} - DAILY_COUNTS
+
+DERIVED_COLUMNS = set(CUMULATIVE_SUMS) | set(PER_CAPITA_SUMS) | set(ROLLING_MEANS) | set(RATIOS) | {ACTIVE_CASES[0]}
+
+
+def state_path(path=DATA_PATH):
+    """
+    Return the path of the ingestion state stored with the appended parts.
+
+    Parameters:
+    path (str): The source CSV.
+
+    Returns:
+    str: Path of state.json.
+    """
+    return os.path.join(parts_dir(path), 'state.json')
+
+
+def build_state(table):
+    """
+    Derive the ingestion state from the last rows of the store.
+
+    Only the longest rolling window is read, so this costs O(window) however
+    long the history is.
+
+    Parameters:
+    table (pyarrow.Table): The stored dataset, see utils.data_loader.open_table.
+
+    Returns:
+    dict: Row count, last date, every value of the last row (including the
+          running totals) and the trailing window of every rolling mean.
+    """
+    longest = max(window for _, window, _ in ROLLING_MEANS.values())
+    tail = table.slice(max(table.num_rows - longest, 0)).to_pandas()
+    last = tail.iloc[-1]
+    return {
+        'rows': table.num_rows,
+        'last_date': pd.Timestamp(last[DATE_COLUMN]).isoformat(),
+        'last_row': {column: float(last[column]) for column in tail.columns if column != DATE_COLUMN},
+        'windows': {
+            smoothed: tail[source].to_numpy(dtype=np.float64)[len(tail) - (window - 1):].tolist()
+            for smoothed, (source, window, _) in ROLLING_MEANS.items()
+        },
+    }
+
+
+def load_state(table, path=DATA_PATH):
+    """
+    Read the stored ingestion state, rebuilding it from the store when it is
+    missing or does not match the stored row count (e.g. after the CSV changed).
+
+    Parameters:
+    table (pyarrow.Table): The stored dataset.
+    path (str): The source CSV.
+
+    Returns:
+    dict: See build_state.
+    """
+    try:
+        with open(state_path(path)) as file:
+            state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        state = None
+    if state is None or state.get('rows') != table.num_rows:
+        state = build_state(table)
+    return state
+
+
+def _round(values, decimals):
+    return values if decimals is None else np.round(values, decimals)
+
+
+def _trailing_mean(history, values, window):
+    # Mean of each new value with the (window - 1) values before it; NaN padding
+    # covers stores shorter than the window
+    padded = np.concatenate([np.full(window - 1 - len(history), np.nan), history, values])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    return np.nanmean(windows, axis=1)
+
+
+def derive_rows(raw, state, columns):
+    """
+    Compute the full rows for new days from their raw values and the stored state.
+
+    Raw columns that are not given carry the last stored value forward, except
+    daily counts (0) and daily readings (missing), see DAILY_COUNTS.
+    Cumulative sums, rolling means, active cases and ratios are derived from
+    the new rows plus the state only, never from the full history.
+
+    Parameters:
+    raw (pd.DataFrame): One row per new day with a 'date' column and any raw (non-derived) columns.
+    state (dict): The ingestion state, see build_state.
+    columns (list): Column order of the store.
+
+    Returns:
+    tuple: (rows, new_state) where rows is a pd.DataFrame in store column order.
+
+    Raises:
+    ValueError: If the input has derived or unknown columns, or its dates do not
+                continue the store day by day.
+    """
+    if DATE_COLUMN not in raw.columns:
+        raise ValueError(f"New rows need a '{DATE_COLUMN}' column")
+    derived = sorted(DERIVED_COLUMNS.intersection(raw.columns))
+    if derived:
+        raise ValueError(f"These columns are computed during ingestion and must not be given: {derived}")
+    unknown = sorted(set(raw.columns) - set(columns))
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}")
+
+    raw = raw.sort_values(DATE_COLUMN, kind='stable')
+    dates = pd.to_datetime(raw[DATE_COLUMN]).to_numpy(dtype='datetime64[ns]')
+    expected = np.datetime64(pd.Timestamp(state['last_date']), 'ns') + np.arange(1, len(raw) + 1) * np.timedelta64(1, 'D')
+    if not np.array_equal(dates, expected):
+        raise ValueError(f"New rows must cover consecutive days starting the day after {state['last_date'][:10]}")
+
+    n_rows = len(raw)
+    last_row = state['last_row']
+    rows = {}
+    for column in columns:
+        if column == DATE_COLUMN or column in DERIVED_COLUMNS:
+            continue
+        if column in raw.columns:
+            rows[column] = raw[column].to_numpy(dtype=np.float64)
+        elif column in DAILY_COUNTS:
+            rows[column] = np.zeros(n_rows, dtype=np.float64)
+        elif column in DAILY_READINGS:
+            rows[column] = np.full(n_rows, np.nan)
+        else:
+            rows[column] = np.full(n_rows, last_row[column], dtype=np.float64)
+
+    for total, daily in CUMULATIVE_SUMS.items():
+        rows[total] = last_row[total] + np.nancumsum(rows[daily])
+
+    for total, (daily, scale, decimals) in PER_CAPITA_SUMS.items():
+        rows[total] = _round(last_row[total] + np.nancumsum(rows[daily] / rows['population'] * scale), decimals)
+
+    windows = {}
+    for smoothed, (source, window, decimals) in ROLLING_MEANS.items():
+        history = np.asarray(state['windows'][smoothed], dtype=np.float64)
+        rows[smoothed] = _round(_trailing_mean(history, rows[source], window), decimals)
+        windows[smoothed] = np.concatenate([history, rows[source]])[-(window - 1):].tolist() if window > 1 else []
+
+    active, cases, deaths, recoveries = ACTIVE_CASES
+    rows[active] = rows[cases] - rows[deaths] - rows[recoveries]
+
+    for ratio, (numerator, denominator, scale, decimals) in RATIOS.items():
+        rows[ratio] = _round(rows[numerator] / rows[denominator] * scale, decimals)
+
+    rows[DATE_COLUMN] = dates
+    frame = pd.DataFrame(rows)[list(columns)]
+    new_state = {
+        'rows': state['rows'] + n_rows,
+        'last_date': pd.Timestamp(dates[-1]).isoformat(),
+        'last_row': {column: float(frame[column].iloc[-1]) for column in columns if column != DATE_COLUMN},
+        'windows': windows,
+    }
+    return frame, new_state
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def append_days(raw, path=DATA_PATH):
+    """
+    Append new days to the store as one new Feather part, without touching
+    the CSV, its columnar copy or earlier parts.
+
+    The work is proportional to the number of new rows: the state holds the
+    running totals and rolling windows, and the existing data is only
+    memory-mapped, never read in full.
+
+    Parameters:
+    raw (pd.DataFrame): One row per new day, see derive_rows.
+    path (str): The source CSV.
+
+    Returns:
+    str: Path of the part that was written.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = open_table(path)
+    state = load_state(table, path)
+    frame, new_state = derive_rows(raw, state, table.column_names)
+
+    schema = table.schema.remove_metadata()
+    part = pa.Table.from_pandas(frame, schema=schema, preserve_index=False).replace_schema_metadata(None)
+
+    directory = parts_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    first, last = pd.Timestamp(frame[DATE_COLUMN].iloc[0]), pd.Timestamp(frame[DATE_COLUMN].iloc[-1])
+    part_path = os.path.join(directory, f"part-{len(list_parts(path)) + 1:06d}-{first:%Y%m%d}-{last:%Y%m%d}.feather")
+
+    _write_atomic(part_path, lambda tmp_path: feather.write_feather(part, tmp_path, compression='uncompressed'))
+
+    def write_state(tmp_path):
+        with open(tmp_path, 'w') as file:
+            json.dump(new_state, file)
+
+    _write_atomic(state_path(path), write_state)
+    return part_path
+
+
+def read_new_days(input_path):
+    """
+    Read a CSV of new days, accepting the date column as 'date' or unnamed like the source CSV.
+
+    Parameters:
+    input_path (str): CSV with one row per new day.
+
+    Returns:
+    pd.DataFrame: The raw rows with a datetime 'date' column.
+    """
+    raw = pd.read_csv(input_path)
+    raw.rename(columns={"Unnamed: 0": DATE_COLUMN}, inplace=True)
+    raw[DATE_COLUMN] = pd.to_datetime(raw[DATE_COLUMN])
+    return raw
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new daily rows to the dataset without recomputing history.")
+    parser.add_argument('input_path', help="CSV with one row per new day: 'date' plus any raw columns")
+    parser.add_argument('--data-path', default=DATA_PATH, help="Source CSV the rows are appended to")
+    args = parser.parse_args(argv)
+
+    raw = read_new_days(args.input_path)
+    part_path = append_days(raw, args.data_path)
+    print(f"Appended {len(raw)} days -> {part_path}")
+
+
+if __name__ == '__main__':
+    main()
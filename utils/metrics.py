@@ -0,0 +1,91 @@
+import bisect
+import threading
+
+# Upper bounds (seconds) of the latency buckets, from 0.1 ms to 10 s
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class LatencyHistogram:
+    """
+    Thread-safe fixed-bucket histogram of durations, in the Prometheus style:
+    one counter per bucket upper bound plus an overflow bucket, a count and a sum.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Parameters:
+        q (float): Quantile between 0 and 1.
+
+        Returns:
+        float: The estimate, inf if it falls in the overflow bucket, nan when empty.
+        """
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if count == 0:
+            return float('nan')
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        """
+        Return the histogram as a JSON-serializable dict.
+        """
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counts': list(self.counts),
+                'count': self.count,
+                'sum': self.sum,
+            }
+
+    def to_prometheus(self, name, labels=None):
+        """
+        Render the histogram in the Prometheus text exposition format.
+
+        Parameters:
+        name (str): Metric name.
+        labels (dict): Extra labels added to every sample.
+
+        Returns:
+        str: The metric lines, without the # HELP/# TYPE header.
+        """
+        labels = dict(labels or {})
+        snapshot = self.snapshot()
+
+        def render(extra):
+            pairs = {**labels, **extra}
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs.items()) + '}'
+
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(snapshot['buckets'] + ['+Inf'], snapshot['counts']):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{render({'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{render({})} {snapshot['sum']}")
+        lines.append(f"{name}_count{render({})} {snapshot['count']}")
+        return '\n'.join(lines)
@@ -0,0 +1,66 @@
+from utils.tracing import traced
+
+# Feature order expected by model/xgb_model_total_imputed_cases
+CASE_FEATURES = [
+    'fullyVaccinated', 'new_deaths_smoothed', 'new_people_vaccinated_smoothed', 'new_vaccinations_smoothed',
+    'partiallyVaccinated', 'stringency_index', 'test24hours', 'totalTests', 'totalVaccinations',
+    'vaccinated24hours', 'rfh', 'r3h', 'month', 'day_of_week',
+]
+
+# Last known values the non-stationary case features are differenced against
+CASE_DIFFERENCED_FEATURES = {
+    'fullyVaccinated': 9327654, 'partiallyVaccinated': 4663827, 'totalTests': 239937354,
+    'totalVaccinations': 9982068
+}
+
+# Feature order expected by model/xgb_model_total_deaths
+DEATH_FEATURES = [
+    'imputed_active_cases', 'fullyVaccinated', 'new_vaccinations_smoothed', 'partiallyVaccinated',
+    'stringency_index', 'test24hours', 'totalVaccinations', 'total_tests_per_thousand', 'vaccinated24hours',
+    'positive_rate', 'rfh', 'r3h', 'day_of_week', 'month',
+]
+
+# Last known values the non-stationary death features are differenced against
+DEATH_DIFFERENCED_FEATURES = {
+    'fullyVaccinated': 9327654, 'partiallyVaccinated': 4663827, 'stringency_index': 13.89,
+    'totalVaccinations': 9982068
+}
+
+# Death features that are log-differenced against their last known value
+DEATH_LOG_FEATURES = {'total_tests_per_thousand': 180}
+
+
+@traced('preprocess')
+def preprocess_case_features(input_df, region=None):
+    """
+    Turn raw inputs into the feature matrix of the total case model.
+
+    Parameters:
+    input_df (pd.DataFrame): One row per prediction with (at least) the columns in CASE_FEATURES.
+    region (str): Region whose last known values the inputs are differenced against. Defaults to the default region.
+
+    Returns:
+    pd.DataFrame: The preprocessed features in model order. input_df is not modified.
+    """
+    from utils.feature_pipeline import load_pipeline
+    from utils.model_loader import model_key
+
+    return load_pipeline(model_key('total_case', region)).transform_frame(input_df)
+
+
+@traced('preprocess')
+def preprocess_death_features(input_df, region=None):
+    """
+    Turn raw inputs into the feature matrix of the total death model.
+
+    Parameters:
+    input_df (pd.DataFrame): One row per prediction with (at least) the columns in DEATH_FEATURES.
+    region (str): Region whose last known values the inputs are differenced against. Defaults to the default region.
+
+    Returns:
+    pd.DataFrame: The preprocessed features in model order. input_df is not modified.
+    """
+    from utils.feature_pipeline import load_pipeline
+    from utils.model_loader import model_key
+
+    return load_pipeline(model_key('total_death', region)).transform_frame(input_df)
@@ -1,11 +1,416 @@
+import hashlib
+import os
 import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from utils.regions import DEFAULT_REGION, region_model_dir
+from utils.tracing import span
+
+# Model name -> pickle path. The native XGBoost file lives next to the pickle
+# with the same stem and a .ubj (or .json) extension.
+MODEL_PATHS = {
+    'total_case': 'model/xgb_model_total_imputed_cases.pkl',
+    'total_death': 'model/xgb_model_total_deaths.pkl',
+}
+
+NATIVE_EXTENSIONS = ('.ubj', '.json')
+
+# Seconds a native file may be older than its pickle and still be preferred,
+# so files written, checked out or copied together do not fall back to the pickle
+NATIVE_MTIME_TOLERANCE = 2.0
+
+# Memory held by the model pool, in MiB. A loaded booster takes about 2.5 times
+# its file size, which is what the pool counts against the budget.
+MODEL_POOL_MB = int(os.environ.get('MODEL_POOL_MB', 256))
+MODEL_MEMORY_FACTOR = 2.5
+
+
+def model_key(model_name, region=DEFAULT_REGION):
+    """
+    Return the key of a region's model: the model name for the default region,
+    '<region>/<model name>' for the others.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death'.
+    region (str): Region folder name (see utils.regions).
+
+    Returns:
+    str: The model key.
+    """
+    return model_name if region in (None, DEFAULT_REGION) else f"{region}/{model_name}"
+
+
+def split_model_key(key):
+    """
+    Split a model key into (region, model name).
+    """
+    region, _, model_name = key.rpartition('/')
+    return region or DEFAULT_REGION, model_name
+
+
+def model_path(key):
+    """
+    Return the pickle path of a model key. Regions without a model of their
+    own share the default region's model.
+
+    Parameters:
+    key (str): Output of model_key.
+
+    Returns:
+    str: Path of the pickle (the native file next to it is preferred when loading).
+    """
+    region, model_name = split_model_key(key)
+    shared_path = MODEL_PATHS[model_name]
+    if region == DEFAULT_REGION:
+        return shared_path
+    own_path = os.path.join(region_model_dir(region), os.path.basename(shared_path))
+    if os.path.exists(own_path) or resolve_model_path(own_path) != own_path:
+        return own_path
+    return shared_path
+
+
+def native_model_path(pickle_path, extension='.ubj'):
+    """
+    Return the path of the native XGBoost file stored next to a pickle.
+
+    Parameters:
+    pickle_path (str): Path of the pickled model.
+    extension (str): '.ubj' (binary) or '.json'.
+
+    Returns:
+    str: The native model path.
+    """
+    return os.path.splitext(pickle_path)[0] + extension
+
+
+def resolve_model_path(pickle_path):
+    """
+    Pick the file a model is loaded from: the native XGBoost file when one
+    exists and is at least as new as the pickle, otherwise the pickle. A
+    pickle replaced after the native export is loaded from the pickle until
+    the native file is exported again (export_native_models).
+
+    Parameters:
+    pickle_path (str): Path of the pickled model.
+
+    Returns:
+    str: The path to load.
+    """
+    try:
+        pickle_mtime = os.path.getmtime(pickle_path)
+    except OSError:
+        pickle_mtime = None
+    for extension in NATIVE_EXTENSIONS:
+        path = native_model_path(pickle_path, extension)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if pickle_mtime is None or mtime >= pickle_mtime - NATIVE_MTIME_TOLERANCE:
+            return path
+    return pickle_path
+
+
+def read_model_file(path):
+    """
+    Load a model from a native XGBoost file or a pickle.
+
+    Parameters:
+    path (str): Path of a .ubj, .json or .pkl model file.
+
+    Returns:
+    xgboost.XGBRegressor: The loaded model.
+    """
+    if path.endswith(NATIVE_EXTENSIONS):
+        import xgboost as xgb
+
+        model = xgb.XGBRegressor()
+        model.load_model(path)
+        return model
+
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 checksum of a file.
+
+    Parameters:
+    path (str): The file to hash.
+    chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+    str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_native_models(extension='.ubj'):
+    """
+    Save every registered model in XGBoost's native format next to its pickle.
+
+    Parameters:
+    extension (str): '.ubj' (binary) or '.json'.
+
+    Returns:
+    list: The paths that were written.
+    """
+    written = []
+    for pickle_path in MODEL_PATHS.values():
+        model = read_model_file(pickle_path)
+        path = native_model_path(pickle_path, extension)
+        model.save_model(path)
+        written.append(path)
+    return written
+
+
+class _ModelEntry:
+    """A loaded model together with the file state it was loaded from."""
+
+    def __init__(self, model, path, mtime, checksum):
+        self.model = model
+        self.path = path
+        self.mtime = mtime
+        self.checksum = checksum
+        self.size = int(os.path.getsize(path) * MODEL_MEMORY_FACTOR)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the prediction models.
+
+    Each model is loaded once and then shared by every Streamlit session in the
+    process. The source file is re-checked at most every `check_interval`
+    seconds; when its mtime changes and its checksum differs, the new model is
+    loaded on a background thread and swapped in once ready, so requests keep
+    using the current model in the meantime.
+
+    With `max_bytes` set, models are kept in least-recently-used order and the
+    least recently used ones are dropped once the loaded models are estimated
+    to take more than `max_bytes`; a dropped model is loaded again on next use.
+    """
+
+    def __init__(self, model_paths, check_interval=2.0, max_bytes=None):
+        self.model_paths = dict(model_paths)
+        self.check_interval = check_interval
+        self.max_bytes = max_bytes
+        self.loads = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._last_checked = {}
+        self._reloading = set()
+        self._warm_up_thread = None
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Return the model registered under `name`, loading it on first use.
+
+        Parameters:
+        name (str): A key of `model_paths`.
+
+        Returns:
+        xgboost.XGBRegressor: The current model.
+        """
+        return self._entry(name).model
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is None:
+                    entry = self._load(name)
+                    self._entries[name] = entry
+                    self._last_checked[name] = time.monotonic()
+                    self.loads += 1
+                    self._evict(keep=name)
+            return entry
+
+        if self.max_bytes is not None:
+            with self._lock:
+                if name in self._entries:
+                    self._entries.move_to_end(name)
+        self._check_for_update(name, entry)
+        return entry
+
+    def _evict(self, keep):
+        # Called with the lock held; the model just loaded is never dropped
+        if self.max_bytes is None:
+            return
+        total = sum(entry.size for entry in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._entries.pop(name).size
+            self._last_checked.pop(name, None)
+            self.evictions += 1
+
+    def version(self, name):
+        """
+        Return the checksum of the file the current model was loaded from.
+
+        Parameters:
+        name (str): A key of `model_paths`.
+
+        Returns:
+        str: The SHA-256 hex digest.
+        """
+        return self._entry(name).checksum
+
+    def get_with_version(self, name):
+        """
+        Return the current model together with its checksum, read from the
+        same entry so the pair stays consistent while a reload swaps models.
+
+        Parameters:
+        name (str): A key of `model_paths`.
+
+        Returns:
+        tuple: (xgboost.XGBRegressor, SHA-256 hex digest).
+        """
+        entry = self._entry(name)
+        return entry.model, entry.checksum
+
+    def stats(self):
+        """
+        Return the number and estimated size of the loaded models, with load and eviction counters.
+        """
+        with self._lock:
+            return {
+                'models': len(self._entries),
+                'bytes': sum(entry.size for entry in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+    def warm_up(self, names=None):
+        """
+        Load the models and run one prediction through each of them so the
+        first user request does not pay for loading or lazy initialisation.
+
+        Parameters:
+        names (list): Models to warm up. Defaults to all registered models.
+        """
+        for name in names or self.model_paths:
+            model = self.get(name)
+            n_features = model.get_booster().num_features()
+            model.predict(np.zeros((1, n_features), dtype=np.float32))
+
+    def warm_up_in_background(self, names=None):
+        """
+        Start `warm_up` on a daemon thread. Only the first call starts a
+        thread, so it is safe to call on every Streamlit rerun.
+
+        Returns:
+        threading.Thread: The warm-up thread.
+        """
+        with self._lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(target=self.warm_up, args=(names,), daemon=True)
+                self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def _path(self, name):
+        return self.model_paths[name]
+
+    def _load(self, name):
+        path = resolve_model_path(self._path(name))
+        mtime = os.path.getmtime(path)
+        checksum = file_checksum(path)
+        with span('model.load'):
+            model = read_model_file(path)
+        return _ModelEntry(model, path, mtime, checksum)
+
+    def _check_for_update(self, name, entry):
+        now = time.monotonic()
+        if now - self._last_checked.get(name, 0.0) < self.check_interval:
+            return
+        self._last_checked[name] = now
+
+        # Resolving looks at both the pickle and the native file, so replacing either one is picked up
+        path = resolve_model_path(self._path(name))
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        if path == entry.path and mtime == entry.mtime:
+            return
+
+        with self._lock:
+            if name in self._reloading:
+                return
+            self._reloading.add(name)
+        threading.Thread(target=self._reload, args=(name, entry), daemon=True).start()
+
+    def _reload(self, name, old_entry):
+        try:
+            path = resolve_model_path(self._path(name))
+            mtime = os.path.getmtime(path)
+            checksum = file_checksum(path)
+            if checksum == old_entry.checksum:
+                # Touched but unchanged: remember the new mtime only.
+                new_entry = _ModelEntry(old_entry.model, path, mtime, checksum)
+            else:
+                new_entry = _ModelEntry(read_model_file(path), path, mtime, checksum)
+            with self._lock:
+                # A model evicted while it was reloading stays evicted
+                if name in self._entries:
+                    self._entries[name] = new_entry
+                    self._evict(keep=name)
+        except Exception:
+            # Keep serving the current model if the new file is incomplete or
+            # unreadable; the next check will try again.
+            pass
+        finally:
+            with self._lock:
+                self._reloading.discard(name)
+
+
+class ModelPool(ModelRegistry):
+    """
+    Model registry for every region, bounded in memory.
+
+    Models are looked up by model key (see model_key): the default region's
+    models under their plain names, other regions' models as
+    '<region>/<model name>', each loaded on first use from the region's model
+    folder or, without one, from the shared model. The least recently used
+    models are dropped once the pool holds more than `max_bytes`, so memory
+    stays bounded however many regions exist.
+    """
+
+    def __init__(self, model_paths, check_interval=2.0, max_bytes=MODEL_POOL_MB << 20):
+        super().__init__(model_paths, check_interval, max_bytes)
+
+    def _entry(self, name):
+        # Entries are kept per model file, so regions sharing a model share one copy of it
+        return super()._entry(model_path(name))
+
+    def _path(self, name):
+        return name
+
+
+model_registry = ModelPool(MODEL_PATHS)
+
 
 def load_model_total_case():
-    with open('model/xgb_model_total_imputed_cases.pkl', 'rb') as file:
-        model = pickle.load(file)
-    return model
+    return model_registry.get('total_case')
 
 def load_model_total_death():
-    with open('model/xgb_model_total_deaths.pkl', 'rb') as file:
-        model = pickle.load(file)
-    return model
+    return model_registry.get('total_death')
+
+
+if __name__ == '__main__':
+    for written_path in export_native_models():
+        print(f"Saved {written_path}")
@@ -0,0 +1,340 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from utils.drift import observe
+from utils.model_loader import MODEL_PATHS, model_registry
+from utils.tracing import span
+
+DEFAULT_MAXSIZE = 100_000
+DEFAULT_TTL_SECONDS = 3600
+
+# 'xgboost' scores with the loaded booster; 'numpy' with the array export in
+# utils.tree_evaluator, which does not import xgboost
+BACKENDS = ('xgboost', 'numpy')
+DEFAULT_BACKEND = os.environ.get('PREDICTION_BACKEND', 'xgboost')
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with a time-to-live and hit/miss counters.
+
+    Entries expire `ttl` seconds after they were stored; the least recently
+    used entry is evicted once more than `maxsize` entries are held.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once.
+
+        Parameters:
+        keys (list): Cache keys.
+
+        Returns:
+        list: The cached value for each key, or None where it is missing or expired.
+        """
+        now = self.clock()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values.append(entry[0])
+        return values
+
+    def put_many(self, keys, values):
+        """
+        Store several values at once, evicting the least recently used entries when full.
+        """
+        expires_at = self.clock() + self.ttl
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Return the cache counters as a dict.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def feature_matrix(preprocessed_data):
+    """
+    Convert preprocessed features to the float32 matrix the model sees.
+
+    Parameters:
+    preprocessed_data (pd.DataFrame or np.ndarray): Preprocessed features in model order.
+
+    Returns:
+    np.ndarray: A C-contiguous float32 matrix, with -0.0 normalized to 0.0.
+    """
+    matrix = np.array(preprocessed_data, dtype=np.float32, order='C', copy=True)
+    matrix += 0.0
+    return matrix
+
+
+def row_keys(matrix, model_version, backend='xgboost'):
+    """
+    Hash every row of a feature matrix together with the model version and backend.
+
+    Parameters:
+    matrix (np.ndarray): Output of feature_matrix.
+    model_version (str): Checksum of the model file.
+    backend (str): One of BACKENDS.
+
+    Returns:
+    list: One 16-byte digest per row.
+    """
+    salt = model_version.encode('ascii')[:16]
+    person = backend.encode('ascii')[:16]
+    return [hashlib.blake2b(row.tobytes(), digest_size=16, salt=salt, person=person).digest() for row in matrix]
+
+
+class _CachedModel:
+    # One cache per model, emptied whenever the model file changes
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.cache = PredictionCache()
+        self.contributions = PredictionCache()
+        self.intervals = PredictionCache()
+        self.version = None
+        self.interval_version = None
+        self._lock = threading.Lock()
+
+    def _sync_version(self, version):
+        with self._lock:
+            if version != self.version:
+                self.cache.clear()
+                self.contributions.clear()
+                self.version = version
+
+    def predict(self, preprocessed_data, backend=DEFAULT_BACKEND):
+        if backend == 'numpy':
+            from utils.tree_evaluator import load_tree_ensemble
+
+            model = load_tree_ensemble(self.model_name)
+            version = model.source_checksum
+        elif backend == 'xgboost':
+            model, version = model_registry.get_with_version(self.model_name)
+        else:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        self._sync_version(version)
+
+        matrix = feature_matrix(preprocessed_data)
+        observe(self.model_name, matrix)
+        keys = row_keys(matrix, version, backend)
+        cached = self.cache.get_many(keys)
+
+        predictions = np.empty(len(keys), dtype=np.float32)
+        missing = [position for position, value in enumerate(cached) if value is None]
+        for position, value in enumerate(cached):
+            if value is not None:
+                predictions[position] = value
+        if missing:
+            with span('model.predict'):
+                scored = model.predict(matrix[missing])
+            predictions[missing] = scored
+            self.cache.put_many([keys[position] for position in missing], scored.tolist())
+        return predictions
+
+    def explain(self, preprocessed_data, approximate=False):
+        # Contributions always come from the XGBoost booster; the NumPy evaluator only predicts
+        import xgboost as xgb
+
+        model, version = model_registry.get_with_version(self.model_name)
+        self._sync_version(version)
+        booster = model.get_booster()
+
+        matrix = feature_matrix(preprocessed_data)
+        keys = row_keys(matrix, version, 'approx' if approximate else 'contribs')
+        cached = self.contributions.get_many(keys)
+
+        contributions = np.empty((len(keys), matrix.shape[1] + 1), dtype=np.float32)
+        missing = [position for position, value in enumerate(cached) if value is None]
+        for position, value in enumerate(cached):
+            if value is not None:
+                contributions[position] = value
+        if missing:
+            with span('model.explain'):
+                data = xgb.DMatrix(matrix[missing], feature_names=booster.feature_names)
+                scored = booster.predict(data, pred_contribs=True, approx_contribs=approximate)
+            contributions[missing] = scored
+            self.contributions.put_many([keys[position] for position in missing], list(scored))
+        return contributions
+
+    def interval(self, preprocessed_data):
+        from utils.tree_evaluator import load_quantile_ensemble
+
+        ensemble, quantiles, margin = load_quantile_ensemble(self.model_name)
+        with self._lock:
+            if ensemble.source_checksum != self.interval_version:
+                self.intervals.clear()
+                self.interval_version = ensemble.source_checksum
+
+        matrix = feature_matrix(preprocessed_data)
+        keys = row_keys(matrix, ensemble.source_checksum, 'quantiles')
+        cached = self.intervals.get_many(keys)
+
+        raw = np.empty((len(keys), ensemble.n_members), dtype=np.float32)
+        missing = [position for position, value in enumerate(cached) if value is None]
+        for position, value in enumerate(cached):
+            if value is not None:
+                raw[position] = value
+        if missing:
+            with span('model.predict_interval'):
+                scored = ensemble.predict(matrix[missing])
+            raw[missing] = scored
+            self.intervals.put_many([keys[position] for position in missing], list(scored))
+
+        # Separately trained quantiles can cross; the outer ones are widened by the conformal
+        # margin, and no bound goes below zero since both models predict counts
+        intervals = np.sort(raw, axis=1)
+        intervals[:, 0] -= margin
+        intervals[:, -1] += margin
+        return quantiles, np.maximum(intervals, 0)
+
+
+# Model key -> its caches, least recently used first. Other regions' caches
+# are dropped beyond MAX_CACHED_MODELS, like the models in the pool.
+MAX_CACHED_MODELS = 8
+prediction_caches = OrderedDict((name, _CachedModel(name)) for name in MODEL_PATHS)
+_caches_lock = threading.Lock()
+
+
+def _cached_model(model_name):
+    with _caches_lock:
+        cached_model = prediction_caches.get(model_name)
+        if cached_model is None:
+            cached_model = prediction_caches[model_name] = _CachedModel(model_name)
+        prediction_caches.move_to_end(model_name)
+        while len(prediction_caches) > MAX_CACHED_MODELS:
+            prediction_caches.popitem(last=False)
+    return cached_model
+
+
+def _cached_models():
+    with _caches_lock:
+        return list(prediction_caches.items())
+
+
+def predict_cached(model_name, preprocessed_data, backend=DEFAULT_BACKEND):
+    """
+    Predict with a model, scoring only the rows that are not cached yet.
+
+    Rows are cached by a hash of their preprocessed feature vector and the
+    model file checksum, so entries are never reused across model versions.
+    Every row, cached or not, is added to the model's drift monitor (see utils.drift).
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    preprocessed_data (pd.DataFrame or np.ndarray): Preprocessed features in model order.
+    backend (str): 'xgboost' or 'numpy' (see utils.tree_evaluator).
+
+    Returns:
+    np.ndarray: One float32 prediction per row.
+    """
+    return _cached_model(model_name).predict(preprocessed_data, backend)
+
+
+def explain_cached(model_name, preprocessed_data, approximate=False):
+    """
+    Compute per-feature contributions with XGBoost's `pred_contribs`, scoring
+    only the rows that are not cached yet.
+
+    Contributions are cached next to the model's predictions, keyed the same
+    way, and cleared with them when the model file changes.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    preprocessed_data (pd.DataFrame or np.ndarray): Preprocessed features in model order.
+    approximate (bool): Use the per-path approximation (`approx_contribs`),
+                        much faster than exact TreeSHAP on large batches.
+
+    Returns:
+    np.ndarray: Shape (rows, features + 1). The last column is the bias; each
+                row sums to the model's prediction.
+    """
+    return _cached_model(model_name).explain(preprocessed_data, approximate)
+
+
+def predict_interval_cached(model_name, preprocessed_data):
+    """
+    Predict the P10/P50/P90 interval of every row with the model's quantile boosters.
+
+    All boosters are stacked into one NumPy tree walk (see
+    utils.tree_evaluator.stack_arrays), so an interval costs little more than
+    a point prediction. Rows are cached like predictions.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    preprocessed_data (pd.DataFrame or np.ndarray): Preprocessed features in model order.
+
+    Returns:
+    tuple: (quantiles, intervals) where intervals has one column per quantile,
+           in increasing order, with the calibration margin applied to the outer ones.
+
+    Raises:
+    FileNotFoundError: If the quantile boosters have not been trained.
+    """
+    return _cached_model(model_name).interval(preprocessed_data)
+
+
+def cache_stats():
+    """
+    Return the cache counters of every model.
+
+    Returns:
+    dict: Model name -> stats.
+    """
+    return {name: cached_model.cache.stats() for name, cached_model in _cached_models()}
+
+
+def contribution_cache_stats():
+    """
+    Return the contribution cache counters of every model.
+
+    Returns:
+    dict: Model name -> stats.
+    """
+    return {name: cached_model.contributions.stats() for name, cached_model in _cached_models()}
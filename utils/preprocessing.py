@@ -8,7 +8,7 @@ def preprocess_differencing(main_dataframe, dataframe_with_last_known_value):
 
     Parameters:
     main_dataframe (pd.DataFrame): The main dataframe containing 14 features. 
-                                   This dataframe is expected to have one row of user input.
+                                   Each row is one set of user input; a single row is the common case.
     dataframe_with_last_known_value (pd.DataFrame): The dataframe containing 6 features and their known values.
                                                     This dataframe is expected to have one row with known values.
 
@@ -16,15 +16,15 @@ def preprocess_differencing(main_dataframe, dataframe_with_last_known_value):
     pd.DataFrame: A new dataframe with the same structure as the main_dataframe, 
                   where the values of the 6 matching features have been subtracted 
                   by their corresponding values in the dataframe_with_last_known_value.
+                  Negative differences are clipped to 0 row by row.
     """
     # Identify the common columns
     common_columns = main_dataframe.columns.intersection(dataframe_with_last_known_value.columns)
 
     # Subtract the values of the known features
     for column in common_columns:
-        main_dataframe[column] = main_dataframe[column] - dataframe_with_last_known_value[column]
-        if main_dataframe[column].iloc[0] < 0:
-            main_dataframe[column] = 0
+        known_value = dataframe_with_last_known_value[column].iloc[0]
+        main_dataframe[column] = (main_dataframe[column] - known_value).clip(lower=0)
         
     return main_dataframe
 
@@ -34,13 +34,11 @@ def preprocess_log(user_input, last_value):
     the last known value from the user's input.
 
     Parameters:
-    user_input (pd.Series): The series containing one value which is user's input.
-                            The series expects to have only one value.
-    last_value (pd.Series): The series containing one value which is the last known value.
-                            The series expects to have only one value.
+    user_input (pd.Series): The series containing the user's input, one value per row.
+    last_value (pd.Series or float): The last known value.
 
     Returns:
-    pd.Series: A new series with one preprocessed value.
+    pd.Series: A new series with one preprocessed value per row. Negative values are clipped to 0.
     '''
 
     # Use np.log1p for safer logarithm calculation
@@ -48,8 +46,6 @@ def preprocess_log(user_input, last_value):
     log_last_value = np.log1p(last_value)
 
     # Apply differencing
-    transformed_value = log_user_input - log_last_value
-    if transformed_value.iloc[0] < 0:
-        transformed_value = 0
+    transformed_value = (log_user_input - log_last_value).clip(lower=0)
 
-    return transformed_value
\ No newline at end of file
+    return transformed_value
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+class RangeQueryIndex:
+    """
+    Constant-time max/min/sum over date ranges of a date-sorted frame.
+
+    The row range of a date range is found by binary search. Sums come from
+    prefix sums; max and min come from sparse tables, except for columns that
+    never decrease (cumulative totals), where the max is the last row and the
+    min the first row of the range, so no table is needed.
+    NaN values are ignored, as in pandas.
+    """
+
+    def __init__(self, dates, frame, columns):
+        """
+        Parameters:
+        dates (array-like): Sorted datetime values, one per row of `frame`.
+        frame (pd.DataFrame): The data.
+        columns (list): Columns to index.
+        """
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.columns = list(columns)
+        self._values = {}
+        self._prefix_sums = {}
+        self._monotonic = set()
+        self._max_tables = {}
+        self._min_tables = {}
+
+        for column in self.columns:
+            values = frame[column].to_numpy()
+            self._values[column] = values
+            self._prefix_sums[column] = np.concatenate(([0.0], np.cumsum(np.nan_to_num(values, nan=0.0), dtype=np.float64)))
+            if not np.isnan(values).any() and np.all(np.diff(values) >= 0):
+                self._monotonic.add(column)
+            else:
+                self._max_tables[column] = self._sparse_table(values, np.fmax)
+                self._min_tables[column] = self._sparse_table(values, np.fmin)
+
+    @staticmethod
+    def _sparse_table(values, combine):
+        # Level k holds combine() over the window [i, i + 2**k)
+        table = [values]
+        width = 1
+        while 2 * width <= len(values):
+            previous = table[-1]
+            table.append(combine(previous[:-width], previous[width:]))
+            width *= 2
+        return table
+
+    def locate(self, start_date, end_date):
+        """
+        Return the row range [lo, hi) covering two dates (inclusive).
+
+        Parameters:
+        start_date (datetime-like): First date of the range.
+        end_date (datetime-like): Last date of the range.
+
+        Returns:
+        tuple: (lo, hi) row positions.
+        """
+        lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+        return int(lo), int(hi)
+
+    def _table_query(self, table, combine, lo, hi):
+        level = (hi - lo).bit_length() - 1
+        return combine(table[level][lo], table[level][hi - (1 << level)])
+
+    def _max(self, column, lo, hi):
+        if hi <= lo:
+            return np.nan
+        if column in self._monotonic:
+            return self._values[column][hi - 1]
+        return self._table_query(self._max_tables[column], np.fmax, lo, hi)
+
+    def _min(self, column, lo, hi):
+        if hi <= lo:
+            return np.nan
+        if column in self._monotonic:
+            return self._values[column][lo]
+        return self._table_query(self._min_tables[column], np.fmin, lo, hi)
+
+    def _sum(self, column, lo, hi):
+        prefix_sums = self._prefix_sums[column]
+        return prefix_sums[max(hi, lo)] - prefix_sums[lo]
+
+    def max(self, column, start_date, end_date):
+        return self._max(column, *self.locate(start_date, end_date))
+
+    def min(self, column, start_date, end_date):
+        return self._min(column, *self.locate(start_date, end_date))
+
+    def sum(self, column, start_date, end_date):
+        return self._sum(column, *self.locate(start_date, end_date))
+
+    def query(self, start_date, end_date, statistic='max'):
+        """
+        Compute one statistic for every indexed column over a date range.
+
+        Parameters:
+        start_date (datetime-like): First date of the range.
+        end_date (datetime-like): Last date of the range.
+        statistic (str): 'max', 'min' or 'sum'.
+
+        Returns:
+        dict: Column -> value.
+        """
+        method = getattr(self, f'_{statistic}')
+        lo, hi = self.locate(start_date, end_date)
+        return {column: method(column, lo, hi) for column in self.columns}
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import re
+
+# Each region other than the default one lives in its own folder:
+#   data/regions/<region>/preprocessed_data_updated.csv   its data (plus .parts from utils.ingestion)
+#   data/regions/<region>/model/                          its models and pipeline specs, where trained
+# The default region is the original layout (data/ and model/).
+# This module is imported by utils.model_loader, so the utils modules that
+# depend on it are imported inside the functions that need them.
+REGIONS_DIR = './data/regions'
+REGION_MODEL_DIR = 'model'
+DEFAULT_REGION = 'kitwe'
+
+
+def region_slug(name):
+    """
+    Turn a region name into its folder name, e.g. 'Kapiri Mposhi' -> 'kapiri_mposhi'.
+    """
+    slug = re.sub(r'[^a-z0-9]+', '_', str(name).strip().lower()).strip('_')
+    if not slug:
+        raise ValueError(f"Region name {name!r} has no letters or digits")
+    return slug
+
+
+def region_label(region):
+    """
+    Return the display name of a region folder, e.g. 'kapiri_mposhi' -> 'Kapiri Mposhi'.
+    """
+    return region.replace('_', ' ').title()
+
+
+def region_data_path(region=DEFAULT_REGION):
+    """
+    Return the source CSV of a region.
+
+    Parameters:
+    region (str): Region folder name.
+
+    Returns:
+    str: The CSV path. Only the region's own files are read from it.
+    """
+    from utils.data_loader import DATA_PATH
+
+    if region == DEFAULT_REGION:
+        return DATA_PATH
+    return os.path.join(REGIONS_DIR, region, os.path.basename(DATA_PATH))
+
+
+def region_model_dir(region=DEFAULT_REGION):
+    """
+    Return the folder holding a region's own models and pipeline specs.
+    """
+    if region == DEFAULT_REGION:
+        return 'model'
+    return os.path.join(REGIONS_DIR, region, REGION_MODEL_DIR)
+
+
+def list_regions():
+    """
+    List the regions with data, default region first.
+
+    Returns:
+    list: Region folder names.
+    """
+    try:
+        names = sorted(os.listdir(REGIONS_DIR))
+    except FileNotFoundError:
+        names = []
+    regions = [name for name in names if name != DEFAULT_REGION and os.path.exists(region_data_path(name))]
+    return [DEFAULT_REGION] + regions
+
+
+def region_baselines(region):
+    """
+    Build the differencing baselines of a region's models from the last row of its data.
+
+    Parameters:
+    region (str): Region folder name.
+
+    Returns:
+    dict: Model name -> pipeline spec with the region's last known values as
+          baselines. Features missing from the region's data keep the default baselines.
+    """
+    from utils.dataset import get_dataset
+    from utils.feature_pipeline import build_pipeline_spec
+    from utils.model_loader import MODEL_PATHS
+
+    frame = get_dataset(region_data_path(region)).frame
+    specs = {}
+    for model_name in MODEL_PATHS:
+        spec = build_pipeline_spec(model_name)
+        for step in spec['steps']:
+            for feature in step['baselines']:
+                values = frame[feature].dropna() if feature in frame else []
+                if len(values):
+                    step['baselines'][feature] = float(values.iloc[-1])
+        specs[model_name] = spec
+    return specs
+
+
+def write_region_specs(region):
+    """
+    Write a region's pipeline specs (see region_baselines) into its model folder.
+
+    Returns:
+    list: The paths that were written.
+    """
+    from utils.feature_pipeline import pipeline_spec_path
+    from utils.model_loader import MODEL_PATHS
+
+    directory = region_model_dir(region)
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for model_name, spec in region_baselines(region).items():
+        path = os.path.join(directory, os.path.basename(pipeline_spec_path(MODEL_PATHS[model_name])))
+        with open(path, 'w') as file:
+            json.dump(spec, file, indent=2)
+            file.write('\n')
+        written.append(path)
+    return written
+
+
+def partition_csv(input_path, region_column):
+    """
+    Split a CSV holding several regions into one CSV per region, so each
+    region's data can be read without scanning the others, and write each
+    region's pipeline specs from its last known values and the reference
+    histograms of its drift monitors.
+
+    Parameters:
+    input_path (str): CSV in the layout of the default dataset plus a region column.
+    region_column (str): Column naming the region of each row.
+
+    Returns:
+    dict: Region folder name -> number of rows written.
+    """
+    import pandas as pd
+    from utils.drift import write_reference
+    from utils.model_loader import MODEL_PATHS, model_key
+
+    df = pd.read_csv(input_path)
+    counts = {}
+    for name, rows in df.groupby(region_column, sort=True):
+        region = region_slug(name)
+        if region == DEFAULT_REGION:
+            raise ValueError(f"'{name}' is the default region; its data lives in {region_data_path()}")
+        path = region_data_path(region)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        rows.drop(columns=region_column).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        write_region_specs(region)
+        for model_name in MODEL_PATHS:
+            write_reference(model_key(model_name, region))
+        counts[region] = len(rows)
+    return counts
+
+
+def region_selector(regions=None):
+    """
+    Show the region selector in the sidebar and return the chosen region.
+
+    The choice is kept in the session, so every page opens on the region
+    chosen last.
+
+    Parameters:
+    regions (list): Regions offered. Defaults to list_regions().
+
+    Returns:
+    str: The chosen region folder name.
+    """
+    import streamlit as st
+
+    def remember_region():
+        st.session_state['region'] = st.session_state['_region']
+
+    regions = regions or list_regions()
+    if st.session_state.get('region') not in regions:
+        st.session_state['region'] = regions[0]
+    # Widget state is dropped when a page does not draw the widget, so it is re-seeded from 'region' on every page
+    st.session_state['_region'] = st.session_state['region']
+    return st.sidebar.selectbox("Region", regions, key='_region', format_func=region_label, on_change=remember_region)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the region-partitioned datasets.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List the regions with data")
+    partition = commands.add_parser('partition', help="Split a multi-region CSV into one CSV per region")
+    partition.add_argument('input_path', help="CSV with a region column")
+    partition.add_argument('--column', default='region', help="Column naming the region of each row")
+    specs = commands.add_parser('specs', help="Rewrite a region's pipeline specs from its last known values")
+    specs.add_argument('region', help="Region folder name")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for region in list_regions():
+            print(f"{region:<24} {region_data_path(region)}")
+    elif args.command == 'partition':
+        for region, n_rows in partition_csv(args.input_path, args.column).items():
+            print(f"{region}: {n_rows} rows -> {region_data_path(region)}")
+    else:
+        for written_path in write_region_specs(args.region):
+            print(f"Saved {written_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from utils.data_loader import CACHE_DIR, DATA_PATH, DATE_COLUMN, cache_prefix, store_version
+from utils.tracing import span
+
+# Column -> aggregation plotted by default: cumulative totals show the period's
+# last value, daily counts its sum and rainfall its mean
+ROLLUP_COLUMNS = {
+    # Cases
+    'newCases': 'sum',
+    'imputed_total_cases': 'last',
+    'imputed_total_recoveries': 'last',
+    # Deaths
+    'deathDay': 'sum',
+    'imputed_total_deaths': 'last',
+    # Vaccinations
+    'vaccinated24hours': 'sum',
+    'totalVaccinations': 'last',
+    # Tests
+    'test24hours': 'sum',
+    'totalTests': 'last',
+    # Rainfall
+    'rfh': 'mean',
+    'r3h': 'mean',
+    'rfq': 'mean',
+}
+
+AGGREGATIONS = ('sum', 'mean', 'max', 'last')
+
+# Rolled-up granularities: ISO weeks (Monday to Sunday), calendar months and
+# epidemiological (MMWR) weeks (Sunday to Saturday). 'day' is the base data.
+GRANULARITIES = ('day', 'week', 'month', 'epiweek')
+
+# Choices offered by the pages' granularity selectors
+GRANULARITY_LABELS = {'auto': 'Auto', 'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly', 'epiweek': 'Epi week'}
+
+# Longest date span (in days) drawn at each granularity when it is chosen automatically
+DAILY_MAX_DAYS = 180
+WEEKLY_MAX_DAYS = 3 * 365
+
+
+def period_starts(dates, granularity):
+    """
+    Return the first day of the period each date falls in.
+
+    Parameters:
+    dates (array-like): Datetime values.
+    granularity (str): 'week', 'month' or 'epiweek'.
+
+    Returns:
+    np.ndarray: datetime64[ns] period starts, one per date.
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if granularity == 'month':
+        starts = days.astype('datetime64[M]').astype('datetime64[D]')
+    elif granularity in ('week', 'epiweek'):
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 is 0 on Mondays
+        weekday = (days.astype(np.int64) + 3) % 7
+        if granularity == 'epiweek':
+            weekday = (weekday + 1) % 7
+        starts = days - weekday.astype('timedelta64[D]')
+    else:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {GRANULARITIES[1:]}")
+    return starts.astype('datetime64[ns]')
+
+
+def epi_weeks(starts):
+    """
+    Number MMWR weeks: week 1 is the first Sunday-to-Saturday week with at least
+    four days in the new year, i.e. the week of the year's first Wednesday.
+
+    Parameters:
+    starts (array-like): Sunday starts of epidemiological weeks.
+
+    Returns:
+    tuple: (epi_year, epi_week) as int arrays.
+    """
+    wednesdays = pd.DatetimeIndex(starts) + pd.Timedelta(days=3)
+    return wednesdays.year.to_numpy(), ((wednesdays.dayofyear.to_numpy() - 1) // 7 + 1)
+
+
+def build_rollup(frame, granularity, columns=None):
+    """
+    Aggregate daily rows into one row per period.
+
+    Every column gets its sum, mean, max and last non-missing value, named
+    '<column>_<aggregation>'. Periods are labelled by their first day and
+    'days' counts the daily rows in each, so partial periods at either end of
+    the data can be told apart.
+
+    Parameters:
+    frame (pd.DataFrame): Date-sorted daily rows.
+    granularity (str): 'week', 'month' or 'epiweek'.
+    columns (list): Columns to aggregate. Defaults to the ROLLUP_COLUMNS present in `frame`.
+
+    Returns:
+    pd.DataFrame: One row per period, sorted by date.
+    """
+    if columns is None:
+        columns = [column for column in ROLLUP_COLUMNS if column in frame.columns]
+    starts = period_starts(frame[DATE_COLUMN], granularity)
+    grouped = frame[columns].astype(np.float64).groupby(starts, sort=True)
+
+    aggregated = {
+        'sum': grouped.sum(min_count=1),
+        'mean': grouped.mean(),
+        'max': grouped.max(),
+        'last': grouped.last(),
+    }
+    rollup = pd.DataFrame({DATE_COLUMN: aggregated['sum'].index.to_numpy(), 'days': grouped.size().to_numpy()})
+    if granularity == 'epiweek':
+        rollup['epi_year'], rollup['epi_week'] = epi_weeks(rollup[DATE_COLUMN])
+    for column in columns:
+        for aggregation in AGGREGATIONS:
+            rollup[f"{column}_{aggregation}"] = aggregated[aggregation][column].to_numpy()
+    return rollup
+
+
+def rollup_path(granularity, path=DATA_PATH):
+    """
+    Return the path of a stored rollup, keyed by the source CSV and its store version.
+
+    Parameters:
+    granularity (str): 'week', 'month' or 'epiweek'.
+    path (str): The source CSV.
+
+    Returns:
+    str: Path of the Feather file, next to the columnar copy of the CSV.
+    """
+    version = hashlib.sha256(store_version(path).encode()).hexdigest()[:16]
+    return f"{cache_prefix(path)}-{version}.{granularity}.feather"
+
+
+def remove_stale_rollups(granularity, path=DATA_PATH):
+    """
+    Delete the stored rollups of earlier store versions of a source CSV.
+
+    Returns:
+    list: The paths that were removed.
+    """
+    current = rollup_path(granularity, path)
+    removed = []
+    for stale in glob.glob(f"{glob.escape(cache_prefix(path))}-*.{granularity}.feather"):
+        if stale != current:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                continue
+            removed.append(stale)
+    return removed
+
+
+def load_rollups(frame, path=DATA_PATH):
+    """
+    Load the weekly, monthly and epi-week rollups of the current data, building
+    and storing any that do not exist yet for this store version. The rollups
+    of earlier versions are deleted once the new ones are stored.
+
+    Parameters:
+    frame (pd.DataFrame): Date-sorted daily rows of the current data.
+    path (str): The source CSV.
+
+    Returns:
+    dict: Granularity -> rollup dataframe.
+    """
+    import pyarrow.feather as feather
+
+    rollups = {}
+    with span('data.build_rollups'):
+        for granularity in GRANULARITIES[1:]:
+            target = rollup_path(granularity, path)
+            try:
+                rollups[granularity] = feather.read_feather(target)
+                continue
+            except FileNotFoundError:
+                pass
+            rollup = build_rollup(frame, granularity)
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            feather.write_feather(rollup, tmp_path)
+            os.replace(tmp_path, target)
+            remove_stale_rollups(granularity, path)
+            rollups[granularity] = rollup
+    return rollups
+
+
+def granularity_for_span(start_date, end_date):
+    """
+    Pick the granularity of a chart from the length of its date span.
+
+    Parameters:
+    start_date (datetime-like): First date shown.
+    end_date (datetime-like): Last date shown.
+
+    Returns:
+    str: 'day' up to DAILY_MAX_DAYS, 'week' up to WEEKLY_MAX_DAYS, 'month' beyond.
+    """
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    if days <= DAILY_MAX_DAYS:
+        return 'day'
+    if days <= WEEKLY_MAX_DAYS:
+        return 'week'
+    return 'month'
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+import pandas as pd
+from utils.batch_prediction import BATCH_MODELS
+from utils.feature_pipeline import load_pipeline
+from utils.model_loader import model_registry, split_model_key
+from utils.prediction_cache import explain_cached
+
+MAX_SWEEP_FEATURES = 3
+
+# Largest grid a sweep may build; a million points is about 8 MB per input column
+MAX_SWEEP_POINTS = 1_000_000
+
+
+def build_grid(model_name, base_inputs, ranges):
+    """
+    Build the Cartesian grid of a sweep as one raw input matrix.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    base_inputs (dict): Raw value of every model input; swept features are overwritten.
+    ranges (dict): Feature -> (start, stop, num) for one to three features.
+
+    Returns:
+    tuple: (axes, grid) where axes maps each swept feature to its values and
+           grid is a pd.DataFrame with one row per grid point in model order.
+
+    Raises:
+    ValueError: If the features are not the model's, or the grid has more than MAX_SWEEP_POINTS points.
+    """
+    features, _, _ = BATCH_MODELS[split_model_key(model_name)[1]]
+    if not 1 <= len(ranges) <= MAX_SWEEP_FEATURES:
+        raise ValueError(f"A sweep takes 1 to {MAX_SWEEP_FEATURES} features, got {len(ranges)}")
+    unknown = [feature for feature in ranges if feature not in features]
+    if unknown:
+        raise ValueError(f"Features not used by the {model_name} model: {unknown}")
+    n_points = math.prod(int(num) for _, _, num in ranges.values())
+    if n_points > MAX_SWEEP_POINTS:
+        raise ValueError(f"A sweep of {n_points:,} grid points exceeds the limit of {MAX_SWEEP_POINTS:,}")
+
+    axes = {feature: np.linspace(start, stop, int(num)) for feature, (start, stop, num) in ranges.items()}
+    mesh = np.meshgrid(*axes.values(), indexing='ij')
+
+    matrix = np.tile(np.array([base_inputs[feature] for feature in features], dtype=np.float64), (n_points, 1))
+    for feature, values in zip(axes, mesh):
+        matrix[:, features.index(feature)] = values.ravel()
+
+    return axes, pd.DataFrame(matrix, columns=features)
+
+
+def sweep(model_name, base_inputs, ranges):
+    """
+    Predict over the Cartesian grid of one to three swept features.
+
+    The whole grid goes through the prediction pages' preprocessing at once and
+    is scored with a single in-place predict call.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    base_inputs (dict): Raw value of every model input; swept features are overwritten.
+    ranges (dict): Feature -> (start, stop, num) for one to three features.
+
+    Returns:
+    tuple: (axes, predictions) where axes maps each swept feature to its values
+           and predictions has shape (len(axis_1), ..., len(axis_k)).
+    """
+    axes, grid = build_grid(model_name, base_inputs, ranges)
+    preprocessed_data = load_pipeline(model_name).transform(grid.to_numpy()).astype(np.float32)
+    booster = model_registry.get(model_name).get_booster()
+    predictions = booster.inplace_predict(preprocessed_data)
+    return axes, predictions.reshape([len(values) for values in axes.values()])
+
+
+def sweep_contributions(model_name, base_inputs, ranges, approximate=False):
+    """
+    Compute per-feature contributions over the grid of a sweep.
+
+    Contributions are cached per preprocessed row, so re-running a sweep (or
+    one that overlaps it) only explains the new grid points.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+    base_inputs (dict): Raw value of every model input; swept features are overwritten.
+    ranges (dict): Feature -> (start, stop, num) for one to three features.
+    approximate (bool): Use the per-path approximation instead of exact TreeSHAP.
+
+    Returns:
+    tuple: (axes, contributions) where contributions has shape
+           (len(axis_1), ..., len(axis_k), features + 1), bias last.
+    """
+    axes, grid = build_grid(model_name, base_inputs, ranges)
+    preprocessed_data = load_pipeline(model_name).transform(grid.to_numpy())
+    contributions = explain_cached(model_name, preprocessed_data, approximate)
+    return axes, contributions.reshape([len(values) for values in axes.values()] + [contributions.shape[1]])
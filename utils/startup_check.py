@@ -0,0 +1,137 @@
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+# Most seconds a page may spend importing its modules in a fresh interpreter
+DEFAULT_BUDGET_SECONDS = 2.0
+
+# Entry page followed by the multipage app's pages
+PAGE_PATTERNS = ['1_*.py', 'pages/*.py']
+
+
+def app_pages(root='.'):
+    """
+    List the Streamlit pages of the app.
+
+    Parameters:
+    root (str): Repository root.
+
+    Returns:
+    list: Page paths relative to `root`, entry page first.
+    """
+    pages = []
+    for pattern in PAGE_PATTERNS:
+        pages.extend(sorted(os.path.relpath(path, root) for path in glob.glob(os.path.join(root, pattern))))
+    return pages
+
+
+def page_imports(path):
+    """
+    Collect the import statements a page runs at module level.
+
+    Parameters:
+    path (str): The page file.
+
+    Returns:
+    list: Source of each top-level import statement, in file order.
+    """
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def parse_importtime(stderr):
+    """
+    Parse the output of `python -X importtime`.
+
+    Parameters:
+    stderr (str): The interpreter's standard error.
+
+    Returns:
+    list: (module, self seconds, cumulative seconds, nesting level) per imported module, in output order.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_part, cumulative_part, name = line[len('import time:'):].split('|')
+        # Names are indented by two spaces per nesting level after one separating space
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_part) / 1e6, int(cumulative_part) / 1e6, level))
+    return modules
+
+
+def profile_page(path, root='.'):
+    """
+    Import a page's top-level modules in a fresh interpreter under `-X importtime`.
+
+    Parameters:
+    path (str): The page file, relative to `root`.
+    root (str): Repository root, used as working directory and import path.
+
+    Returns:
+    dict: Total import seconds, the heaviest top-level imports and the raw timings.
+    """
+    statements = page_imports(os.path.join(root, path))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [os.path.abspath(root), os.environ.get('PYTHONPATH')]))}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '\n'.join(statements)],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the modules of {path} failed:\n{result.stderr[-2000:]}")
+
+    modules = parse_importtime(result.stderr)
+    # Unnested modules were imported by the page itself (or by the interpreter start-up)
+    top_level = [(name, cumulative) for name, _, cumulative, level in modules if level == 0]
+    return {
+        'page': path,
+        'seconds': round(sum(cumulative for _, cumulative in top_level), 4),
+        'heaviest': [
+            {'module': name, 'seconds': round(cumulative, 4)}
+            for name, cumulative in sorted(top_level, key=lambda item: -item[1])[:5]
+        ],
+        'modules': [
+            {'module': name, 'self_seconds': self_seconds, 'cumulative_seconds': cumulative, 'level': level}
+            for name, self_seconds, cumulative, level in modules
+        ],
+    }
+
+
+def check_startup(budget=DEFAULT_BUDGET_SECONDS, root='.'):
+    """
+    Profile every page and compare its import time with the budget.
+
+    Returns:
+    tuple: (ok, reports) where ok is False if any page is over budget.
+    """
+    reports = [profile_page(path, root) for path in app_pages(root)]
+    for report in reports:
+        report['budget_seconds'] = budget
+        report['over_budget'] = report['seconds'] > budget
+    return not any(report['over_budget'] for report in reports), reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the cold-start import time of every page against a budget.")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS, help="Seconds allowed per page")
+    parser.add_argument('--output', help="Write the full timings to this JSON file")
+    args = parser.parse_args(argv)
+
+    ok, reports = check_startup(args.budget)
+    for report in reports:
+        status = 'OVER BUDGET' if report['over_budget'] else 'ok'
+        heaviest = ', '.join(f"{item['module']} {item['seconds']:.2f}s" for item in report['heaviest'][:3])
+        print(f"{report['page']:<28} {report['seconds']:6.2f}s / {args.budget:.2f}s  {status:<11}  {heaviest}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(reports, file, indent=2)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
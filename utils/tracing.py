@@ -0,0 +1,304 @@
+import argparse
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import LatencyHistogram
+
+# Tracing is off unless APP_TRACING=1. When on, spans can also be appended to a
+# JSON-lines file (APP_TRACE_FILE) and served in the Prometheus text format (APP_TRACE_PORT),
+# on the loopback interface unless APP_TRACE_HOST says otherwise.
+TRACING_ENV = 'APP_TRACING'
+TRACE_FILE_ENV = 'APP_TRACE_FILE'
+TRACE_PORT_ENV = 'APP_TRACE_PORT'
+TRACE_HOST_ENV = 'APP_TRACE_HOST'
+DEFAULT_TRACE_HOST = '127.0.0.1'
+
+# Sessions whose histograms are kept, least recently active dropped first
+MAX_SESSIONS = 256
+
+PROMETHEUS_METRIC = 'app_span_seconds'
+
+# (session id, page) of the rerun running in the current thread
+_rerun = contextvars.ContextVar('rerun', default=(None, None))
+
+
+class _NoopSpan:
+    # Shared by every span while tracing is off, so a disabled span allocates nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Tracer:
+    """
+    Collects the duration of named spans into latency histograms, one set for
+    the whole process and one per Streamlit session.
+
+    Spans recorded outside a rerun (e.g. the background model warm-up) only
+    count towards the process histograms.
+    """
+
+    def __init__(self, enabled=False, path=None):
+        self.enabled = enabled
+        self.path = path
+        self.aggregate = {}
+        self.sessions = OrderedDict()
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(TRACING_ENV, '') == '1', os.environ.get(TRACE_FILE_ENV) or None)
+
+    def span(self, name):
+        """
+        Time a block: `with tracer.span('model.predict'): ...`.
+
+        Returns a shared no-op context manager while tracing is off.
+        """
+        return _Span(self, name) if self.enabled else _NOOP_SPAN
+
+    def record(self, name, seconds):
+        session, page = _rerun.get()
+        with self._lock:
+            histograms = [self.aggregate.setdefault(name, LatencyHistogram())]
+            if session is not None:
+                spans = self.sessions.pop(session, None) or {}
+                self.sessions[session] = spans
+                if len(self.sessions) > MAX_SESSIONS:
+                    self.sessions.popitem(last=False)
+                histograms.append(spans.setdefault(name, LatencyHistogram()))
+            if self.path is not None:
+                if self._file is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._file = open(self.path, 'a', buffering=1)
+                self._file.write(json.dumps({
+                    'time': round(time.time(), 6), 'session': session, 'page': page,
+                    'span': name, 'seconds': round(seconds, 9),
+                }) + '\n')
+        for histogram in histograms:
+            histogram.observe(seconds)
+
+    def session_histograms(self, session):
+        with self._lock:
+            return dict(self.sessions.get(session, {}))
+
+    def aggregate_histograms(self):
+        with self._lock:
+            return dict(self.aggregate)
+
+    def to_prometheus(self):
+        """
+        Render the process histograms in the Prometheus text exposition format.
+
+        Returns:
+        str: One histogram per span name, labelled `span`.
+        """
+        lines = [f"# HELP {PROMETHEUS_METRIC} Duration of traced app stages.", f"# TYPE {PROMETHEUS_METRIC} histogram"]
+        for name, histogram in sorted(self.aggregate_histograms().items()):
+            lines.append(histogram.to_prometheus(PROMETHEUS_METRIC, {'span': name}))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.aggregate.clear()
+            self.sessions.clear()
+
+
+tracer = Tracer.from_env()
+
+
+def span(name):
+    """
+    Time a block with the process tracer.
+
+    Parameters:
+    name (str): Stage name, e.g. 'data.parse_csv' or 'model.predict'.
+
+    Returns:
+    context manager: Records the block's duration when tracing is on.
+    """
+    return tracer.span(name)
+
+
+def traced(name):
+    """
+    Decorate a function so every call is recorded as a span.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_server_lock = threading.Lock()
+_server = None
+
+
+def start_metrics_server(port, host=DEFAULT_TRACE_HOST):
+    """
+    Serve the process histograms at http://<host>:<port>/metrics from a daemon thread.
+    Only the first call starts a server.
+
+    Parameters:
+    port (int): Port to listen on.
+    host (str): Interface to bind. Defaults to the loopback interface, so the
+                endpoint is only reachable from this machine.
+
+    Returns:
+    http.server.ThreadingHTTPServer: The running server.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = tracer.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def start_page(page):
+    """
+    Mark the start of a page rerun: later spans in this thread are attributed
+    to the current Streamlit session and `page`.
+
+    Parameters:
+    page (str): Page name used in the exported spans.
+    """
+    if not tracer.enabled:
+        return
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    _rerun.set((ctx.session_id if ctx is not None else None, page))
+    port = os.environ.get(TRACE_PORT_ENV)
+    if port and _server is None:
+        start_metrics_server(int(port), os.environ.get(TRACE_HOST_ENV, DEFAULT_TRACE_HOST))
+    import streamlit as st
+
+    st.session_state['_trace_rerun_started'] = time.perf_counter()
+
+
+def _summary_rows(histograms):
+    return [
+        {
+            'span': name,
+            'count': histogram.count,
+            'mean ms': round(histogram.sum / histogram.count * 1e3, 2) if histogram.count else None,
+            'p50 ms ≤': histogram.quantile(0.5) * 1e3,
+            'p95 ms ≤': histogram.quantile(0.95) * 1e3,
+        }
+        for name, histogram in sorted(histograms.items())
+    ]
+
+
+def debug_panel():
+    """
+    Record the rerun's total time and show the timing tables in a sidebar expander.
+    Call it at the end of a page; it does nothing while tracing is off.
+    """
+    if not tracer.enabled:
+        return
+    import streamlit as st
+
+    started = st.session_state.pop('_trace_rerun_started', None)
+    if started is not None:
+        tracer.record('page.rerun', time.perf_counter() - started)
+
+    session, _ = _rerun.get()
+    with st.sidebar.expander("Timings"):
+        st.caption("This session")
+        st.dataframe(_summary_rows(tracer.session_histograms(session)), hide_index=True)
+        st.caption("All sessions")
+        st.dataframe(_summary_rows(tracer.aggregate_histograms()), hide_index=True)
+
+
+def summarize(path):
+    """
+    Rebuild the span histograms from a JSON-lines trace file.
+
+    Parameters:
+    path (str): File written with APP_TRACE_FILE.
+
+    Returns:
+    Tracer: A disabled tracer holding the histograms of every span in the file.
+    """
+    summary = Tracer()
+    with open(path) as file:
+        for line in file:
+            record = json.loads(line)
+            token = _rerun.set((record['session'], record['page']))
+            try:
+                summary.record(record['span'], record['seconds'])
+            finally:
+                _rerun.reset(token)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a JSON-lines trace file written by the app.")
+    parser.add_argument('path', help="Trace file (APP_TRACE_FILE)")
+    parser.add_argument('--prometheus', action='store_true', help="Print the histograms in the Prometheus text format")
+    args = parser.parse_args(argv)
+
+    summary = summarize(args.path)
+    if args.prometheus:
+        print(summary.to_prometheus(), end='')
+        return
+    print(f"{'span':<20} {'count':>7} {'mean ms':>9} {'p50 ms ≤':>9} {'p95 ms ≤':>9}  sessions")
+    for row in _summary_rows(summary.aggregate_histograms()):
+        sessions = sum(row['span'] in spans for spans in summary.sessions.values())
+        print(f"{row['span']:<20} {row['count']:>7} {row['mean ms']:>9} {row['p50 ms ≤']:>9g} {row['p95 ms ≤']:>9g}  {sessions}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from utils.dataset import get_dataset
+from utils.feature_pipeline import load_pipeline
+from utils.model_loader import model_key
+from utils.regions import DEFAULT_REGION, region_data_path
+
+# Model name -> column it predicts
+TARGETS = {'total_case': 'imputed_total_cases', 'total_death': 'imputed_total_deaths'}
+
+
+def training_data(model_name, dataset=None, region=DEFAULT_REGION):
+    """
+    Build the training matrix of a model from the dataset.
+
+    Inputs go through the model's compiled feature pipeline with every row
+    differenced against the previous day, the same transform the prediction
+    pages apply against the last known values.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death'.
+    dataset (Dataset): Defaults to the shared dataset of the region.
+    region (str): Region whose data and pipeline are used (see utils.regions).
+
+    Returns:
+    tuple: (X, y, features) with one row per day after the first.
+    """
+    frame = (dataset or get_dataset(region_data_path(region))).frame
+    pipeline = load_pipeline(model_key(model_name, region))
+    dates = pd.DatetimeIndex(frame['date'])
+    calendar = {'month': dates.month, 'day_of_week': dates.dayofweek}
+    raw = np.column_stack([
+        calendar[feature] if feature in calendar else frame[feature].to_numpy()
+        for feature in pipeline.features
+    ]).astype(np.float64)
+
+    previous = {feature: raw[:-1, position] for position, feature in enumerate(pipeline.features)}
+    X = pipeline.transform(raw[1:], baselines=previous)
+    y = frame[TARGETS[model_name]].to_numpy(dtype=np.float64)[1:]
+    return X, y, pipeline.features
@@ -0,0 +1,381 @@
+import json
+import os
+
+import numpy as np
+from utils.model_loader import MODEL_PATHS, file_checksum, model_path, read_model_file, resolve_model_path
+
+# Objectives whose prediction is the raw sum of the trees (no link function)
+IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:quantileerror')
+
+# Upper bound on rows x trees evaluated at once, to bound the node-index matrix
+CHUNK_ELEMENTS = 1 << 21
+
+
+def quantile_model_path(pickle_path, quantile):
+    """
+    Return the path of one quantile booster stored next to a pickled model, e.g. <stem>.q10.ubj.
+
+    Parameters:
+    pickle_path (str): Path of the pickled point model.
+    quantile (float): The booster's quantile, between 0 and 1.
+
+    Returns:
+    str: The .ubj path.
+    """
+    return f"{os.path.splitext(pickle_path)[0]}.q{round(quantile * 100):02d}.ubj"
+
+
+def quantile_arrays_path(pickle_path):
+    """
+    Return the path of the stacked array export of a model's quantile boosters.
+    """
+    return os.path.splitext(pickle_path)[0] + '.quantiles.npz'
+
+
+def tree_arrays_path(pickle_path):
+    """
+    Return the path of the array export stored next to a pickled model.
+
+    Parameters:
+    pickle_path (str): Path of the pickled model.
+
+    Returns:
+    str: The .trees.npz path.
+    """
+    return os.path.splitext(pickle_path)[0] + '.trees.npz'
+
+
+def booster_arrays(booster):
+    """
+    Flatten every tree of a booster into shared node arrays.
+
+    Node ids are global across trees. Leaves point to themselves with an
+    infinite threshold, so a row that reaches a leaf stays there and all rows
+    can take the same number of steps.
+
+    Parameters:
+    booster (xgboost.Booster): A trained regression booster with numeric splits.
+
+    Returns:
+    dict: 'feature', 'threshold', 'left', 'right', 'default_left', 'leaf_value'
+          (one entry per node), 'roots' (one per tree), 'base_score' and 'max_depth'.
+    """
+    model = json.loads(booster.save_raw('json'))
+    learner = model['learner']
+    objective = learner['objective']['name']
+    if objective not in IDENTITY_OBJECTIVES:
+        raise ValueError(f"Objective '{objective}' is not supported, expected one of {IDENTITY_OBJECTIVES}")
+    if int(learner['learner_model_param'].get('num_target', '1')) > 1:
+        raise ValueError("Boosters with several targets are not supported")
+
+    trees = learner['gradient_booster']['model']['trees']
+    feature, threshold, left, right, default_left, leaf_value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        if any(tree['split_type']):
+            raise ValueError("Categorical splits are not supported")
+        lefts = np.asarray(tree['left_children'], dtype=np.int64)
+        rights = np.asarray(tree['right_children'], dtype=np.int64)
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        n_nodes = len(lefts)
+        is_leaf = lefts == -1
+        own = np.arange(n_nodes)
+
+        feature.append(np.where(is_leaf, 0, tree['split_indices']))
+        threshold.append(np.where(is_leaf, np.float32(np.inf), conditions))
+        left.append(np.where(is_leaf, own, lefts) + offset)
+        right.append(np.where(is_leaf, own, rights) + offset)
+        default_left.append(np.where(is_leaf, True, np.asarray(tree['default_left'], dtype=bool)))
+        leaf_value.append(np.where(is_leaf, conditions, np.float32(0)))
+        roots.append(offset)
+
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        for node in range(n_nodes):
+            if not is_leaf[node]:
+                depth[lefts[node]] = depth[rights[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+        offset += n_nodes
+
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    return {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float32),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'default_left': np.concatenate(default_left),
+        'leaf_value': np.concatenate(leaf_value).astype(np.float32),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'base_score': np.float32(base_score),
+        'max_depth': np.int32(max_depth),
+    }
+
+
+def stack_arrays(members):
+    """
+    Merge the arrays of several boosters into one ensemble whose trees are all walked together.
+
+    Parameters:
+    members (list): Outputs of booster_arrays, one per member.
+
+    Returns:
+    dict: Like booster_arrays, with node ids shifted past the previous members,
+          'base_score' holding one value per member and 'member_trees' the
+          number of trees of each member.
+    """
+    stacked = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'default_left', 'leaf_value', 'roots')}
+    offset = 0
+    for arrays in members:
+        for name in ('feature', 'threshold', 'default_left', 'leaf_value'):
+            stacked[name].append(arrays[name])
+        for name in ('left', 'right', 'roots'):
+            stacked[name].append(arrays[name] + offset)
+        offset += len(arrays['feature'])
+    stacked = {name: np.concatenate(parts) for name, parts in stacked.items()}
+    stacked['base_score'] = np.array([arrays['base_score'] for arrays in members], dtype=np.float32)
+    stacked['max_depth'] = np.int32(max(int(arrays['max_depth']) for arrays in members))
+    stacked['member_trees'] = np.array([len(arrays['roots']) for arrays in members], dtype=np.int32)
+    return stacked
+
+
+def export_model_arrays(model_name, directory='model'):
+    """
+    Export one model to a .trees.npz file next to its pickle.
+
+    The file records the checksum of the model file it was exported from, so a
+    stale export is detected when it is loaded.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death'.
+    directory (str): Directory holding the model files.
+
+    Returns:
+    str: The path that was written.
+    """
+    pickle_path = os.path.join(directory, os.path.basename(MODEL_PATHS[model_name]))
+    source = resolve_model_path(pickle_path)
+    arrays = booster_arrays(read_model_file(source).get_booster())
+    path = tree_arrays_path(pickle_path)
+    np.savez_compressed(path, source_checksum=np.array(file_checksum(source)), **arrays)
+    return path
+
+
+def export_tree_arrays():
+    """
+    Export every registered model to a .trees.npz file next to its pickle (see export_model_arrays).
+
+    Returns:
+    list: The paths that were written.
+    """
+    return [
+        export_model_arrays(model_name, os.path.dirname(pickle_path))
+        for model_name, pickle_path in MODEL_PATHS.items()
+    ]
+
+
+def quantile_report_path(pickle_path):
+    """
+    Return the path of the training report of a model's quantile boosters.
+    """
+    return os.path.splitext(pickle_path)[0] + '.quantiles.training.json'
+
+
+def _quantile_checksum(paths):
+    return ':'.join(file_checksum(path)[:16] for path in paths)
+
+
+def export_quantile_arrays(model_name, directory='model'):
+    """
+    Stack a model's quantile boosters into one array export.
+
+    The quantiles and the conformal margin are read from the quantile
+    training report written by train_model.py.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death'.
+    directory (str): Directory holding the boosters and the report.
+
+    Returns:
+    str: The path that was written.
+    """
+    import xgboost as xgb
+
+    pickle_path = os.path.join(directory, os.path.basename(MODEL_PATHS[model_name]))
+    with open(quantile_report_path(pickle_path)) as file:
+        report = json.load(file)
+    paths = [quantile_model_path(pickle_path, quantile) for quantile in report['quantiles']]
+    members = []
+    for path in paths:
+        booster = xgb.Booster()
+        booster.load_model(path)
+        members.append(booster_arrays(booster))
+
+    path = quantile_arrays_path(pickle_path)
+    np.savez_compressed(
+        path, source_checksum=np.array(_quantile_checksum(paths)), quantiles=np.array(report['quantiles']),
+        margin=np.float32(report['margin']), **stack_arrays(members),
+    )
+    return path
+
+
+class TreeEnsemble:
+    """
+    A tree ensemble evaluated with NumPy only.
+
+    All trees are walked together for a block of rows: each step gathers the
+    split feature, threshold and children of every (row, tree) node at once.
+    Tree outputs are added in float32 in tree order after the base score, as
+    XGBoost does, so predictions match `model.predict`.
+    """
+
+    def __init__(self, arrays, source_checksum=None):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.default_left = arrays['default_left']
+        self.leaf_value = arrays['leaf_value']
+        self.roots = arrays['roots']
+        self.base_score = np.asarray(arrays['base_score'], dtype=np.float32).reshape(-1)
+        self.max_depth = int(arrays['max_depth'])
+        self.member_trees = np.asarray(arrays.get('member_trees', [len(self.roots)]), dtype=np.int64)
+        self.source_checksum = source_checksum
+
+    @classmethod
+    def from_booster(cls, booster):
+        return cls(booster_arrays(booster))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_members(self):
+        return len(self.member_trees)
+
+    def predict(self, data):
+        """
+        Predict a batch of rows.
+
+        Parameters:
+        data (np.ndarray or pd.DataFrame): Preprocessed features in model order.
+
+        Returns:
+        np.ndarray: One float32 prediction per row, or shape (rows, members)
+                    for a stacked ensemble (see stack_arrays).
+        """
+        X = np.asarray(data, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        predictions = np.empty((len(X), self.n_members), dtype=np.float32)
+        bounds = np.concatenate([[0], np.cumsum(self.member_trees)])
+        block = max(1, CHUNK_ELEMENTS // self.n_trees)
+        for start in range(0, len(X), block):
+            rows = X[start:start + block]
+            row_ids = np.arange(len(rows))[:, None]
+            nodes = np.broadcast_to(self.roots, (len(rows), self.n_trees))
+            for _ in range(self.max_depth):
+                values = rows[row_ids, self.feature[nodes]]
+                go_left = np.where(np.isnan(values), self.default_left[nodes], values < self.threshold[nodes])
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+            leaves = self.leaf_value[nodes]
+            for member in range(self.n_members):
+                first, last = bounds[member], bounds[member + 1]
+                outputs = np.empty((len(rows), last - first + 1), dtype=np.float32)
+                outputs[:, 0] = self.base_score[member]
+                outputs[:, 1:] = leaves[:, first:last]
+                predictions[start:start + block, member] = np.cumsum(outputs, axis=1, dtype=np.float32)[:, -1]
+        return predictions[:, 0] if self.n_members == 1 else predictions
+
+
+# Loaded exports per kind, oldest first, so memory stays bounded however many regions have models
+MAX_CACHED_ENSEMBLES = 8
+
+# Export path -> ((export mtime, source model path, its mtime), ensemble)
+_ensembles = {}
+
+
+def _remember(cache, path, value):
+    cache[path] = value
+    while len(cache) > MAX_CACHED_ENSEMBLES:
+        cache.pop(next(iter(cache)))
+
+
+def load_tree_ensemble(model_name):
+    """
+    Load the array export of a model without importing xgboost.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+
+    Returns:
+    TreeEnsemble: The ensemble, cached until the export or the model file changes.
+
+    Raises:
+    FileNotFoundError: If the model has not been exported.
+    ValueError: If the export is older than the current model file.
+    """
+    path = tree_arrays_path(model_path(model_name))
+    source = resolve_model_path(model_path(model_name))
+    # A replaced model file must be checksummed again even if the export is unchanged
+    stamp = (os.path.getmtime(path), source, os.path.getmtime(source))
+    cached = _ensembles.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with np.load(path) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    source_checksum = str(arrays.pop('source_checksum'))
+    if source_checksum != file_checksum(source):
+        raise ValueError(f"{path} was exported from another version of the model; run python -m utils.tree_evaluator")
+    ensemble = TreeEnsemble(arrays, source_checksum)
+    _remember(_ensembles, path, (stamp, ensemble))
+    return ensemble
+
+
+# Export path -> ((export mtime, booster mtimes), booster paths, (ensemble, quantiles, margin))
+_quantile_ensembles = {}
+
+
+def load_quantile_ensemble(model_name):
+    """
+    Load the stacked quantile boosters of a model without importing xgboost.
+
+    Parameters:
+    model_name (str): 'total_case' or 'total_death', or a region's model key.
+
+    Returns:
+    tuple: (ensemble, quantiles, margin). ensemble.predict returns one column
+           per quantile; margin is the conformal widening of the outer quantiles.
+
+    Raises:
+    FileNotFoundError: If the model has no quantile boosters (run train_model.py --quantiles).
+    ValueError: If the export is older than the boosters.
+    """
+    pickle_path = model_path(model_name)
+    path = quantile_arrays_path(pickle_path)
+    mtime = os.path.getmtime(path)
+    cached = _quantile_ensembles.get(path)
+    if cached is not None and cached[0] == (mtime, tuple(map(os.path.getmtime, cached[1]))):
+        return cached[2]
+
+    with np.load(path) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    source_checksum = str(arrays.pop('source_checksum'))
+    quantiles = [float(quantile) for quantile in arrays.pop('quantiles')]
+    margin = float(arrays.pop('margin'))
+    paths = [quantile_model_path(pickle_path, quantile) for quantile in quantiles]
+    if source_checksum != _quantile_checksum(paths):
+        raise ValueError(f"{path} was exported from other quantile boosters; run python -m utils.tree_evaluator")
+    loaded = (TreeEnsemble(arrays, source_checksum), quantiles, margin)
+    _remember(_quantile_ensembles, path, ((mtime, tuple(map(os.path.getmtime, paths))), paths, loaded))
+    return loaded
+
+
+if __name__ == '__main__':
+    for written_path in export_tree_arrays():
+        print(f"Saved {written_path}")
+    for name, pickle_path in MODEL_PATHS.items():
+        if os.path.exists(quantile_report_path(pickle_path)):
+            print(f"Saved {export_quantile_arrays(name, os.path.dirname(pickle_path))}")